@@ -1,23 +1,13 @@
 import streamlit as st
 import streamlit.components.v1 as components
+from streamlit.runtime.media_file_manager import MediaFileManager
 import sys
 import os
-import joblib
-import pandas as pd
 import random
 import numpy as np
-import io
 from datetime import datetime
 import base64
-import re
-import sqlite3
-import matplotlib.pyplot as plt
-
-# PDF (report generation)
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
+import html
 
 # -----------------------------
 # Paths
@@ -29,9 +19,12 @@ ASSETS_DIR = os.path.join(APP_DIR, "assets")
 # Local History Storage (uploaded PDFs)
 # -----------------------------
 HISTORY_DIR = os.path.join(APP_DIR, "history_files")
-HISTORY_INDEX = os.path.join(HISTORY_DIR, "history_index.csv")
+HISTORY_INDEX = os.path.join(HISTORY_DIR, "history_index.csv")  # legacy, imported into the database
 os.makedirs(HISTORY_DIR, exist_ok=True)
 
+# Newer Streamlit releases let st.download_button take a callable, read only on click
+DEFERRED_DOWNLOADS = hasattr(MediaFileManager, "add_deferred")
+
 def _safe_name(s: str) -> str:
     s = (s or "").strip()
     keep = []
@@ -43,197 +36,38 @@ def _safe_name(s: str) -> str:
     return "".join(keep)[:60] or "unknown"
 
 def save_history_record(patient_id: str, uploaded_file, notes: str = ""):
-    pid = _safe_name(patient_id) if patient_id else "unknown"
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-
     file_name = uploaded_file.name if uploaded_file else ""
-    ext = os.path.splitext(file_name)[1].lower() if file_name else ""
-    stored_name = f"{pid}_{ts}{ext}" if ext else f"{pid}_{ts}.bin"
-    stored_path = os.path.join(HISTORY_DIR, stored_name)
-
-    with open(stored_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-
-    header_needed = not os.path.exists(HISTORY_INDEX)
-    row = pd.DataFrame([{
-        "timestamp": ts,
-        "patient_id": patient_id if patient_id else "",
-        "original_name": file_name,
-        "stored_name": stored_name,
-        "notes": (notes or "")[:4000]
-    }])
-
-    if header_needed:
-        row.to_csv(HISTORY_INDEX, index=False)
-    else:
-        row.to_csv(HISTORY_INDEX, mode="a", header=False, index=False)
 
-def load_history_index():
-    if not os.path.exists(HISTORY_INDEX):
-        return pd.DataFrame(columns=["timestamp","patient_id","original_name","stored_name","notes"])
+    # Streamed into the content-addressed store; the same report uploaded twice is kept once
+    blob = blob_store.stage(uploaded_file)
     try:
-        return pd.read_csv(HISTORY_INDEX).fillna("")
+        add_history_file(patient_id, ts, file_name, notes=(notes or "")[:4000], blob=blob)
     except Exception:
-        return pd.DataFrame(columns=["timestamp","patient_id","original_name","stored_name","notes"])
-
-def get_patient_history_files(patient_id: str):
-    """Return rows from history_index.csv for one patient_id (latest first)."""
-    df = load_history_index()
-    if df.empty:
-        return df
-
-    pid = (patient_id or "").strip()
-    if not pid:
-        return df.iloc[0:0]
-
-    df = df[df["patient_id"].astype(str).str.strip() == pid]
-    df = df.sort_values("timestamp", ascending=False)
-    return df
-# -----------------------------
-# SQLite DB (patient + visits)
-# -----------------------------
-DB_PATH = os.path.join(APP_DIR, "triage.db")
+        blob_store.discard(blob)
+        raise
 
-def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+def history_file_path(stored_name, blob_sha256):
+    # Uploads live in the blob store; stored_name is a flat file from before it
+    if blob_sha256:
+        return blob_store.blob_path(blob_sha256)
+    return os.path.join(HISTORY_DIR, stored_name or "")
 
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS patients (
-        patient_id TEXT PRIMARY KEY,
-        created_at TEXT
-    )
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS visits (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        patient_id TEXT,
-        timestamp TEXT,
-        age INTEGER,
-        gender TEXT,
-        bp INTEGER,
-        hr INTEGER,
-        temp REAL,
-        symptom TEXT,
-        pre_existing TEXT,
-        risk TEXT,
-        confidence REAL,
-        department TEXT,
-        priority TEXT,
-        hospital_load INTEGER,
-        est_wait INTEGER,
-        pdf_note TEXT,
-        FOREIGN KEY(patient_id) REFERENCES patients(patient_id)
-    )
-    """)
-
-    conn.commit()
-    conn.close()
-
-def save_visit(patient_id, input_data, result_data, pdf_note=""):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    cur.execute("""
-        INSERT OR IGNORE INTO patients (patient_id, created_at)
-        VALUES (?, ?)
-    """, (patient_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def report_download_button(path, file_name, key):
+    if DEFERRED_DOWNLOADS:
+        # Read from disk only when clicked, not on every rerun
+        data = lambda: read_file(path)
+        st.download_button("⬇ Download Report", data=data, file_name=file_name,
+                           mime="application/pdf", use_container_width=True, key=key)
+    else:
+        with open(path, "rb") as f:
+            st.download_button("⬇ Download Report", data=f, file_name=file_name,
+                               mime="application/pdf", use_container_width=True, key=key)
 
-    cur.execute("""
-        INSERT INTO visits (
-            patient_id, timestamp, age, gender, bp, hr, temp, symptom, pre_existing,
-            risk, confidence, department, priority, hospital_load, est_wait, pdf_note
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        patient_id,
-        input_data.get("timestamp",""),
-        input_data.get("age", None),
-        input_data.get("gender",""),
-        input_data.get("bp", None),
-        input_data.get("hr", None),
-        input_data.get("temp", None),
-        input_data.get("symptom",""),
-        input_data.get("pre_existing",""),
-        result_data.get("risk",""),
-        float(result_data.get("confidence", 0.0)),
-        result_data.get("department",""),
-        result_data.get("priority",""),
-        int(result_data.get("hospital_load", 0)),
-        int(result_data.get("est_wait", 0)),
-        (pdf_note or "")[:2000]
-    ))
-
-    conn.commit()
-    conn.close()
-
-def get_all_patients():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT patient_id, created_at FROM patients ORDER BY created_at DESC")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_recent_visits(limit=50):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT patient_id, timestamp, age, gender, bp, hr, temp, symptom, pre_existing,
-               risk, confidence, department, priority, hospital_load, est_wait
-        FROM visits
-        ORDER BY id DESC
-        LIMIT ?
-    """, (limit,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def history_files_for_patient(patient_id: str):
-    df = load_history_index()
-    if df.empty:
-        return df
-    pid = (patient_id or "").strip()
-    if not pid:
-        return df.iloc[0:0]
-    return df[df["patient_id"].astype(str).str.strip() == pid].sort_values("timestamp", ascending=False)
-def get_patient_visits(patient_id):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT timestamp, risk, confidence, department, priority, symptom, pre_existing, bp, hr, temp, hospital_load, est_wait
-        FROM visits
-        WHERE patient_id = ?
-        ORDER BY id DESC
-    """, (patient_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def delete_patient(patient_id):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    # Delete visits first (foreign key safety)
-    cur.execute("DELETE FROM visits WHERE patient_id = ?", (patient_id,))
-    cur.execute("DELETE FROM patients WHERE patient_id = ?", (patient_id,))
-
-    conn.commit()
-    conn.close()
-
-
-def delete_visit(patient_id, timestamp):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    cur.execute("""
-        DELETE FROM visits 
-        WHERE patient_id = ? AND timestamp = ?
-    """, (patient_id, timestamp))
-
-    conn.commit()
-    conn.close()
 # -----------------------------
 # UI helpers
 # -----------------------------
@@ -243,6 +77,68 @@ def safe_rerun():
     else:
         st.stop()
 
+def report_vitals(job, pdf_text):
+    # One scan per report (and per batch of pages while it is read), not per rerun
+    key = (job.sha256, len(pdf_text))
+    cached = st.session_state.get("uploaded_pdf_vitals")
+    if cached is None or cached[0] != key:
+        cached = (key, first_readings(extract_vitals(pdf_text)))
+        st.session_state["uploaded_pdf_vitals"] = cached
+    return cached[1]
+
+def report_panel(job):
+    pdf_text = job.text()
+    detected = {}
+
+    if not job.done:
+        pages = f"{job.pages_done} of {job.page_count} pages" if job.page_count else "opening file"
+        st.markdown(f'<div class="notice notice-info">⏳ Reading report… {pages}</div>', unsafe_allow_html=True)
+        if not hasattr(st, "fragment"):
+            st.button("🔄 Refresh", key="refresh_report")
+    elif job.timed_out:
+        st.markdown(f'<div class="notice notice-warn">⚠️ Report too large to read in full — using the first {job.pages_done} of {job.page_count} pages.</div>', unsafe_allow_html=True)
+
+    if not pdf_text:
+        if job.done:
+            st.markdown('<div class="notice notice-warn">⚠️ This PDF looks scanned (no readable text). OCR needed.</div>', unsafe_allow_html=True)
+    else:
+        st.markdown('<div class="notice notice-ok">✅ PDF text found — I can read details from this report.</div>', unsafe_allow_html=True)
+
+        for kind, reading in report_vitals(job, pdf_text).items():
+            detected[VITAL_LABELS[kind]] = f"{format_value(reading)} {reading.unit}"
+
+        if detected:
+            st.markdown(
+                '<div class="notice notice-info">ℹ️ Detected from PDF (best-effort): '
+                + "  |  ".join([f"{k}: {v}" for k, v in detected.items()])
+                + "</div>",
+                unsafe_allow_html=True
+            )
+
+        colx, coly = st.columns(2)
+        with colx:
+            if st.button("📄 View Report (Full PDF)", use_container_width=True):
+                st.session_state.page = "report_view"
+                safe_rerun()
+        with coly:
+            if st.button("🧾 View Extracted Text", use_container_width=True):
+                st.session_state.page = "report_text"
+                safe_rerun()
+
+def show_report_panel(job):
+    if job.done or not hasattr(st, "fragment"):
+        report_panel(job)
+        return
+
+    # Only this panel reruns while pages arrive; the form keeps its state
+    @st.fragment(run_every=REPORT_POLL_SECONDS)
+    def poll():
+        if job.done:
+            st.rerun()
+        report_panel(job)
+
+    poll()
+
 def spacer(h=18):
     st.markdown(f"<div style='height:{h}px'></div>", unsafe_allow_html=True)
 
@@ -351,19 +247,32 @@ def typed_float(label, default=""):
     except:
         return None, f"Enter a valid number for {label}"
 
-def extract_pdf_text(uploaded_file) -> str:
-    try:
-        from PyPDF2 import PdfReader
-    except Exception:
-        return ""
-    try:
-        reader = PdfReader(uploaded_file)
-        text = ""
-        for page in reader.pages:
-            text += (page.extract_text() or "") + "\n"
-        return text.strip()
-    except Exception:
+REPORT_POLL_SECONDS = 1
+VITAL_LABELS = {"bp": "BP", "hr": "HR", "temp": "Temp", "spo2": "SpO2", "rr": "RR", "glucose": "Glucose"}
+REPORT_SAVE_WAIT_SECONDS = 5
+
+def extract_pdf_text(uploaded_file):
+    # A new upload starts a background read (utils/pdf_text.py); reruns with
+    # the same file attached reuse the session's job, and a file any process
+    # has read before is answered from the cache.
+    file_id = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    if st.session_state.get("uploaded_pdf_file_id") != file_id:
+        data = uploaded_file.getvalue()
+        st.session_state["uploaded_pdf_file_id"] = file_id
+        st.session_state["uploaded_pdf_job"] = start_extraction(data)
+        st.session_state["uploaded_pdf_bytes"] = data
+        st.session_state["uploaded_pdf_name"] = uploaded_file.name
+        st.session_state.pop("uploaded_pdf_path", None)
+    return st.session_state["uploaded_pdf_job"]
+
+def uploaded_report_text(wait=0):
+    # The pages read so far while the extraction is still running
+    job = st.session_state.get("uploaded_pdf_job")
+    if job is None:
         return ""
+    if wait:
+        job.wait(wait)
+    return job.text()
 
 # -----------------------------
 # Fix import path for utils
@@ -371,16 +280,28 @@ def extract_pdf_text(uploaded_file) -> str:
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.risk_rules import apply_safety_rules
 from utils.department_engine import route_patient
-from utils.explainability import get_feature_importance
+from utils.explainability import get_patient_drivers
 from utils.translator import translate
+from utils.fairness import AGE_BANDS, counterfactual_predictions
+from utils.batch_triage import model_feature_order
+from utils.encoding import UNSEEN_NAN
+
+from utils.model_registry import get_serving_artifacts, registry_stats
+from utils.db import (
+    init_db, save_visit, set_clinician_risk, get_patient_summaries, get_recent_visits,
+    keyset_page, get_patient_visits, delete_patient,
+    search_notes, add_history_file, get_history_files, import_history_csv, adopt_legacy_uploads,
+    SNIPPET_MARKS
+)
+from utils import blob_store
+from utils.pdf_text import start_extraction
+from utils.vitals_extraction import extract_vitals, first_readings, format_value
+from utils.triage_report import cached_report, get_report
 
 # -----------------------------
-# Load model
+# Load model (cached per process, not per rerun)
 # -----------------------------
-MODEL_PATH = "../models/risk_model.pkl"
-ENCODER_PATH = "../models/label_encoders.pkl"
-model = joblib.load(MODEL_PATH)
-encoders = joblib.load(ENCODER_PATH)
+model, encoders = get_serving_artifacts()
 
 # -----------------------------
 # App config + CSS
@@ -388,6 +309,20 @@ encoders = joblib.load(ENCODER_PATH)
 st.set_page_config(page_title="Triage AI", layout="centered")
 init_db()
 
+@st.cache_resource
+def import_legacy_history_index():
+    # history_index.csv from before the upload index moved into SQLite (once per process)
+    import_history_csv(HISTORY_INDEX)
+
+import_legacy_history_index()
+
+@st.cache_resource
+def adopt_legacy_history_files():
+    # Flat upload files from before the blob store (once per process)
+    adopt_legacy_uploads(HISTORY_DIR)
+
+adopt_legacy_history_files()
+
 st.markdown("""
 <style>
             /* ===== HERO TITLE UPGRADE ===== */
@@ -603,6 +538,10 @@ if "input_data" not in st.session_state:
     st.session_state.input_data = {}
 if "visit_saved_key" not in st.session_state:
     st.session_state.visit_saved_key = ""
+if "visit_id" not in st.session_state:
+    st.session_state.visit_id = None
+if "hospital_load" not in st.session_state:
+    st.session_state.hospital_load = ("", 0)  # (visit key, load %)
 
 # ==========================================================
 # PAGE 1: HOME
@@ -652,6 +591,24 @@ if st.session_state.page == "home":
             st.session_state.page = "history"
             safe_rerun()
 
+    # Model artifacts cached by this process (utils/model_registry.py)
+    spacer(12)
+    with st.expander("⚙️ Model status"):
+        stats = registry_stats()
+        st.caption(f"Process memory: {stats['rss_bytes'] / 2**20:.0f} MB")
+        st.dataframe([
+            {
+                "artifact": os.path.basename(a["path"]),
+                "loader": a["loader"],
+                "memory-mapped": bool(a["mmap_mode"]),
+                "load time (ms)": round(a["load_seconds"] * 1000, 1),
+                "memory added (MB)": round(a["rss_delta_bytes"] / 2**20, 1),
+                "loads": a["loads"],
+                "cache hits": a["hits"],
+            }
+            for a in stats["artifacts"]
+        ], use_container_width=True, hide_index=True)
+
 # ==========================================================
 # PAGE 2: PATIENT INPUT
 # ==========================================================
@@ -691,7 +648,8 @@ elif st.session_state.page == "patient_input":
 
         symptom = st.selectbox(
             translate("Symptoms", language),
-            ["Chest Pain", "Seizure", "Shortness of Breath", "Severe Headache", "Fever", "Cough"]
+            ["Chest Pain", "Seizure", "Shortness of Breath", "Severe Headache", "Fever", "Cough",
+             "Head Injury", "Unconsciousness"]
         )
 
         pre_existing = st.selectbox(
@@ -704,48 +662,8 @@ elif st.session_state.page == "patient_input":
     spacer(10)
     uploaded_file = st.file_uploader("Upload Past Medical Report (PDF)", type=["pdf"])
 
-    detected = {}
-    pdf_text = ""
-
     if uploaded_file is not None:
-        pdf_text = extract_pdf_text(uploaded_file)
-        st.session_state["uploaded_pdf_bytes"] = uploaded_file.getvalue()
-        st.session_state["uploaded_pdf_name"] = uploaded_file.name
-        st.session_state["uploaded_pdf_text"] = pdf_text
-
-        if not pdf_text:
-            st.markdown('<div class="notice notice-warn">⚠️ This PDF looks scanned (no readable text). OCR needed.</div>', unsafe_allow_html=True)
-        else:
-            st.markdown('<div class="notice notice-ok">✅ PDF text found — I can read details from this report.</div>', unsafe_allow_html=True)
-
-            bp_match = re.search(r'(\d{2,3})\s*/\s*(\d{2,3})', pdf_text)
-            hr_match = re.search(r'(heart\s*rate|hr)\s*[:\-]?\s*(\d{2,3})', pdf_text, re.I)
-            temp_match = re.search(r'(temperature|temp)\s*[:\-]?\s*(\d{2,3}(?:\.\d+)?)', pdf_text, re.I)
-
-            if bp_match:
-                detected["BP"] = f"{bp_match.group(1)}/{bp_match.group(2)}"
-            if hr_match:
-                detected["HR"] = hr_match.group(2)
-            if temp_match:
-                detected["Temp"] = temp_match.group(2)
-
-            if detected:
-                st.markdown(
-                    '<div class="notice notice-info">ℹ️ Detected from PDF (best-effort): '
-                    + "  |  ".join([f"{k}: {v}" for k, v in detected.items()])
-                    + "</div>",
-                    unsafe_allow_html=True
-                )
-
-            colx, coly = st.columns(2)
-            with colx:
-                if st.button("📄 View Report (Full PDF)", use_container_width=True):
-                    st.session_state.page = "report_view"
-                    safe_rerun()
-            with coly:
-                if st.button("🧾 View Extracted Text", use_container_width=True):
-                    st.session_state.page = "report_text"
-                    safe_rerun()
+        show_report_panel(extract_pdf_text(uploaded_file))
 
     history_notes = st.text_area(
         "Quick Notes (optional) – allergies / diabetes / surgeries / meds",
@@ -813,11 +731,13 @@ elif st.session_state.page == "results":
         input_data["temp"], input_data["symptom"], input_data["pre_existing"]
     )
 
-    gender_encoded = encoders["gender"].transform([input_data["gender"]])[0]
-    symptom_encoded = encoders["symptom"].transform([input_data["symptom"]])[0]
-    condition_encoded = encoders["pre_existing"].transform([input_data["pre_existing"]])[0]
+    # Lookup-table encoding; categories the model never saw are passed as missing
+    gender_encoded = encoders["gender"].encode_one(input_data["gender"])
+    symptom_encoded = encoders["symptom"].encode_one(input_data["symptom"], unseen=UNSEEN_NAN)
+    condition_encoded = encoders["pre_existing"].encode_one(input_data["pre_existing"], unseen=UNSEEN_NAN)
+    unseen_category = bool(np.isnan(symptom_encoded) or np.isnan(condition_encoded))
 
-    input_df = pd.DataFrame([{
+    encoded_input = {
         "age": input_data["age"],
         "gender": gender_encoded,
         "bp": input_data["bp"],
@@ -825,33 +745,47 @@ elif st.session_state.page == "results":
         "temp": input_data["temp"],
         "symptom": symptom_encoded,
         "pre_existing": condition_encoded
-    }])
+    }
+    feature_names = model_feature_order(model)
+
+    # One forest evaluation covers the prediction and every fairness counterfactual
+    evaluation = counterfactual_predictions(
+        model,
+        [encoded_input[f] for f in feature_names],
+        feature_names,
+        {
+            "gender": {g: encoders["gender"].encode_one(g) for g in encoders["gender"].classes_},
+            "age": AGE_BANDS,
+        },
+    )
 
     if override:
         final_risk = override
         confidence = 1.0
         probabilities = None
     else:
-        pred = model.predict(input_df)[0]
-        probabilities = model.predict_proba(input_df)[0]
-        final_risk = encoders["risk"].inverse_transform([pred])[0]
+        probabilities = evaluation["probabilities"]
+        final_risk = encoders["risk"].decode_one(evaluation["prediction"])
         confidence = float(max(probabilities))
 
     confidence_percent = round(confidence * 100, 2)
     translated_risk = translate(final_risk, language)
 
-    routing_info = route_patient(final_risk, input_data["symptom"], input_data["pre_existing"])
-    hospital_load = random.randint(20, 100)
-    adjusted_wait = int(routing_info["estimated_wait"] * (1 + hospital_load / 100))
-    translated_minutes = translate("minutes", language)
-
     pid = (input_data.get("patient_id") or "").strip()
     if not pid:
         pid = f"PAT-{datetime.now().strftime('%Y%m%d%H%M%S')}"
     input_data["patient_id"] = pid
+    save_key = f"{pid}-{input_data.get('timestamp','')}"
+
+    routing_info = route_patient(final_risk, input_data["symptom"], input_data["pre_existing"])
+    # Drawn once per visit, so reruns, the saved visit and the cached report agree
+    if st.session_state.hospital_load[0] != save_key:
+        st.session_state.hospital_load = (save_key, random.randint(20, 100))
+    hospital_load = st.session_state.hospital_load[1]
+    adjusted_wait = int(routing_info["estimated_wait"] * (1 + hospital_load / 100))
+    translated_minutes = translate("minutes", language)
 
     # ✅ prevent duplicate DB save on reruns
-    save_key = f"{pid}-{input_data.get('timestamp','')}"
     if st.session_state.visit_saved_key != save_key:
         result_data = {
             "risk": final_risk,
@@ -859,10 +793,11 @@ elif st.session_state.page == "results":
             "department": routing_info["department"],
             "priority": routing_info["priority"],
             "hospital_load": hospital_load,
-            "est_wait": adjusted_wait
+            "est_wait": adjusted_wait,
+            "safety_override": bool(override)
         }
-        pdf_note = st.session_state.get("uploaded_pdf_text", "")
-        save_visit(pid, input_data, result_data, pdf_note=pdf_note)
+        pdf_note = uploaded_report_text(wait=REPORT_SAVE_WAIT_SECONDS)
+        st.session_state.visit_id = save_visit(pid, input_data, result_data, pdf_note=pdf_note)
         st.session_state.visit_saved_key = save_key
 
     spacer(14)
@@ -893,6 +828,24 @@ elif st.session_state.page == "results":
     </div>
     """, unsafe_allow_html=True)
 
+    if unseen_category and not override:
+        spacer(8)
+        st.markdown('<div class="notice notice-warn">⚠️ The model was not trained on this symptom/condition; '
+                    'it was scored as unknown. Confirm the risk level clinically.</div>', unsafe_allow_html=True)
+
+    # Clinician review: the assessed risk becomes a training label for incremental retraining
+    if st.session_state.visit_id is not None:
+        with st.expander("Clinician review"):
+            levels = ["High", "Medium", "Low"]
+            clinician_risk = st.selectbox(
+                "Clinician-assessed risk", levels,
+                index=levels.index(final_risk) if final_risk in levels else 0,
+                key=f"clinician_risk_{st.session_state.visit_id}"
+            )
+            if st.button("Save assessment", key=f"save_clinician_risk_{st.session_state.visit_id}"):
+                set_clinician_risk(st.session_state.visit_id, clinician_risk)
+                st.success("Assessment saved ✅")
+
     spacer(12)
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("### Hospital Status")
@@ -903,24 +856,37 @@ elif st.session_state.page == "results":
     # Clinical drivers
     spacer(12)
     st.markdown("### Clinical Drivers")
-    feature_names = ["age", "gender", "bp", "hr", "temp", "symptom", "pre_existing"]
-    top_features = get_feature_importance(model, feature_names, top_n=5)
+    # This patient's decision paths, explaining the model's own prediction
+    top_features = get_patient_drivers(
+        model,
+        [encoded_input[f] for f in feature_names],
+        feature_names,
+        class_index=int(np.argmax(evaluation["probabilities"])),
+        top_n=5,
+    )
 
     driver_color = {
         "hr": "#ef4444", "temp": "#f97316", "symptom": "#f59e0b",
         "age": "#3b82f6", "bp": "#14b8a6", "gender": "#64748b", "pre_existing": "#8b5cf6"
     }
 
+    if top_features and "contribution" not in top_features[0]:
+        # e.g. a shared model published before it carried per-node values
+        st.markdown('<div class="notice notice-info">ℹ️ Showing model-wide feature importance: this model version cannot explain a single patient. Publish it again to see this patient\'s drivers.</div>', unsafe_allow_html=True)
+
     st.markdown('<div class="card">', unsafe_allow_html=True)
     for item in top_features:
         feature = item["feature"]
         importance = round(item["importance"] * 100, 1)
         color = driver_color.get(feature, "#334155")
+        direction = ""
+        if "contribution" in item:
+            direction = " ▲" if item["contribution"] >= 0 else " ▼"
         st.markdown(f"""
         <div style="margin-bottom:14px;">
             <div style="display:flex; justify-content:space-between;">
                 <span style="font-weight:700;">{feature.upper()}</span>
-                <span style="font-weight:700;">{importance}% influence</span>
+                <span style="font-weight:700;">{importance}% influence{direction}</span>
             </div>
             <div style="height:8px;background:#e2e8f0;border-radius:8px;overflow:hidden;">
                 <div style="width:{importance}%;height:8px;background:{color};border-radius:8px;"></div>
@@ -932,110 +898,51 @@ elif st.session_state.page == "results":
     # Fairness
     spacer(12)
     st.subheader("Fairness Monitoring")
-    male_encoded = encoders["gender"].transform(["Male"])[0]
-    female_encoded = encoders["gender"].transform(["Female"])[0]
-    base_array = input_df.values[0]
-    male_array = base_array.copy()
-    female_array = base_array.copy()
-    male_array[1] = male_encoded
-    female_array[1] = female_encoded
-    male_pred = model.predict([male_array])[0]
-    female_pred = model.predict([female_array])[0]
-    fairness_flag = (male_pred != female_pred)
+    fairness_flag = evaluation["flags"]["gender"]
+    age_flag = evaluation["flags"]["age"]
     if fairness_flag:
         st.warning("Potential gender bias detected ⚠️ (same vitals, different gender produced different outcome)")
     else:
         st.success("No gender bias detected ✅ (same vitals produced same outcome across gender toggle)")
-
-    # PDF Download (same as your old version)
-    def fig_to_png_bytes(fig):
-        img_buf = io.BytesIO()
-        fig.savefig(img_buf, format="png", dpi=200, bbox_inches="tight")
-        plt.close(fig)
-        img_buf.seek(0)
-        return img_buf
-
-    def generate_pdf_report():
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-
-        story.append(Paragraph("TRIAGE AI - PATIENT TRIAGE REPORT", styles["Title"]))
-        story.append(Paragraph(f"Generated: {input_data.get('timestamp','')}", styles["Normal"]))
-        story.append(Spacer(1, 12))
-
-        pid_show = input_data.get("patient_id", "") or "N/A"
-        patient_table = [
-            ["Patient ID", pid_show],
-            ["Age", str(input_data["age"])],
-            ["Gender", input_data["gender"]],
-            ["Symptom", input_data["symptom"]],
-            ["Pre-existing Condition", input_data["pre_existing"]],
-        ]
-        t = Table(patient_table, colWidths=[170, 330])
-        t.setStyle(TableStyle([
-            ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
-            ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
-            ("FONTSIZE", (0,0), (-1,-1), 10),
-        ]))
-        story.append(Paragraph("Patient Details", styles["Heading2"]))
-        story.append(t)
-        story.append(Spacer(1, 12))
-
-        vitals_table = [
-            ["Blood Pressure", str(input_data["bp"])],
-            ["Heart Rate", str(input_data["hr"])],
-            ["Temperature", str(input_data["temp"])],
-        ]
-        t2 = Table(vitals_table, colWidths=[170, 330])
-        t2.setStyle(TableStyle([
-            ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
-            ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
-            ("FONTSIZE", (0,0), (-1,-1), 10),
-        ]))
-        story.append(Paragraph("Vitals", styles["Heading2"]))
-        story.append(t2)
-        story.append(Spacer(1, 12))
-
-        story.append(Paragraph("Triage Output", styles["Heading2"]))
-        res_table = [
-            ["Risk Level", f"{final_risk} ({confidence_percent}%)"],
-            ["Department", routing_info["department"]],
-            ["Priority", routing_info["priority"]],
-            ["Hospital Load", f"{hospital_load}%"],
-            ["Estimated Wait Time", f"{adjusted_wait} minutes"],
-            ["Safety Override", "YES" if override else "NO"],
-            ["Fairness (Gender Toggle)", "POTENTIAL BIAS" if fairness_flag else "NO BIAS FLAG"],
-        ]
-        t3 = Table(res_table, colWidths=[170, 330])
-        t3.setStyle(TableStyle([
-            ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
-            ("GRID", (0,0), (-1,-1), 0.5, colors.grey),
-            ("FONTSIZE", (0,0), (-1,-1), 10),
-        ]))
-        story.append(t3)
-        story.append(Spacer(1, 12))
-
-        story.append(Paragraph(
-            "Disclaimer: This report is decision-support output generated from synthetic-data-trained ML + safety rules. "
-            "Not a substitute for clinical judgement.",
-            styles["Italic"]
-        ))
-
-        doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
+    if age_flag:
+        st.info("Age sensitivity ℹ️ (same vitals produced different outcomes across age bands "
+                + ", ".join(AGE_BANDS) + ")")
+
+    # PDF Download
+    # Built on the first download and cached per visit (utils/triage_report.py), not on every rerun
+    report_key = (pid, input_data.get("timestamp", ""))
+    report_input = dict(input_data)
+    report_result = {
+        "risk": final_risk,
+        "confidence": confidence_percent,
+        "department": routing_info["department"],
+        "priority": routing_info["priority"],
+        "hospital_load": hospital_load,
+        "est_wait": adjusted_wait,
+        "safety_override": bool(override),
+        "gender_flag": fairness_flag,
+        "age_flag": age_flag,
+    }
+    report_file_name = f"triage_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
 
     spacer(12)
     st.subheader("Download Report")
-    st.download_button(
-        label="⬇ Download PDF Report",
-        data=generate_pdf_report(),
-        file_name=f"triage_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-        mime="application/pdf",
-        use_container_width=True
-    )
+    if DEFERRED_DOWNLOADS:
+        st.download_button(
+            label="⬇ Download PDF Report",
+            data=lambda: get_report(report_key, report_input, report_result),
+            file_name=report_file_name,
+            mime="application/pdf",
+            use_container_width=True
+        )
+    elif cached_report(report_key) is not None or st.button("📄 Prepare PDF Report", use_container_width=True):
+        st.download_button(
+            label="⬇ Download PDF Report",
+            data=get_report(report_key, report_input, report_result),
+            file_name=report_file_name,
+            mime="application/pdf",
+            use_container_width=True
+        )
 
     spacer(12)
     col_back, col_new = st.columns(2)
@@ -1061,13 +968,21 @@ elif st.session_state.page == "report_view":
     st.markdown('<div class="small-muted">Full PDF view for doctor/nurse verification.</div>', unsafe_allow_html=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
-    pdf_bytes = st.session_state.get("uploaded_pdf_bytes", b"")
+    # A stored report is kept as its path and read only while this page renders
+    pdf_path = st.session_state.get("uploaded_pdf_path")
+    if pdf_path:
+        pdf_bytes = read_file(pdf_path) if os.path.isfile(pdf_path) else b""
+    else:
+        pdf_bytes = st.session_state.get("uploaded_pdf_bytes", b"")
     pdf_name = st.session_state.get("uploaded_pdf_name", "report.pdf")
 
     if not pdf_bytes:
         st.markdown('<div class="notice notice-warn">⚠️ No PDF found. Upload again in Patient Intake.</div>', unsafe_allow_html=True)
     else:
-        st.download_button("⬇ Download PDF", data=pdf_bytes, file_name=pdf_name, mime="application/pdf", use_container_width=True)
+        if pdf_path:
+            report_download_button(pdf_path, pdf_name, key="dl_report_view")
+        else:
+            st.download_button("⬇ Download PDF", data=pdf_bytes, file_name=pdf_name, mime="application/pdf", use_container_width=True)
         pdf_base64 = base64.b64encode(pdf_bytes).decode("utf-8")
         components.html(
             f"""
@@ -1097,7 +1012,7 @@ elif st.session_state.page == "report_text":
     st.markdown('<div class="small-muted">For doctor/nurse quick verification.</div>', unsafe_allow_html=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
-    text = st.session_state.get("uploaded_pdf_text", "")
+    text = uploaded_report_text()
     if not text:
         st.markdown('<div class="notice notice-warn">⚠️ No text found. PDF may be scanned.</div>', unsafe_allow_html=True)
     else:
@@ -1128,29 +1043,50 @@ elif st.session_state.page == "history":
     spacer(12)
 
     # ---- Search + Filters ----
-    colS1, colS2, colS3 = st.columns([2,1,1])
+    colS1, colS2, colS3, colS4 = st.columns([2,1,1,1])
     with colS1:
         query = st.text_input("🔎 Search Patient ID", value="")
     with colS2:
-        max_patients = st.selectbox("Patients", [10, 20, 50, 100], index=2)
+        match_mode = st.selectbox("Match", ["Starts with", "Contains"], index=0)
     with colS3:
+        max_patients = st.selectbox("Patients", [10, 20, 50, 100], index=2)
+    with colS4:
         max_visits = st.selectbox("Visits", [10, 20, 50, 100], index=2)
 
-    patients = get_all_patients()
-    visits = get_recent_visits(limit=max_visits)
-
-    # optional: if you want “max_patients”
-    patients = patients[:max_patients]
+    # Search runs in SQLite; pages are keyset cursors, reset when the filters change
+    search = query.strip()
+    mode = "prefix" if match_mode == "Starts with" else "contains"
+    filters = (search, mode, max_patients, max_visits)
+    if st.session_state.get("history_filters") != filters:
+        st.session_state.history_filters = filters
+        st.session_state.patients_cursor = None
+        st.session_state.visits_cursor = None
+
+    patients, patients_prev, patients_next = keyset_page(
+        lambda limit, **cursor: get_patient_summaries(limit, search, mode, **cursor),
+        max_patients,
+        st.session_state.get("patients_cursor"),
+    )
+    visits, visits_prev, visits_next = keyset_page(
+        lambda limit, **cursor: get_recent_visits(limit, search, mode, **cursor),
+        max_visits,
+        st.session_state.get("visits_cursor"),
+    )
 
-    # If search typed, filter both lists
-    if query.strip():
-        q = query.strip().lower()
-        patients = [p for p in patients if (p[0] or "").lower().find(q) != -1]
-        visits = [v for v in visits if (v[0] or "").lower().find(q) != -1]
+    def page_buttons(rows, has_prev, has_next, state_key):
+        b1, b2 = st.columns(2)
+        with b1:
+            if st.button("⬅ Previous", key=f"{state_key}_prev", disabled=not has_prev, use_container_width=True):
+                st.session_state[state_key] = ("before", rows[0])
+                safe_rerun()
+        with b2:
+            if st.button("Next ➡", key=f"{state_key}_next", disabled=not has_next, use_container_width=True):
+                st.session_state[state_key] = ("after", rows[-1])
+                safe_rerun()
 
     spacer(10)
 
-    tab1, tab2 = st.tabs(["👤 Patients", "🧾 Recent Visits"])
+    tab1, tab2, tab3 = st.tabs(["👤 Patients", "🧾 Recent Visits", "📝 Report Search"])
 
     # ========== TAB 1: Patients ==========
     with tab1:
@@ -1161,19 +1097,14 @@ elif st.session_state.page == "history":
         else:
             cols = st.columns(3, gap="large")
 
-            for i, (patient_id, created_at) in enumerate(patients):
+            for i, (patient_id, created_at, risk, conf, dept, prio) in enumerate(patients):
                 pid = patient_id or "Unknown"
 
-                # Pull last visit for badge + preview
-                p_visits = get_patient_visits(pid)
-                last = p_visits[0] if p_visits else None
-
-                # last visit fields:
-                # timestamp, risk, confidence, department, priority, symptom, pre_existing, bp, hr, temp, hospital_load, est_wait
-                last_risk = last[1] if last else "N/A"
-                last_conf = float(last[2]) if last else 0.0
-                last_dept = last[3] if last else "—"
-                last_prio = last[4] if last else "—"
+                # Latest visit fields are None until the patient's first visit
+                last_risk = risk or "N/A"
+                last_conf = float(conf or 0.0)
+                last_dept = dept or "—"
+                last_prio = prio or "—"
 
                 risk_color = {"Low":"#22c55e", "Medium":"#f59e0b", "High":"#ef4444"}
                 risk_hex = risk_color.get(last_risk, "#64748b")
@@ -1206,14 +1137,16 @@ elif st.session_state.page == "history":
                         safe_rerun()
 
         st.markdown("</div>", unsafe_allow_html=True)
+        if patients:
+            page_buttons(patients, patients_prev, patients_next, "patients_cursor")
     # ========== TAB 2: Recent Visits ==========
     with tab2:
         if not visits:
             st.markdown('<div class="notice notice-warn">⚠️ No visits found.</div>', unsafe_allow_html=True)
         else:
-            for v in visits[:20]:
+            for v in visits:
                 (pid, ts, age, gender, bp, hr, temp, symptom, cond,
-                 risk, conf, dept, prio, load, wait) = v
+                 risk, conf, dept, prio, load, wait, _visit_id) = v
 
                 badge = "#64748b"
                 if risk == "Low": badge = "#22c55e"
@@ -1244,6 +1177,35 @@ elif st.session_state.page == "history":
                   </div>
                 </div>
                 """, unsafe_allow_html=True)
+            page_buttons(visits, visits_prev, visits_next, "visits_cursor")
+
+    # ========== TAB 3: Report / Notes Search ==========
+    with tab3:
+        note_query = st.text_input("Search report text and intake notes", value="", key="note_query",
+                                   placeholder="e.g. warfarin, or warf* for a prefix")
+        if note_query.strip():
+            hits = search_notes(note_query, limit=50)
+            if not hits:
+                st.markdown('<div class="notice notice-warn">⚠️ No reports or notes mention that.</div>', unsafe_allow_html=True)
+            for n, (source, hit_pid, ts, ref, snippet, score) in enumerate(hits):
+                # Escape the extracted text, then turn the match markers into highlights
+                snippet_html = (html.escape(snippet)
+                                .replace(SNIPPET_MARKS[0], "<mark>")
+                                .replace(SNIPPET_MARKS[1], "</mark>"))
+                label = "PDF report (visit)" if source == "report" else f"Intake note • {html.escape(str(ref or ''))}"
+                st.markdown(f"""
+                <div class="card" style="margin-bottom:12px;">
+                  <div style="display:flex; justify-content:space-between; align-items:center;">
+                    <b>Patient:</b> {html.escape(str(hit_pid))}
+                    <span class="small-muted">{label} • {html.escape(str(ts))}</span>
+                  </div>
+                  <div style="margin-top:8px;">{snippet_html}</div>
+                </div>
+                """, unsafe_allow_html=True)
+                if st.button("📂 Open Patient File", key=f"note_hit_{n}_{hit_pid}", use_container_width=True):
+                    st.session_state.selected_patient = hit_pid
+                    st.session_state.page = "patient_file"
+                    safe_rerun()
 
     spacer(12)
     if st.button("⬅ Back to Home", use_container_width=True):
@@ -1292,41 +1254,33 @@ elif st.session_state.page == "patient_file":
     st.markdown("### 📎 Uploaded Medical History")
     st.markdown('<div class="small-muted">Reports uploaded during intake for this patient.</div>', unsafe_allow_html=True)
 
-    df_files = get_patient_history_files(pid)
+    # One indexed lookup serves this section and the Reports tab
+    history_files = get_history_files(pid)
 
-    if df_files.empty:
+    if not history_files:
         st.markdown('<div class="notice notice-warn">⚠️ No uploaded reports found for this patient.</div>', unsafe_allow_html=True)
     else:
-        for idx, row in df_files.iterrows():
-            ts = row.get("timestamp", "")
-            orig = row.get("original_name", "report.pdf") or "report.pdf"
-            notes = row.get("notes", "") or ""
-            stored = row.get("stored_name", "") or ""
+        for i, (ts, orig, stored, notes, blob_sha256) in enumerate(history_files):
+            orig = orig or "report.pdf"
+            notes = notes or ""
 
-            stored_path = os.path.join(HISTORY_DIR, stored)
+            stored_path = history_file_path(stored, blob_sha256)
 
             with st.expander(f"📄 {orig}  •  {ts}"):
                 if notes:
                     st.markdown(f"**Notes:** {notes}")
 
-                if os.path.exists(stored_path):
-                    with open(stored_path, "rb") as f:
-                        data = f.read()
-
+                if os.path.isfile(stored_path):
                     # download
-                    st.download_button(
-                        "⬇ Download Report",
-                        data=data,
-                        file_name=orig,
-                        mime="application/pdf",
-                        use_container_width=True,
-                        key=f"dl_{pid}_{stored}"
-                    )
+                    report_download_button(stored_path, orig, key=f"dl_{pid}_{i}")
 
                     # open viewer
-                    if st.button("👁 Open Report", use_container_width=True, key=f"openpdf_{pid}_{stored}"):
-                        st.session_state["uploaded_pdf_bytes"] = data
+                    if st.button("👁 Open Report", use_container_width=True, key=f"openpdf_{pid}_{i}"):
+                        st.session_state["uploaded_pdf_path"] = stored_path
                         st.session_state["uploaded_pdf_name"] = orig
+                        st.session_state.pop("uploaded_pdf_bytes", None)
+                        st.session_state.pop("uploaded_pdf_file_id", None)
+                        st.session_state.pop("uploaded_pdf_job", None)
                         st.session_state.page = "report_view"
                         safe_rerun()
                 else:
@@ -1338,34 +1292,19 @@ elif st.session_state.page == "patient_file":
     # TAB 2: REPORTS
     # -------------------------
     with tabR:
-        df_rep = get_patient_history_files(pid)
-
-        if df_rep.empty:
+        if not history_files:
             st.markdown('<div class="notice notice-warn">⚠️ No uploaded reports found for this patient.</div>', unsafe_allow_html=True)
         else:
-            for i, row in df_rep.iterrows():
-                ts = row.get("timestamp", "")
-                orig = row.get("original_name", "report.pdf")
-                notes = row.get("notes", "")
-                stored_name = row.get("stored_name", "")
-
-                stored_path = os.path.join(HISTORY_DIR, stored_name)
+            for i, (ts, orig, stored_name, notes, blob_sha256) in enumerate(history_files):
+                stored_path = history_file_path(stored_name, blob_sha256)
 
                 st.markdown('<div class="card" style="margin-bottom:12px;">', unsafe_allow_html=True)
                 st.markdown(f"**📄 {orig}**  \n<span class='small-muted'>Uploaded: {ts}</span>", unsafe_allow_html=True)
                 if notes:
                     st.markdown(f"<div class='small-muted' style='margin-top:6px;'><b>Notes:</b> {notes}</div>", unsafe_allow_html=True)
 
-                if os.path.exists(stored_path):
-                    with open(stored_path, "rb") as f:
-                        st.download_button(
-                            "⬇ Download Report",
-                            data=f.read(),
-                            file_name=orig,
-                            mime="application/pdf",
-                            use_container_width=True,
-                            key=f"dl_{pid}_{ts}_{i}"
-                        )
+                if os.path.isfile(stored_path):
+                    report_download_button(stored_path, orig, key=f"dl_{pid}_{ts}_{i}")
                 else:
                     st.markdown('<div class="notice notice-warn">⚠️ Stored file missing.</div>', unsafe_allow_html=True)
 
@@ -1395,13 +1334,8 @@ elif st.session_state.page == "patient_file":
         c1, c2 = st.columns(2)
         with c1:
             if st.button("✅ Confirm Delete", use_container_width=True, key=f"btn_confirm_{pid}"):
-                # delete visits then patient
-                conn = sqlite3.connect(DB_PATH)
-                cur = conn.cursor()
-                cur.execute("DELETE FROM visits WHERE patient_id = ?", (pid,))
-                cur.execute("DELETE FROM patients WHERE patient_id = ?", (pid,))
-                conn.commit()
-                conn.close()
+                # delete visits, upload records and patient; stored reports no one else references go too
+                delete_patient(pid)
 
                 # reset
                 st.session_state[confirm_key] = False
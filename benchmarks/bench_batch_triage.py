@@ -0,0 +1,82 @@
+"""
+Throughput benchmark for utils/batch_triage.py.
+
+Resamples the synthetic dataset up to --rows patients, checks a sample
+against the one-patient-at-a-time path used by the Streamlit results
+page, then reports patients/minute for the batch engine.
+
+    python benchmarks/bench_batch_triage.py --rows 200000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.batch_triage import FEATURE_COLUMNS, load_artifacts, model_feature_order, triage_batch
+from utils.department_engine import route_patient
+from utils.risk_rules import apply_safety_rules
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "synthetic_triage_data.csv")
+
+
+def triage_like_ui(row, model, encoders):
+    """Mirrors the scalar code path of the results page for one patient."""
+    override = apply_safety_rules(
+        row["age"], row["bp"], row["hr"], row["temp"], row["symptom"], row["pre_existing"]
+    )
+    if override:
+        risk, confidence = override, 1.0
+    else:
+        input_df = pd.DataFrame([{
+            "age": row["age"],
+            "gender": encoders["gender"].transform([row["gender"]])[0],
+            "bp": row["bp"],
+            "hr": row["hr"],
+            "temp": row["temp"],
+            "symptom": encoders["symptom"].transform([row["symptom"]])[0],
+            "pre_existing": encoders["pre_existing"].transform([row["pre_existing"]])[0],
+        }])[model_feature_order(model)]
+        pred = model.predict(input_df)[0]
+        probabilities = model.predict_proba(input_df)[0]
+        risk = encoders["risk"].inverse_transform([pred])[0]
+        confidence = float(max(probabilities))
+    routing = route_patient(risk, row["symptom"], row["pre_existing"])
+    return risk, round(confidence * 100, 2), routing["department"], routing["priority"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunksize", type=int, default=10000)
+    parser.add_argument("--parity-sample", type=int, default=200)
+    args = parser.parse_args()
+
+    model, encoders = load_artifacts()
+    base = pd.read_csv(DATA_PATH)
+    df = base.sample(args.rows, replace=True, random_state=0).reset_index(drop=True)
+
+    # Parity against the per-patient path
+    sample = base.head(args.parity_sample)
+    batch = triage_batch(sample, model, encoders)
+    for i, row in sample.iterrows():
+        expected = triage_like_ui(row, model, encoders)
+        got = tuple(batch.loc[i, ["risk", "confidence", "department", "priority"]])
+        assert got == expected, (i, got, expected)
+    print(f"parity: {len(sample)} patients match the results-page path")
+
+    # Throughput
+    start = time.perf_counter()
+    for lo in range(0, len(df), args.chunksize):
+        triage_batch(df.iloc[lo:lo + args.chunksize][FEATURE_COLUMNS], model, encoders)
+    elapsed = time.perf_counter() - start
+
+    per_minute = len(df) / elapsed * 60
+    print(f"rows: {len(df)}  elapsed: {elapsed:.2f}s  throughput: {per_minute:,.0f} patients/minute")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Uploaded report storage (utils/blob_store.py, utils/db.py migration 7):
+streaming an upload into the store, uploading the same report again
+(deduplicated: hashed, then the staged copy dropped), chunked reads,
+and deleting patients with garbage collection of unreferenced blobs.
+
+    python benchmarks/bench_blob_store.py --size-mb 20 --uploads 50
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.bench_history_page import median_ms
+from utils import blob_store, db
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--uploads", type=int, default=50, help="uploads of the same report, one per patient")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    report = io.BytesIO(os.urandom(args.size_mb << 20))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "triage.db")
+        root = os.path.join(tmp, "blobs")
+        db.init_db(db_path)
+
+        def upload(patient_id):
+            blob = blob_store.stage(report, root)
+            db.add_history_file(patient_id, "20260101_100000", "report.pdf", blob=blob, blob_root=root, db_path=db_path)
+
+        start = time.perf_counter()
+        upload("PAT-0")
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(1, args.uploads):
+            upload(f"PAT-{i}")
+        again = (time.perf_counter() - start) / max(args.uploads - 1, 1)
+        stored = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+        print(f"{args.size_mb} MB report: first upload {first * 1000:.0f} ms, "
+              f"repeat upload {again * 1000:.0f} ms, {args.uploads} uploads stored in {stored / 2**20:.0f} MB")
+
+        sha256 = db.get_history_files("PAT-0", db_path)[0][4]
+        read_ms = median_ms(lambda: sum(len(chunk) for chunk in blob_store.iter_blob(sha256, root)), args.repeat)
+        print(f"chunked read {read_ms:.0f} ms ({args.size_mb / read_ms * 1000:.0f} MB/s)")
+
+        start = time.perf_counter()
+        collected = sum(db.delete_patient(f"PAT-{i}", root, db_path) for i in range(args.uploads))
+        print(f"deleted {args.uploads} patients in {(time.perf_counter() - start) * 1000:.0f} ms, "
+              f"{collected} blob collected, {sum(len(files) for _, _, files in os.walk(root))} files left")
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
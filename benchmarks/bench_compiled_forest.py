@@ -0,0 +1,78 @@
+"""
+Latency benchmark: sklearn RandomForest vs utils/compiled_forest.py.
+
+Checks that the compiled forest reproduces predict_proba exactly on the
+synthetic dataset, then times single-patient and batch prediction.
+
+    python benchmarks/bench_compiled_forest.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.batch_triage import load_artifacts, model_feature_order
+from utils.compiled_forest import compile_forest
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "synthetic_triage_data.csv")
+
+
+def encoded_features(model, encoders):
+    df = pd.read_csv(DATA_PATH)
+    for col in ("gender", "symptom", "pre_existing"):
+        df[col] = encoders[col].transform(df[col])
+    return df[model_feature_order(model)]
+
+
+def best_of(fn, repeat):
+    """Median wall time of `repeat` calls, in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--single-repeat", type=int, default=300)
+    parser.add_argument("--batch-rows", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    model, encoders = load_artifacts()
+    X = encoded_features(model, encoders)
+
+    start = time.perf_counter()
+    forest = compile_forest(model)
+    print(f"compiled {forest.n_trees} trees, {len(forest.feature):,} nodes, "
+          f"max depth {forest.max_depth}, {forest.nbytes / 1e6:.2f} MB in {time.perf_counter() - start:.2f}s")
+
+    expected = model.predict_proba(X)
+    assert np.array_equal(forest.predict_proba(X), expected), "batch predict_proba differs"
+    for i in range(len(X)):
+        assert np.array_equal(forest.predict_proba_one(X.values[i]), expected[i]), f"row {i} differs"
+    print(f"parity: predict_proba identical on {len(X):,} rows (batch and single-row)")
+
+    one_df = X.iloc[[0]]
+    one_row = X.values[0]
+    sk_one = best_of(lambda: model.predict_proba(one_df), args.single_repeat)
+    cf_one = best_of(lambda: forest.predict_proba_one(one_row), args.single_repeat)
+    print(f"single row   sklearn: {sk_one * 1e6:9.0f} us   compiled: {cf_one * 1e6:7.0f} us   "
+          f"speed-up: {sk_one / cf_one:.0f}x")
+
+    for rows in args.batch_rows:
+        batch = X.sample(rows, replace=True, random_state=0)
+        sk_batch = best_of(lambda: model.predict_proba(batch), 5)
+        cf_batch = best_of(lambda: forest.predict_proba(batch), 5)
+        print(f"{rows:>6} rows  sklearn: {sk_batch * 1e3:9.2f} ms   compiled: {cf_batch * 1e3:7.2f} ms   "
+              f"speed-up: {sk_batch / cf_batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
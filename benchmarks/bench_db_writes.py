@@ -0,0 +1,114 @@
+"""
+Concurrent visit writes and history reads: per-call connections with
+the default rollback journal (the app's previous helpers) vs the pooled
+WAL layer in utils/db.py.
+
+Several processes ("nurses") save visits while others read patient
+histories, against a fresh database per mode.
+
+    python benchmarks/bench_db_writes.py --writers 4 --readers 2 --visits 500
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils import db
+
+INPUT = {"timestamp": "2026-01-01 10:00:00", "age": 64, "gender": "Male", "bp": 150,
+         "hr": 104, "temp": 100.2, "symptom": "Chest Pain", "pre_existing": "Diabetes"}
+RESULT = {"risk": "High", "confidence": 91.0, "department": "Cardiology", "priority": "Immediate",
+          "hospital_load": 60, "est_wait": 5}
+
+
+def legacy_save(db_path, pid):
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("INSERT OR IGNORE INTO patients (patient_id, created_at) VALUES (?, ?)", (pid, "2026-01-01"))
+    cur.execute(
+        "INSERT INTO visits (patient_id, timestamp, age, gender, bp, hr, temp, symptom, pre_existing, "
+        "risk, confidence, department, priority, hospital_load, est_wait, pdf_note) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (pid, *INPUT.values(), *RESULT.values(), ""),
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_read(db_path, pid):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(db.SELECT_PATIENT_VISITS, (pid,)).fetchall()
+    conn.close()
+    return rows
+
+
+def worker(mode, role, db_path, n, index, out):
+    errors = 0
+    start = time.perf_counter()
+    for i in range(n):
+        pid = f"P{index}-{i % 50}"
+        try:
+            if role == "write":
+                if mode == "legacy":
+                    legacy_save(db_path, pid)
+                else:
+                    db.save_visit(pid, INPUT, RESULT, db_path=db_path)
+            else:
+                if mode == "legacy":
+                    legacy_read(db_path, pid)
+                else:
+                    db.get_patient_visits(pid, db_path=db_path)
+        except sqlite3.OperationalError:
+            errors += 1
+    out.put((role, n, time.perf_counter() - start, errors))
+
+
+def run(mode, writers, readers, n):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db.init_db(db_path)
+        db.close_all()
+        if mode == "legacy":
+            conn = sqlite3.connect(db_path)
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.close()
+
+        out = mp.Queue()
+        procs = [mp.Process(target=worker, args=(mode, "write", db_path, n, k, out)) for k in range(writers)]
+        procs += [mp.Process(target=worker, args=(mode, "read", db_path, n * 4, k, out)) for k in range(readers)]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+        wall = time.perf_counter() - start
+
+    for role in ("write", "read"):
+        rows = [r for r in results if r[0] == role]
+        if rows:
+            ops = sum(r[1] for r in rows)
+            errors = sum(r[3] for r in rows)
+            print(f"  {mode:6} {role:5}: {ops / wall:8,.0f} ops/s overall, "
+                  f"{sum(r[2] for r in rows) / ops * 1e3:.2f} ms/op, {errors} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--visits", type=int, default=500, help="visits saved per writer")
+    args = parser.parse_args()
+
+    for mode in ("legacy", "pooled"):
+        print(f"{mode}: {args.writers} writers x {args.visits} visits, {args.readers} readers")
+        run(mode, args.writers, args.readers, args.visits)
+
+
+if __name__ == "__main__":
+    main()
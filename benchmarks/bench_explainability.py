@@ -0,0 +1,67 @@
+"""
+Per-patient feature contributions (utils/explainability.py).
+
+Checks that bias + contributions reproduces predict_proba on the
+synthetic dataset, then times one patient (results page) and a batch
+the size of a day's visits.
+
+    python benchmarks/bench_explainability.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.batch_triage import load_artifacts, model_feature_order
+from utils.explainability import PathExplainer
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "synthetic_triage_data.csv")
+
+
+def encoded_features(model, encoders):
+    df = pd.read_csv(DATA_PATH)
+    for col in ("gender", "symptom", "pre_existing"):
+        df[col] = encoders[col].transform(df[col])
+    return df[model_feature_order(model)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--single-repeat", type=int, default=300)
+    parser.add_argument("--batch-rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    model, encoders = load_artifacts()
+    X = encoded_features(model, encoders)
+
+    start = time.perf_counter()
+    explainer = PathExplainer(model)
+    print(f"explainer built in {time.perf_counter() - start:.3f}s")
+
+    contributions = explainer.contributions(X)
+    error = np.abs(explainer.bias + contributions.sum(axis=1) - model.predict_proba(X)).max()
+    assert error < 1e-9, f"contributions do not add up to predict_proba (max error {error})"
+    print(f"parity: bias + contributions == predict_proba on {len(X):,} rows (max error {error:.1e})")
+
+    row = X.values[0]
+    times = []
+    for _ in range(args.single_repeat):
+        start = time.perf_counter()
+        explainer.explain_one(row)
+        times.append(time.perf_counter() - start)
+    print(f"single patient: {np.median(times) * 1e3:.3f} ms median")
+
+    batch = X.sample(args.batch_rows, replace=True, random_state=0)
+    start = time.perf_counter()
+    explainer.contributions(batch)
+    elapsed = time.perf_counter() - start
+    print(f"batch: {len(batch):,} patients in {elapsed:.2f}s ({len(batch) / elapsed:,.0f} patients/s)")
+
+
+if __name__ == "__main__":
+    main()
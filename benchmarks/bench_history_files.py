@@ -0,0 +1,69 @@
+"""
+Patient file upload lookups: the old history_index.csv scan (read the
+whole CSV with pandas, filter, sort) versus the history_files table
+(utils/db.py, migration 6), plus the one-shot CSV import.
+
+    python benchmarks/bench_history_files.py --rows 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.bench_history_page import median_ms
+from utils import db
+
+
+def write_csv(path, rows, patients):
+    rng = np.random.default_rng(0)
+    pids = rng.integers(0, patients, rows)
+    pd.DataFrame({
+        "timestamp": [f"2025{(i % 12) + 1:02d}{(i % 28) + 1:02d}_{i % 240000:06d}" for i in range(rows)],
+        "patient_id": [f"PAT-{p:07d}" for p in pids],
+        "original_name": "report.pdf",
+        "stored_name": [f"PAT-{p:07d}_{i}.pdf" for i, p in enumerate(pids)],
+        "notes": "allergic to penicillin",
+    }).to_csv(path, index=False)
+
+
+def csv_lookup(path, patient_id):
+    df = pd.read_csv(path).fillna("")
+    df = df[df["patient_id"].astype(str).str.strip() == patient_id]
+    return df.sort_values("timestamp", ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--patients", type=int, default=None, help="default rows / 5")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    patients = args.patients or max(args.rows // 5, 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "history_index.csv")
+        db_path = os.path.join(tmp, "triage.db")
+        write_csv(csv_path, args.rows, patients)
+        db.init_db(db_path)
+
+        pid = "PAT-0000001"
+        csv_ms = median_ms(lambda: csv_lookup(csv_path, pid), max(args.repeat // 5, 3))
+
+        start = time.perf_counter()
+        imported = db.import_history_csv(csv_path, db_path)
+        print(f"imported {imported:,} of {args.rows:,} CSV rows in {time.perf_counter() - start:.2f}s")
+
+        table_ms = median_ms(lambda: db.get_history_files(pid, db_path), args.repeat)
+        print(f"patient lookup: CSV {csv_ms:.2f} ms, table {table_ms:.3f} ms "
+              f"({len(db.get_history_files(pid, db_path))} files)")
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Patient Records dashboard queries: one query per tile versus a single
+get_patient_summaries page (utils/db.py).
+
+"per tile" is the old page: every patient, then each patient's full
+visit list to read the latest one. "summaries" is a single page of
+get_patient_summaries. Uses the database builder from
+bench_visits_schema.py and migrates it first.
+
+    python benchmarks/bench_history_page.py --rows 1000000 --patients 5000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.bench_visits_schema import build
+from utils import db
+
+
+def per_tile(db_path, page_size):
+    patients = db.get_all_patients(db_path)[:page_size]
+    return [(pid, db.get_patient_visits(pid, db_path)[:1]) for pid, _ in patients]
+
+
+def summaries(db_path, page_size, after=None):
+    return db.get_patient_summaries(limit=page_size, after=after, db_path=db_path)
+
+
+def median_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[50, 100, 5000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "visits.db")
+        start = time.perf_counter()
+        build(db_path, args.rows, args.patients)
+        db.migrate(db_path)
+        print(f"built and migrated {args.rows:,} visits / {args.patients:,} patients "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        print(f"\n{'page size':>10} {'per tile ms':>12} {'summaries ms':>13} {'last page ms':>13}")
+        for size in args.page_sizes:
+            # Keyset cursor for the last page: the row just before it
+            skip = args.patients - size
+            last_after = summaries(db_path, skip)[-1] if skip > 0 else None
+            print(f"{size:10d} "
+                  f"{median_ms(lambda: per_tile(db_path, size), args.repeat):12.2f} "
+                  f"{median_ms(lambda: summaries(db_path, size), args.repeat):13.2f} "
+                  f"{median_ms(lambda: summaries(db_path, size, last_after), args.repeat):13.2f}")
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
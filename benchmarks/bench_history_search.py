@@ -0,0 +1,65 @@
+"""
+Patient ID search on the Patient Records dashboard (utils/db.py):
+get_patient_summaries and get_recent_visits with prefix and substring
+searches, on the first page and on a deep keyset page.
+
+Uses the database builder from bench_visits_schema.py (patient IDs
+PAT-0000000 ...) and migrates it first. Searches are typed in lower
+case to exercise the case-insensitive path.
+
+    python benchmarks/bench_history_search.py --rows 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.bench_history_page import median_ms
+from benchmarks.bench_visits_schema import build
+from utils import db
+
+SEARCHES = (
+    ("pat-000012", "prefix"),   # a handful of patients
+    ("pat-001", "prefix"),      # ~1% of patients
+    ("pat-", "prefix"),         # everyone
+    ("12345", "contains"),
+    ("77", "contains"),
+    ("zzz", "contains"),        # no match: full patients index walk
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--patients", type=int, default=None, help="default rows / 10")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=2000, help="rows skipped before the deep page")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    patients = args.patients or max(args.rows // 10, 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "visits.db")
+        start = time.perf_counter()
+        build(db_path, args.rows, patients)
+        db.migrate(db_path)
+        print(f"built and migrated {args.rows:,} visits / {patients:,} patients in {time.perf_counter() - start:.1f}s")
+
+        print(f"\n{'search':12} {'mode':9} {'tab':9} {'matches':>8} {'first ms':>9} {'deep ms':>9}")
+        for search, mode in (("", "prefix"), *SEARCHES):
+            for tab, fetch in (("patients", db.get_patient_summaries), ("visits", db.get_recent_visits)):
+                page = lambda limit, after=None: fetch(limit, search, mode, after=after, db_path=db_path)
+                skipped = page(args.depth)
+                deep_after = skipped[-1] if len(skipped) == args.depth else None
+                first_ms = median_ms(lambda: page(args.page_size), args.repeat)
+                deep_ms = median_ms(lambda: page(args.page_size, deep_after), args.repeat) if deep_after else float("nan")
+                matches = f"{len(skipped)}+" if deep_after else str(len(skipped))
+                print(f"{search or '(none)':12} {mode:9} {tab:9} {matches:>8} {first_ms:9.2f} {deep_ms:9.2f}")
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Full-text search over visit report text (utils/db.py, migration 6).
+
+Builds a pre-FTS database whose visits carry synthetic report text,
+times the migration's backfill, then search_notes for rare, common and
+prefix queries, and the cost the index triggers add to save_visit.
+
+    python benchmarks/bench_note_search.py --rows 200000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.bench_history_page import median_ms
+from utils import db
+
+WORDS = (
+    "patient presents with history of hypertension diabetes asthma chest pain fever cough "
+    "shortness breath headache nausea vomiting dizziness fatigue normal abnormal mild moderate "
+    "severe chronic acute daily mg tablet dose blood pressure heart rate temperature examination "
+    "left right lung clear sounds regular rhythm review follow up weeks months years"
+).split()
+DRUGS = ("metformin", "lisinopril", "atorvastatin", "amlodipine", "salbutamol", "omeprazole", "aspirin", "warfarin")
+DRUG_WEIGHTS = (0.30, 0.25, 0.20, 0.12, 0.08, 0.04, 0.009, 0.001)
+
+
+def build(db_path, rows, note_words, batch=50000):
+    """Pre-migration-6 database: visits with report text, no FTS tables yet."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(db.CREATE_PATIENTS)
+    conn.execute(db.CREATE_VISITS)
+    conn.execute("ALTER TABLE visits ADD COLUMN ts_epoch INTEGER")  # migration 3
+    conn.execute(f"PRAGMA user_version = {db.MIGRATIONS.index(db._add_note_search)}")
+    rng = np.random.default_rng(0)
+    for start in range(0, rows, batch):
+        n = min(batch, rows - start)
+        words = np.asarray(WORDS)[rng.integers(0, len(WORDS), (n, note_words))]
+        drugs = np.asarray(DRUGS)[rng.choice(len(DRUGS), n, p=DRUG_WEIGHTS)]
+        conn.executemany(
+            "INSERT INTO visits (patient_id, timestamp, risk, pdf_note) VALUES (?, '2026-01-01 10:00:00', 'Low', ?)",
+            ((f"PAT-{(start + i) % max(rows // 10, 1):07d}", " ".join(w[:10]) + f" {d} " + " ".join(w[10:]))
+             for i, (w, d) in enumerate(zip(words.tolist(), drugs.tolist()))),
+        )
+        conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--note-words", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "notes.db")
+        start = time.perf_counter()
+        build(db_path, args.rows, args.note_words)
+        print(f"built {args.rows:,} visits with report text in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        db.migrate(db_path)
+        print(f"migration 6 (FTS backfill) in {time.perf_counter() - start:.1f}s, "
+              f"database {os.path.getsize(db_path) / 1e6:.0f} MB")
+
+        print(f"\n{'query':22} {'hits':>6} {'ms':>8}")
+        for text in ("warfarin", "warf*", "aspirin daily", "metformin", "lisinopril chest pain", "nothingmatches"):
+            hits = len(db.search_notes(text, limit=20, db_path=db_path))
+            ms = median_ms(lambda: db.search_notes(text, limit=20, db_path=db_path), args.repeat)
+            print(f"{text:22} {hits:6d} {ms:8.2f}")
+
+        note = "Patient on warfarin 5 mg daily " * 10
+        for label, pdf_note in (("save_visit, no report", ""), ("save_visit with report", note)):
+            ms = median_ms(lambda: db.save_visit("BENCH", {"timestamp": "2026-01-01 10:00:00"}, {"risk": "Low"},
+                                                 pdf_note=pdf_note, db_path=db_path), args.repeat * 5)
+            print(f"{label:22} {'':6} {ms:8.2f}")
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Report text extraction on the intake page (utils/pdf_text.py): parsing
+a synthetic multi-page report in-process with PyPDF2, the background
+page-parallel extraction (time until the first pages show and until it
+is done), a rerun that hits the in-memory cache, another process that
+hits the disk cache, and an oversized report cut off by the deadline.
+
+    python benchmarks/bench_pdf_text.py --pages 40
+"""
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.bench_history_page import median_ms
+from utils import pdf_text
+
+LINES = (
+    "Patient reviewed in clinic. Blood pressure 142/91 mmHg, heart rate 88 bpm.",
+    "Temperature 37.9 C, SpO2 96% on room air, respiratory rate 18 /min.",
+    "Fasting glucose 7.4 mmol/L. Continue metformin 500 mg twice daily.",
+    "History of hypertension and type 2 diabetes. No known drug allergies.",
+)
+
+
+def make_report(pages, lines_per_page=45):
+    """A text PDF of `pages` pages, built with ReportLab."""
+    out = io.BytesIO()
+    c = canvas.Canvas(out, pagesize=A4)
+    for page in range(pages):
+        y = 800
+        c.drawString(40, y, f"Medical report - page {page + 1}")
+        for i in range(lines_per_page):
+            y -= 16
+            c.drawString(40, y, LINES[(page + i) % len(LINES)])
+        c.showPage()
+    c.save()
+    return out.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--huge-pages", type=int, default=300)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    data = make_report(args.pages)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        text = pdf_text.parse_pdf(data)
+        parse_ms = (time.perf_counter() - start) * 1000
+        print(f"{args.pages}-page report, {len(data) / 1024:.0f} KB, {len(text):,} chars of text")
+        print(f"in-process parse           {parse_ms:8.1f} ms")
+
+        start = time.perf_counter()
+        job = pdf_text.start_extraction(data, cache_dir=cache_dir)
+        while not job.pages_done and not job.wait(0.001):
+            pass
+        first_ms = (time.perf_counter() - start) * 1000
+        job.wait()
+        print(f"background, first pages   {first_ms:8.1f} ms")
+        print(f"background, all pages     {(time.perf_counter() - start) * 1000:8.1f} ms ({pdf_text.WORKERS} workers)")
+        sha256 = job.sha256
+
+        ms = median_ms(lambda: pdf_text.extract_text(data, cache_dir=cache_dir), args.repeat)
+        print(f"rerun, hash + memory hit   {ms:8.2f} ms")
+        ms = median_ms(lambda: pdf_text.extract_text(data, sha256, cache_dir=cache_dir), args.repeat)
+        print(f"rerun, known digest        {ms:8.3f} ms")
+
+        def other_process():
+            pdf_text.clear_memory()
+            return pdf_text.extract_text(data, cache_dir=cache_dir)
+
+        ms = median_ms(other_process, args.repeat)
+        print(f"other process, disk hit    {ms:8.2f} ms")
+
+        start = time.perf_counter()
+        job = pdf_text.start_extraction(make_report(args.huge_pages), cache_dir=cache_dir, timeout=args.timeout)
+        job.wait()
+        print(f"{args.huge_pages}-page report, {args.timeout:g}s deadline: {job.pages_done} of {job.page_count} pages "
+              f"in {time.perf_counter() - start:.1f}s, timed out: {job.timed_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Speed benchmark: utils.risk_rules.evaluate_safety_rules against the
+scalar apply_safety_rules, on the synthetic dataset resampled to a
+million rows. Parity is tested in tests/test_rule_parity.py.
+
+    python benchmarks/bench_risk_rules.py [--rows N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.risk_rules import apply_safety_rules, evaluate_safety_rules, safety_overrides
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "synthetic_triage_data.csv")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = pd.read_csv(DATA_PATH).sample(args.rows, replace=True, random_state=0)
+    columns = [df[c].to_numpy() for c in ("age", "bp", "hr", "temp", "symptom", "pre_existing")]
+
+    start = time.perf_counter()
+    expected = [apply_safety_rules(*row) for row in zip(*columns)]
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    got = safety_overrides(evaluate_safety_rules(*columns))
+    vector_s = time.perf_counter() - start
+
+    assert list(got) == expected
+    print(f"scalar: {scalar_s:.3f}s  vectorized: {vector_s:.3f}s  "
+          f"speed-up: {scalar_s / vector_s:.0f}x ({len(df):,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Per-worker memory: private model copies vs the shared published model.
+
+Publishes the risk model to a temporary shared directory, then starts
+--workers processes in each mode. Every worker loads or attaches the
+model and reports the memory that added, read from
+/proc/self/smaps_rollup (Linux), then scores the synthetic dataset to
+check its predictions. PSS (proportional set size) splits
+shared pages between the processes that map them, so it shows what
+each extra worker really costs. Also checks that a newly published
+version is picked up by an attached client.
+
+    python benchmarks/bench_shared_model.py --workers 4
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.batch_triage import model_feature_order
+from utils.model_registry import MODEL_PATH, get_encoders, get_model
+from utils.shared_model import SharedModelClient, attach, publish_model
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "synthetic_triage_data.csv")
+
+
+def memory_kb():
+    """{"Rss": kB, "Pss": kB, ...} for this process."""
+    stats = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                stats[parts[0].rstrip(":")] = int(parts[1])
+    return stats
+
+
+def encoded_features(model, encoders):
+    df = pd.read_csv(DATA_PATH)
+    for col in ("gender", "symptom", "pre_existing"):
+        df[col] = encoders[col].transform(df[col])
+    return df[model_feature_order(model)]
+
+
+def worker(mode, shared_dir, X, start, results):
+    import joblib
+    import sklearn.ensemble  # noqa: F401  (import cost is not model cost)
+
+    start.wait()
+    base = memory_kb()
+    if mode == "private":
+        model = joblib.load(MODEL_PATH)
+    else:
+        model = attach(shared_dir)["model"]
+    # Touch every table once so the shared pages are actually mapped in
+    model.predict_proba(X.iloc[:1])
+    loaded = memory_kb()
+    proba = model.predict_proba(X)
+    results.put((mode, loaded["Rss"] - base["Rss"], loaded["Pss"] - base["Pss"], proba))
+
+
+def run(mode, workers, shared_dir, X):
+    ctx = mp.get_context("spawn")
+    start, results = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, shared_dir, X, start, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    start.set()
+    out = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("This benchmark reads /proc/self/smaps_rollup (Linux only).")
+
+    model, encoders = get_model(), get_encoders()
+    X = encoded_features(model, encoders)
+    expected = model.predict_proba(X)
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        publish_model(model, encoders, shared_dir, version="v1")
+
+        for mode in ("private", "shared"):
+            out = run(mode, args.workers, shared_dir, X)
+            for _, _, _, proba in out:
+                assert np.array_equal(proba, expected), f"{mode} predictions differ"
+            rss = np.mean([o[1] for o in out]) / 1024
+            pss = np.mean([o[2] for o in out]) / 1024
+            print(f"{mode:>7}: {args.workers} workers  model RSS +{rss:6.1f} MB/worker  PSS +{pss:6.1f} MB/worker")
+
+        client = SharedModelClient(shared_dir, check_interval=0)
+        assert client.get()["version"] == "v1"
+        publish_model(model, encoders, shared_dir, version="v2")
+        assert client.get()["version"] == "v2"
+        print("hot swap: attached client moved from v1 to v2")
+
+
+if __name__ == "__main__":
+    main()
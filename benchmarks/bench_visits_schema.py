@@ -0,0 +1,173 @@
+"""
+Visits query times before and after the schema migrations in utils/db.py.
+
+Builds a pre-migration database (no indexes, TEXT timestamps only) with
+--rows visits, times the app's per-patient and time-range queries,
+migrates it while a concurrent writer keeps saving visits (reporting
+that writer's worst latency), then times the same queries again.
+
+    python benchmarks/bench_visits_schema.py --rows 1000000
+    python benchmarks/bench_visits_schema.py --rows 10000000 --db /tmp/visits10m.db
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils import db
+
+SYMPTOMS = ["Chest Pain", "Cough", "Fever", "Seizure", "Severe Headache", "Shortness of Breath"]
+RISKS = ["High", "Medium", "Low"]
+START_EPOCH = 1735689600  # 2025-01-01
+SPAN_SECONDS = 2 * 365 * 86400
+
+
+def build(db_path, rows, patients, batch=200000):
+    """Pre-migration database: base tables only, user_version 0."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(db.CREATE_PATIENTS)
+    conn.execute(db.CREATE_VISITS)
+    conn.executemany(
+        "INSERT INTO patients VALUES (?, ?)",
+        ((f"PAT-{p:07d}", "2025-01-01 00:00:00") for p in range(patients)),
+    )
+    rng = np.random.default_rng(0)
+    for start in range(0, rows, batch):
+        n = min(batch, rows - start)
+        # Visits arrive in time order, evenly spread over two years
+        epochs = START_EPOCH + np.arange(start, start + n) * (SPAN_SECONDS // max(rows, 1))
+        stamps = np.datetime_as_string(epochs.astype("datetime64[s]"), unit="s")
+        pids = rng.integers(0, patients, n)
+        symptom = rng.integers(0, len(SYMPTOMS), n)
+        risk = rng.integers(0, len(RISKS), n)
+        conn.executemany(
+            "INSERT INTO visits (patient_id, timestamp, age, gender, bp, hr, temp, symptom, pre_existing, "
+            "risk, confidence, department, priority, hospital_load, est_wait, pdf_note) "
+            "VALUES (?, ?, 50, 'Female', 120, 80, 98.6, ?, 'None', ?, 88.0, 'General Medicine', 'Standard', 50, 30, '')",
+            (
+                (f"PAT-{p:07d}", str(t).replace("T", " "), SYMPTOMS[s], RISKS[r])
+                for p, t, s, r in zip(pids.tolist(), stamps.tolist(), symptom.tolist(), risk.tolist())
+            ),
+        )
+        conn.commit()
+    conn.close()
+
+
+def median_ms(conn, sql, param_sets):
+    times = []
+    for params in param_sets:
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1e3
+
+
+def time_queries(db_path, patients, migrated, repeat):
+    rng = np.random.default_rng(1)
+    pids = [f"PAT-{p:07d}" for p in rng.integers(0, patients, repeat)]
+    days = rng.integers(0, SPAN_SECONDS // 86400 - 1, repeat)
+    conn = db.connect(db_path)
+
+    results = {
+        "patient visits": median_ms(conn, db.SELECT_PATIENT_VISITS, [(p,) for p in pids]),
+        "latest visit": median_ms(
+            conn,
+            "SELECT risk, confidence, department, priority FROM visits WHERE patient_id = ? ORDER BY id DESC LIMIT 1",
+            [(p,) for p in pids],
+        ),
+        "visit by patient+timestamp": median_ms(
+            conn,
+            "SELECT id FROM visits WHERE patient_id = ? AND timestamp = ?",
+            [(p, "2025-06-01 12:00:00") for p in pids],
+        ),
+    }
+    day_ranges = [(START_EPOCH + int(d) * 86400, START_EPOCH + (int(d) + 1) * 86400) for d in days]
+    if migrated:
+        results["one-day range"] = median_ms(conn, db.SELECT_VISITS_BETWEEN, [(a, b, 1000) for a, b in day_ranges])
+    else:
+        iso = lambda e: time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(e))
+        results["one-day range"] = median_ms(
+            conn,
+            db.SELECT_VISITS_BETWEEN.replace("ts_epoch >= ? AND ts_epoch < ?", "timestamp >= ? AND timestamp < ?")
+                                    .replace("ORDER BY ts_epoch", "ORDER BY timestamp"),
+            [(iso(a), iso(b), 1000) for a, b in day_ranges],
+        )
+    conn.close()
+    return results
+
+
+# A visit saved by an app instance still running the pre-migration code
+LIVE_VISIT = "INSERT INTO visits (patient_id, timestamp, age, risk) VALUES (?, '2026-01-01 10:00:00', 40, 'Low')"
+
+
+def migrate_under_load(db_path):
+    """Runs migrate() while another thread saves visits; returns (seconds, writes, worst write ms)."""
+    stop = threading.Event()
+    latencies = []
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            start = time.perf_counter()
+            db.write(lambda conn: conn.execute(LIVE_VISIT, (f"LIVE-{i % 100}",)), db_path)
+            latencies.append(time.perf_counter() - start)
+            i += 1
+            time.sleep(0.005)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    start = time.perf_counter()
+    db.migrate(db_path, log=lambda m: print(f"  {m}"))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    return elapsed, len(latencies), max(latencies) * 1e3 if latencies else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--patients", type=int, default=None, help="default rows / 10")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--db", default=None, help="database path (default: temporary file)")
+    args = parser.parse_args()
+    patients = args.patients or max(args.rows // 10, 1)
+
+    tmp = None
+    db_path = args.db
+    if db_path is None:
+        tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(tmp.name, "visits.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    start = time.perf_counter()
+    build(db_path, args.rows, patients)
+    print(f"built {args.rows:,} visits / {patients:,} patients in {time.perf_counter() - start:.1f}s")
+
+    before = time_queries(db_path, patients, migrated=False, repeat=max(args.repeat // 10, 3))
+    print("migrating under a concurrent writer:")
+    seconds, writes, worst = migrate_under_load(db_path)
+    print(f"  done in {seconds:.1f}s; concurrent writer saved {writes} visits, worst latency {worst:.0f} ms")
+    after = time_queries(db_path, patients, migrated=True, repeat=args.repeat)
+
+    print(f"\n{'query':28} {'before ms':>10} {'after ms':>10}")
+    for name in before:
+        print(f"{name:28} {before[name]:10.3f} {after[name]:10.3f}")
+
+    db.close_all()
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
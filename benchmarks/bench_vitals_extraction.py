@@ -0,0 +1,229 @@
+"""
+Vital-sign extraction from report text (utils/vitals_extraction.py)
+against the three re.search calls the intake page used before.
+
+Generates a synthetic corpus of dated clinic reports with known
+readings, written in varied phrasings and units and mixed with dates,
+doses and ratios that look like blood pressures. Reports:
+
+    accuracy   precision / recall of every reading, and how often the
+               first BP / HR / temp is right (all the old code kept)
+    cases      hand-written phrasings outside the generator (CASES),
+               each listed when it is misread
+    speed      reports and MB per second for both, and for the same
+               alternatives as one combined regex
+
+    python benchmarks/bench_vitals_extraction.py --reports 5000
+    python benchmarks/bench_vitals_extraction.py --write-corpus /tmp/vitals_corpus
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.vitals_extraction import BRANCHES, extract_vitals
+
+# All BRANCHES as one plain IGNORECASE regex, tried at every character with finditer
+COMBINED = re.compile("|".join(alt for _, alt in BRANCHES), re.IGNORECASE)
+
+FILLER = (
+    "Patient seen in outpatient clinic, accompanied by daughter.",
+    "Continue paracetamol 500 mg, 1/2 tablet at night if needed.",
+    "Co-codamol 30/500 prescribed, review in 2 weeks.",
+    "No chest pain. Mild cough for 3 days, no sputum.",
+    "Lives alone, independent with activities of daily living.",
+    "Bloods sent: FBC, U&E, LFT. Ratio 2/1 on previous film.",
+    "Call 555-0142 to rebook. Seen at 10:30 by the nurse.",
+    "History of hypertension and type 2 diabetes mellitus.",
+)
+MONTH_NAMES = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def date_text(rng):
+    y, m, d = rng.randint(2015, 2026), rng.randint(1, 12), rng.randint(1, 28)
+    return rng.choice((
+        f"{y}-{m:02d}-{d:02d}", f"{d:02d}/{m:02d}/{y}", f"{d}/{m}/{y % 100:02d}",
+        f"{d} {MONTH_NAMES[m - 1]} {y}", f"{MONTH_NAMES[m - 1]} {d}, {y}",
+    ))
+
+
+def number_text(rng, value):
+    """A decimal, sometimes written with a decimal comma."""
+    text = f"{value:g}"
+    return text.replace(".", ",") if rng.random() < 0.2 else text
+
+
+def vital_text(rng, kind):
+    """(phrase, value) for one reading of the given kind."""
+    if kind == "bp":
+        systolic = rng.randint(85, 210)
+        diastolic = rng.randint(45, min(systolic - 10, 130))
+        label = rng.choice(("BP", "B.P.", "Blood pressure", "blood pressure was", "BP:"))
+        unit = rng.choice(("", " mmHg", "mmHg"))
+        return f"{label} {systolic}/{diastolic}{unit}", (systolic, diastolic)
+    if kind == "hr":
+        value = rng.randint(40, 160)
+        label = rng.choice(("HR", "Heart rate", "pulse", "Pulse rate:", "HR:"))
+        space = "" if label.endswith(":") and rng.random() < 0.5 else " "
+        return f"{label}{space}{value}{rng.choice(('', ' bpm', 'bpm', ' beats/min', '/min'))}", value
+    if kind == "temp":
+        if rng.random() < 0.5:
+            value = round(rng.uniform(35.0, 40.5), 1)
+            unit = rng.choice((" C", "°C", " degrees C", ""))
+        else:
+            value = round(rng.uniform(95.0, 105.0), 1)
+            unit = rng.choice((" F", "°F", ""))
+        return f"{rng.choice(('Temp', 'Temperature', 'temp.', 'Temperature:'))} {number_text(rng, value)}{unit}", value
+    if kind == "spo2":
+        value = rng.randint(80, 100)
+        label = rng.choice(("SpO2", "O2 sat", "Oxygen saturation", "sats", "SpO2:"))
+        return f"{label} {value}{rng.choice(('%', ' %', ''))}", value
+    if kind == "rr":
+        value = rng.randint(8, 40)
+        label = rng.choice(("RR", "Respiratory rate", "resp rate", "RR:"))
+        space = "" if label.endswith(":") and rng.random() < 0.5 else " "
+        return f"{label}{space}{value}{rng.choice(('', '/min', ' breaths/min', 'breaths/min'))}", value
+    mmol = rng.random() < 0.5
+    value = round(rng.uniform(3.0, 25.0), 1) if mmol else rng.randint(60, 450)
+    label = rng.choice(("Glucose", "Fasting glucose", "Blood sugar", "CBG", "RBS:"))
+    return f"{label} {number_text(rng, value)} {'mmol/L' if mmol else 'mg/dL'}", value
+
+
+def make_report(rng, visits=3):
+    """(text, truth) where truth lists (kind, value) in order."""
+    parts, truth = [], []
+    for _ in range(visits):
+        parts.append(f"Review on {date_text(rng)}.")
+        parts.extend(rng.sample(FILLER, 2))
+        for kind in rng.sample(("bp", "hr", "temp", "spo2", "rr", "glucose"), rng.randint(2, 6)):
+            phrase, value = vital_text(rng, kind)
+            parts.append(phrase + rng.choice((".", ",", ";")))
+            truth.append((kind, value))
+        parts.append(rng.choice(FILLER))
+    return " ".join(parts), truth
+
+
+def make_corpus(reports, seed=0):
+    rng = random.Random(seed)
+    return [make_report(rng, rng.randint(1, 5)) for _ in range(reports)]
+
+
+# Phrasings written by hand rather than generated: (text, readings expected in order)
+CASES = (
+    ("HR:110bpm", [("hr", 110)]),
+    ("pulse 110bpm, regular", [("hr", 110)]),
+    ("Heart rate-72 beats per minute", [("hr", 72)]),
+    ("temperature 38,5 C", [("temp", 38.5)]),
+    ("Temp 37,2°C, BP 128/84", [("temp", 37.2), ("bp", (128, 84))]),
+    ("temp. 101.4F", [("temp", 101.4)]),
+    ("RR:22/min", [("rr", 22)]),
+    ("resp rate 18breaths/min", [("rr", 18)]),
+    ("SpO2:96%", [("spo2", 96)]),
+    ("sats 94 % on air", [("spo2", 94)]),
+    ("fasting glucose 7,4 mmol/L", [("glucose", 7.4)]),
+    ("RBS 142mg/dL", [("glucose", 142)]),
+    ("BP 142/91mmHg, HR 88", [("bp", (142, 91)), ("hr", 88)]),
+    ("Seen 12/05/2024. BP 120/80", [("bp", (120, 80))]),
+    ("co-codamol 30/500, pulse 64", [("hr", 64)]),
+    ("glucose 1234", []),
+    ("SpO2 1000", []),
+    ("HR 1100 bpm", []),
+)
+
+
+def cases():
+    """(right, total, misread texts with what was read) over CASES."""
+    misread = []
+    for text, expected in CASES:
+        readings = [(r.kind, r.value) for r in extract_vitals(text)]
+        if readings != expected:
+            misread.append((text, readings))
+    return len(CASES) - len(misread), len(CASES), misread
+
+
+def old_detect(text):
+    """The intake page's previous extraction: first match of three patterns."""
+    detected = {}
+    bp_match = re.search(r'(\d{2,3})\s*/\s*(\d{2,3})', text)
+    hr_match = re.search(r'(heart\s*rate|hr)\s*[:\-]?\s*(\d{2,3})', text, re.I)
+    temp_match = re.search(r'(temperature|temp)\s*[:\-]?\s*(\d{2,3}(?:\.\d+)?)', text, re.I)
+    if bp_match:
+        detected["bp"] = (int(bp_match.group(1)), int(bp_match.group(2)))
+    if hr_match:
+        detected["hr"] = int(hr_match.group(2))
+    if temp_match:
+        detected["temp"] = float(temp_match.group(2))
+    return detected
+
+
+def accuracy(corpus):
+    found = expected = correct = 0
+    first_right = {"new": 0, "old": 0}
+    first_total = 0
+    for text, truth in corpus:
+        readings = [(r.kind, r.value) for r in extract_vitals(text)]
+        found += len(readings)
+        expected += len(truth)
+        remaining = list(truth)
+        for reading in readings:
+            if reading in remaining:
+                remaining.remove(reading)
+                correct += 1
+
+        for kind in ("bp", "hr", "temp"):
+            true_first = next((v for k, v in truth if k == kind), None)
+            if true_first is None:
+                continue
+            first_total += 1
+            first_right["new"] += next((v for k, v in readings if k == kind), None) == true_first
+            first_right["old"] += old_detect(text).get(kind) == true_first
+    return correct / max(found, 1), correct / max(expected, 1), first_right, first_total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reports", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write-corpus", default=None, help="directory to write the corpus (report_NNNNN.txt + truth.jsonl)")
+    args = parser.parse_args()
+    corpus = make_corpus(args.reports, args.seed)
+
+    if args.write_corpus:
+        os.makedirs(args.write_corpus, exist_ok=True)
+        with open(os.path.join(args.write_corpus, "truth.jsonl"), "w") as truth_file:
+            for i, (text, truth) in enumerate(corpus):
+                name = f"report_{i:05d}.txt"
+                with open(os.path.join(args.write_corpus, name), "w") as f:
+                    f.write(text)
+                truth_file.write(json.dumps({"file": name, "readings": truth}) + "\n")
+        print(f"wrote {len(corpus):,} reports to {args.write_corpus}")
+        return
+
+    precision, recall, first_right, first_total = accuracy(corpus)
+    print(f"{len(corpus):,} reports, {sum(len(t) for _, t in corpus):,} readings")
+    print(f"all readings: precision {precision:.3f}, recall {recall:.3f}")
+    print(f"first BP/HR/temp right: new {first_right['new'] / first_total:.3f}, "
+          f"old {first_right['old'] / first_total:.3f}")
+    right, total, misread = cases()
+    print(f"hand-written cases: {right} of {total} read right")
+    for text, readings in misread:
+        print(f"  misread {text!r}: {readings}")
+
+    texts = [text for text, _ in corpus]
+    megabytes = sum(len(t) for t in texts) / 1e6
+    for label, fn in (("old, 3 x re.search", old_detect), ("one combined regex", lambda t: list(COMBINED.finditer(t))),
+                      ("extract_vitals", extract_vitals)):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        seconds = time.perf_counter() - start
+        print(f"{label:20} {len(texts) / seconds:10,.0f} reports/s {megabytes / seconds:7.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Incremental retraining from the app's visits table.
+
+Each run reads only the visits added since the previous successful run
+(high-water mark on visits.id). It grows the current forest with
+warm_start: the existing trees are kept and new trees are fitted on the
+new visits plus a replay sample of the reference dataset, so every risk
+class is present and older patterns are not forgotten. The reference
+dataset is split as models/train_model.py split it (--base-test-size,
+--base-seed); replay is drawn from its training rows only. --max-trees
+drops the oldest trees to refresh the ensemble instead of only growing
+it.
+
+Labels are the clinician-assessed risk when one was recorded
+(visits.clinician_risk), otherwise the risk shown to the clinician.
+Visits decided by a safety override are skipped unless a clinician
+reviewed them, since the model did not make that decision.
+
+The candidate and the current model are scored on the same holdout,
+drawn only from rows the current model has neither labelled nor been
+trained on: clinician-reviewed visits and the reference dataset's test
+rows, which neither the base model nor any replay sample has seen.
+Unreviewed visits carry the current model's own prediction as their
+label and are used for training only; scoring on them would favour the
+current model.
+The candidate is published (versioned artifact, promoted to
+models/risk_model.pkl, and to the shared model directory when
+TRIAGE_SHARED_MODEL_DIR is set) only if its accuracy and High recall
+hold within --tolerance. The high-water mark only advances on publish,
+and only to the last visit read, so rejected visits are retried with
+more data on the next run.
+
+    python models/incremental_train.py
+    python models/incremental_train.py --db app/triage.db --add-trees 20 --max-trees 300
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.db import DB_PATH
+from utils.model_registry import ENCODER_PATH, MODEL_PATH, peak_rss_bytes
+from utils.shared_model import publish_model
+from utils.training import (
+    DATA_PATH,
+    TARGET,
+    VERSIONS_DIR,
+    encode_dataset,
+    DEFAULT_PARAMS,
+    evaluate_model,
+    read_dataset,
+    save_artifacts,
+)
+
+STATE_PATH = os.path.join(VERSIONS_DIR, "incremental_state.json")
+NUMERIC_COLUMNS = ("age", "bp", "hr", "temp")
+
+
+# -----------------------------
+# State
+# -----------------------------
+def load_state(path=STATE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"last_visit_id": 0, "version": None}
+
+
+def save_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+# -----------------------------
+# Data
+# -----------------------------
+def read_new_visits(db_path, after_id, chunksize=50000):
+    """
+    Labelled visits with id > after_id.
+
+    Returns:
+        (DataFrame with features, risk and reviewed, last id read).
+        The last id is that of the last row the query returned, not the
+        table's MAX(id): a visit skipped here (a safety override not yet
+        reviewed) or added while reading is read again on the next run.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(visits)")}
+        reviewed = "NULLIF(clinician_risk, '')" if "clinician_risk" in columns else "NULL"
+        override = "COALESCE(safety_override, 0)" if "safety_override" in columns else "0"
+        query = f"""
+            SELECT id, age, gender, bp, hr, temp, symptom, pre_existing,
+                   COALESCE({reviewed}, risk) AS risk,
+                   {reviewed} IS NOT NULL AS reviewed
+            FROM visits
+            WHERE id > ? AND ({override} = 0 OR {reviewed} IS NOT NULL)
+            ORDER BY id
+        """
+        chunks = list(pd.read_sql_query(query, conn, params=(after_id,), chunksize=chunksize))
+    finally:
+        conn.close()
+
+    if not chunks:
+        return pd.DataFrame(columns=["id", *NUMERIC_COLUMNS, "reviewed", TARGET]), after_id
+    df = pd.concat(chunks, ignore_index=True)
+    last_id = int(df["id"].iloc[-1]) if len(df) else after_id
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df.dropna(subset=list(NUMERIC_COLUMNS)), last_id
+
+
+def split_reference(path, test_size, seed):
+    """
+    The reference dataset, split as models/train_model.py splits it.
+
+    Returns:
+        (rows the base model was trained on, rows it never saw)
+    """
+    reference = read_dataset(path)
+    # ShuffleSplit depends only on the row count, so splitting positions matches splitting X, y
+    train_rows, test_rows = train_test_split(np.arange(len(reference)), test_size=test_size, random_state=seed)
+    return reference.iloc[train_rows].reset_index(drop=True), reference.iloc[test_rows].reset_index(drop=True)
+
+
+def encode_labelled(df, encoders):
+    """
+    Encodes rows whose label the model knows; other labels are dropped.
+
+    Returns:
+        (X, y, reviewed): reviewed is a bool array marking clinician-assessed labels
+    """
+    known = df[TARGET].isin(list(encoders[TARGET].classes_))
+    df = df[known].reset_index(drop=True)
+    X, y, _ = encode_dataset(df, encoders)
+    return X, y, df["reviewed"].to_numpy(dtype=bool)
+
+
+def split(X, y, test_size, seed):
+    """train_test_split, keeping every row for training when there are too few to split."""
+    if len(X) < 2:
+        return X, X.iloc[:0], y, y[:0]
+    return train_test_split(X, y, test_size=test_size, random_state=seed)
+
+
+# -----------------------------
+# Update
+# -----------------------------
+def grow_forest(model, X, y, add_trees, max_trees=None, n_jobs=-1):
+    """
+    Adds `add_trees` trees fitted on (X, y) to `model` with warm_start,
+    then drops the oldest trees beyond `max_trees`.
+    """
+    n_classes = len(model.classes_)
+    if len(np.unique(y)) != n_classes:
+        raise ValueError("Every risk class must appear in the update data (increase --replay-rows)")
+
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees, n_jobs=n_jobs)
+    model.fit(X, y)
+
+    if max_trees and len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+    model.set_params(warm_start=False, n_estimators=len(model.estimators_))
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally retrain the risk model from new visits.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--data", default=DATA_PATH, help="reference dataset used for replay")
+    parser.add_argument("--min-visits", type=int, default=50, help="skip the run below this many new visits")
+    parser.add_argument("--replay-rows", type=int, default=2000)
+    parser.add_argument("--holdout-rows", type=int, default=1000, help="reference rows in the holdout")
+    parser.add_argument("--base-test-size", type=float, default=0.2,
+                        help="--test-size the base model was trained with")
+    parser.add_argument("--base-seed", type=int, default=DEFAULT_PARAMS["random_state"],
+                        help="--seed the base model was trained with")
+    parser.add_argument("--add-trees", type=int, default=20)
+    parser.add_argument("--max-trees", type=int, default=None)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--tolerance", type=float, default=0.005)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--state", default=STATE_PATH)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    state = load_state(args.state)
+
+    visits, last_id = read_new_visits(args.db, state["last_visit_id"])
+    print(f"{len(visits):,} new labelled visits (id {state['last_visit_id']} .. {last_id}), "
+          f"{int(visits['reviewed'].sum()) if len(visits) else 0:,} clinician-reviewed")
+    if len(visits) < args.min_visits:
+        print(f"Fewer than {args.min_visits} new visits; nothing to do.")
+        return
+
+    # Fresh copies: the registry's cached objects are shared with the app
+    model = joblib.load(MODEL_PATH)
+    encoders = joblib.load(ENCODER_PATH)
+
+    X_new, y_new, reviewed = encode_labelled(visits, encoders)
+    reference_train, reference_test = split_reference(args.data, args.base_test_size, args.base_seed)
+    replay = reference_train.sample(n=min(args.replay_rows, len(reference_train)), random_state=args.seed)
+    holdout = reference_test.sample(n=min(args.holdout_rows, len(reference_test)), random_state=args.seed)
+    X_replay, y_replay, _ = encode_dataset(replay.reset_index(drop=True), encoders)
+    X_ref_test, y_ref_test, _ = encode_dataset(holdout.reset_index(drop=True), encoders)
+    del reference_train, reference_test
+
+    # Only independently labelled rows are held out (see the module docstring)
+    X_rev_train, X_rev_test, y_rev_train, y_rev_test = split(
+        X_new[reviewed], y_new[reviewed], args.test_size, args.seed
+    )
+    X_train = pd.concat([X_new[~reviewed], X_rev_train, X_replay], ignore_index=True)
+    y_train = np.concatenate([y_new[~reviewed], y_rev_train, y_replay])
+    X_test = pd.concat([X_rev_test, X_ref_test], ignore_index=True)
+    y_test = np.concatenate([y_rev_test, y_ref_test])
+    print(f"Holdout: {len(y_rev_test):,} clinician-reviewed visits + {len(y_ref_test):,} reference rows")
+
+    current = evaluate_model(model, X_test, y_test, encoders)
+    trees_before = len(model.estimators_)
+    fit_start = time.perf_counter()
+    model = grow_forest(model, X_train, y_train, args.add_trees, args.max_trees, args.n_jobs)
+    fit_seconds = time.perf_counter() - fit_start
+    candidate = evaluate_model(model, X_test, y_test, encoders)
+
+    print(f"Trees: {trees_before} -> {len(model.estimators_)} (fit {fit_seconds:.1f}s)")
+    print(f"Holdout accuracy: current {current['accuracy']:.4f}, candidate {candidate['accuracy']:.4f}")
+    print(f"Holdout High recall: current {current['recall']['High']:.4f}, "
+          f"candidate {candidate['recall']['High']:.4f}")
+
+    holds = (
+        candidate["accuracy"] >= current["accuracy"] - args.tolerance
+        and candidate["recall"]["High"] >= current["recall"]["High"] - args.tolerance
+    )
+    if not holds:
+        print("Candidate rejected: holdout metrics dropped beyond tolerance. Model unchanged.")
+        return
+
+    version, out_dir, _ = save_artifacts(
+        model,
+        encoders,
+        {
+            "parent_version": state.get("version"),
+            "incremental": {
+                "visit_ids": [state["last_visit_id"] + 1, last_id],
+                "new_visits": len(X_new),
+                "clinician_reviewed": int(visits["reviewed"].sum()),
+                "replay_rows": len(X_replay),
+                "holdout_rows": {"clinician_reviewed": len(y_rev_test), "reference": len(y_ref_test)},
+                "trees_added": args.add_trees,
+                "trees": len(model.estimators_),
+            },
+            "metrics": candidate,
+            "previous_metrics": current,
+            "timings": {"fit_seconds": round(fit_seconds, 3), "total_seconds": round(time.perf_counter() - start, 3)},
+            "peak_memory_bytes": peak_rss_bytes(),
+        },
+    )
+
+    shared_dir = os.environ.get("TRIAGE_SHARED_MODEL_DIR")
+    if shared_dir:
+        publish_model(model, encoders, shared_dir=shared_dir, version=version)
+
+    save_state({"last_visit_id": last_id, "version": version}, args.state)
+    print(f"Published model version {version} ({out_dir}) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
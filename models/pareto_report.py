@@ -0,0 +1,202 @@
+"""
+Accuracy-versus-cost report for candidate risk models.
+
+Candidates:
+    trained   fresh forests over a grid of tree counts and depths
+    pruned    the best k trees of the production forest
+              (ranked by each tree's accuracy on a validation split)
+    current   the production model itself
+
+For each candidate the report measures High-risk recall and accuracy
+on a held-out test split, single-row and batch latency (sklearn and
+CompiledForest, see utils/compiled_forest.py) and model bytes
+(pickled, and compiled node tables). The Pareto frontier keeps the
+candidates that no other candidate beats on latency, bytes and High
+recall together. The recommendation is the smallest frontier model
+whose High recall is within --tolerance of the production model.
+
+The split is the one models/train_model.py uses (test_size 0.2,
+random_state 42). Its test part is halved into validation (used only
+to rank trees for pruning) and test.
+
+    python models/pareto_report.py
+    python models/pareto_report.py --trees 10 25 50 100 --depths 6 10 none --out pareto.json
+"""
+
+import argparse
+import copy
+import json
+import os
+import pickle
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.compiled_forest import compile_forest
+from utils.encoding import compile_encoders
+from utils.model_registry import ENCODER_PATH, MODEL_PATH
+from utils.training import DATA_PATH, TARGET, encode_dataset, read_dataset, train_forest
+
+
+# -----------------------------
+# Measurements
+# -----------------------------
+def median_seconds(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def high_recall(y_true, y_pred, high):
+    positives = y_true == high
+    return float((y_pred[positives] == high).mean()) if positives.any() else 0.0
+
+
+def measure(name, kind, model, X_test, y_test, high, single_repeat, batch_rows):
+    """Metrics, latency and size for one candidate."""
+    model.set_params(n_jobs=None)  # latency of the serving path, not of a thread pool
+    forest = compile_forest(model)
+    y_pred = model.predict(X_test)
+
+    row = X_test.iloc[[0]]
+    row_values = X_test.to_numpy()[0]
+    batch = X_test.sample(n=batch_rows, replace=len(X_test) < batch_rows, random_state=0)
+
+    return {
+        "name": name,
+        "kind": kind,
+        "n_trees": len(model.estimators_),
+        "max_depth": int(max(e.tree_.max_depth for e in model.estimators_)),
+        "n_nodes": int(sum(e.tree_.node_count for e in model.estimators_)),
+        "high_recall": high_recall(y_test, y_pred, high),
+        "accuracy": float((y_pred == y_test).mean()),
+        "single_ms_sklearn": median_seconds(lambda: model.predict_proba(row), single_repeat) * 1e3,
+        "single_ms_compiled": median_seconds(lambda: forest.predict_proba_one(row_values), single_repeat) * 1e3,
+        "batch_us_per_row_sklearn": median_seconds(lambda: model.predict_proba(batch), 3) / batch_rows * 1e6,
+        "batch_us_per_row_compiled": median_seconds(lambda: forest.predict_proba(batch), 3) / batch_rows * 1e6,
+        "pickle_bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)),
+        "compiled_bytes": int(forest.nbytes),
+    }
+
+
+# -----------------------------
+# Candidates
+# -----------------------------
+def prune_forest(model, X_val, y_val, k):
+    """Copy of `model` keeping the k trees with the best validation accuracy."""
+    X_val = np.asarray(X_val, dtype=np.float32)
+    # Trees predict class indices; map them back through classes_
+    scores = [
+        float((model.classes_.take(tree.predict(X_val).astype(int)) == y_val).mean())
+        for tree in model.estimators_
+    ]
+    keep = np.argsort(scores, kind="stable")[::-1][:k]
+    pruned = copy.copy(model)
+    pruned.estimators_ = [model.estimators_[i] for i in sorted(keep)]
+    pruned.n_estimators = len(pruned.estimators_)
+    return pruned
+
+
+def pareto_frontier(rows, latency_key):
+    """Rows not dominated on (latency, pickle_bytes: lower better; high_recall: higher better)."""
+    def dominates(a, b):
+        no_worse = (
+            a[latency_key] <= b[latency_key]
+            and a["pickle_bytes"] <= b["pickle_bytes"]
+            and a["high_recall"] >= b["high_recall"]
+        )
+        better = (
+            a[latency_key] < b[latency_key]
+            or a["pickle_bytes"] < b["pickle_bytes"]
+            or a["high_recall"] > b["high_recall"]
+        )
+        return no_worse and better
+
+    return [r for r in rows if not any(dominates(o, r) for o in rows if o is not r)]
+
+
+def _depth(value):
+    return None if value.lower() == "none" else int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Accuracy-versus-latency Pareto report for risk models.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--model", default=MODEL_PATH, help="production model (pruning source and baseline)")
+    parser.add_argument("--encoders", default=ENCODER_PATH)
+    parser.add_argument("--trees", type=int, nargs="+", default=[10, 25, 50, 100, 150])
+    parser.add_argument("--depths", type=_depth, nargs="+", default=[6, 10, 14, None])
+    parser.add_argument("--prune-to", type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--latency", choices=["sklearn", "compiled"], default="sklearn",
+                        help="single-row latency used for the frontier")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="allowed High recall drop vs production")
+    parser.add_argument("--single-repeat", type=int, default=50)
+    parser.add_argument("--batch-rows", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="JSON report path (default: print only)")
+    args = parser.parse_args(argv)
+
+    production = joblib.load(args.model)
+    encoders = joblib.load(args.encoders)
+    high = int(compile_encoders(encoders)[TARGET].encode_one("High"))
+
+    X, y, _ = encode_dataset(read_dataset(args.data), encoders)
+    X_train, X_hold, y_train, y_hold = train_test_split(X, y, test_size=0.2, random_state=args.seed)
+    X_val, X_test, y_val, y_test = train_test_split(X_hold, y_hold, test_size=0.5, random_state=args.seed)
+
+    measure_args = (X_test, y_test, high, args.single_repeat, args.batch_rows)
+    rows = [measure("current", "current", production, *measure_args)]
+
+    for k in args.prune_to:
+        if k < len(production.estimators_):
+            pruned = prune_forest(production, X_val, y_val, k)
+            rows.append(measure(f"pruned-{k}", "pruned", pruned, *measure_args))
+
+    for n_trees in args.trees:
+        for depth in args.depths:
+            model = train_forest(X_train, y_train, n_estimators=n_trees, max_depth=depth, random_state=args.seed)
+            rows.append(measure(f"rf-{n_trees}x{depth or 'full'}", "trained", model, *measure_args))
+
+    latency_key = f"single_ms_{args.latency}"
+    frontier = pareto_frontier(rows, latency_key)
+    frontier_names = {r["name"] for r in frontier}
+    for r in rows:
+        r["pareto"] = r["name"] in frontier_names
+
+    baseline = rows[0]
+    eligible = [r for r in frontier if r["high_recall"] >= baseline["high_recall"] - args.tolerance]
+    recommended = min(eligible, key=lambda r: (r["pickle_bytes"], r[latency_key]))["name"] if eligible else None
+
+    table = pd.DataFrame(rows).sort_values(latency_key)
+    columns = ["name", "n_trees", "max_depth", "high_recall", "accuracy", "single_ms_sklearn",
+               "single_ms_compiled", "batch_us_per_row_sklearn", "pickle_bytes", "pareto"]
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(table[columns].to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print(f"\nPareto frontier ({latency_key}, pickle_bytes, high_recall): "
+          + ", ".join(r["name"] for r in sorted(frontier, key=lambda r: r[latency_key])))
+    print(f"Recommended (smallest frontier model within {args.tolerance} High recall of production): {recommended}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "data": os.path.abspath(args.data),
+                "test_rows": len(y_test),
+                "latency_metric": latency_key,
+                "tolerance": args.tolerance,
+                "recommended": recommended,
+                "frontier": [r["name"] for r in frontier],
+                "candidates": rows,
+            }, f, indent=2)
+        print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,113 @@
-import pandas as pd
-import joblib
+"""
+Trains the risk model.
+
+    python models/train_model.py
+    python models/train_model.py --data data/triage_10m.parquet --max-samples 0.25
+
+Writes models/versions/<version>/ (model, encoders, metadata.json) and
+promotes it to models/risk_model.pkl and models/label_encoders.pkl
+unless --no-promote is given.
+"""
+
+import argparse
+import os
+import sys
+import time
+
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report, confusion_matrix
-
-# Load dataset
-df = pd.read_csv("../data/synthetic_triage_data.csv")
-
-# Encode categorical variables
-le_gender = LabelEncoder()
-le_symptom = LabelEncoder()
-le_condition = LabelEncoder()
-le_risk = LabelEncoder()
-
-df["gender"] = le_gender.fit_transform(df["gender"])
-df["symptom"] = le_symptom.fit_transform(df["symptom"])
-df["pre_existing"] = le_condition.fit_transform(df["pre_existing"])
-df["risk"] = le_risk.fit_transform(df["risk"])
-
-# Features & target
-X = df.drop(["patient_id", "risk"], axis=1)
-y = df["risk"]
-
-# Split
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
 
-# Train model
-model = RandomForestClassifier(
-    n_estimators=150,
-    random_state=42
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.model_registry import peak_rss_bytes
+from utils.training import (
+    DATA_PATH,
+    DEFAULT_CHUNKSIZE,
+    DEFAULT_PARAMS,
+    encode_dataset,
+    evaluate_model,
+    read_dataset,
+    save_artifacts,
+    train_forest,
 )
 
-model.fit(X_train, y_train)
 
-# Evaluate
-y_pred = model.predict(X_test)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the triage risk model.")
+    parser.add_argument("--data", default=DATA_PATH, help="training .csv or .parquet")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--n-estimators", type=int, default=DEFAULT_PARAMS["n_estimators"])
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--max-samples", type=float, default=None,
+                        help="bootstrap sample per tree, as a fraction of the training rows")
+    parser.add_argument("--n-jobs", type=int, default=DEFAULT_PARAMS["n_jobs"])
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=DEFAULT_PARAMS["random_state"])
+    parser.add_argument("--version", default=None)
+    parser.add_argument("--no-promote", action="store_true")
+    args = parser.parse_args(argv)
+
+    timings = {}
+
+    # Load dataset
+    start = time.perf_counter()
+    df = read_dataset(args.data, chunksize=args.chunksize)
+    X, y, encoders = encode_dataset(df)
+    del df
+    timings["load_seconds"] = round(time.perf_counter() - start, 3)
+
+    # Split
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=args.test_size, random_state=args.seed
+    )
+    del X, y
+
+    # Train model
+    params = {
+        "n_estimators": args.n_estimators,
+        "max_depth": args.max_depth,
+        "max_samples": args.max_samples,
+        "n_jobs": args.n_jobs,
+        "random_state": args.seed,
+    }
+    start = time.perf_counter()
+    model = train_forest(X_train, y_train, **params)
+    timings["fit_seconds"] = round(time.perf_counter() - start, 3)
+
+    # Evaluate
+    start = time.perf_counter()
+    metrics = evaluate_model(model, X_test, y_test, encoders)
+    timings["evaluate_seconds"] = round(time.perf_counter() - start, 3)
+
+    print("Confusion Matrix:")
+    print(metrics["confusion_matrix"])
 
-print("Confusion Matrix:")
-print(confusion_matrix(y_test, y_pred))
+    print("\nClassification Report:")
+    print(metrics["report"])
 
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred))
+    # Save model and encoders
+    version, out_dir, metadata = save_artifacts(
+        model,
+        encoders,
+        {
+            "data": os.path.abspath(args.data),
+            "train_rows": len(X_train),
+            "test_rows": len(X_test),
+            "params": params,
+            "metrics": metrics,
+            "timings": timings,
+            "peak_memory_bytes": peak_rss_bytes(),
+        },
+        version=args.version,
+        promote=not args.no_promote,
+    )
 
-# Save model
-joblib.dump(model, "risk_model.pkl")
+    print(f"\nRows: {len(X_train):,} train / {len(X_test):,} test")
+    print(f"Wall time: load {timings['load_seconds']}s, fit {timings['fit_seconds']}s, "
+          f"evaluate {timings['evaluate_seconds']}s")
+    print(f"Peak memory: {metadata['peak_memory_bytes'] / 1e6:.1f} MB")
+    print(f"Model size: {metadata['model_bytes'] / 1e6:.1f} MB")
+    print(f"\nModel version {version} saved to {out_dir}"
+          + ("" if args.no_promote else " and promoted"))
 
-# Save encoders
-joblib.dump({
-    "gender": le_gender,
-    "symptom": le_symptom,
-    "pre_existing": le_condition,
-    "risk": le_risk
-}, "label_encoders.pkl")
 
-print("\nModel and encoders saved successfully!")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
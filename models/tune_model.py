@@ -0,0 +1,262 @@
+"""
+Cross-validated hyperparameter search for the risk model.
+
+Every (configuration, fold) pair is an independent task on a process
+pool. Each worker loads and encodes the dataset once and fits
+single-threaded forests. Finished folds are cached on disk under a key
+built from the data hash, the configuration, the fold and the CV
+settings, so a rerun (or a wider search) only fits what is new.
+
+    python models/tune_model.py                              # default grid, 5 folds
+    python models/tune_model.py --search random --n-iter 20 --workers 8
+    python models/tune_model.py --grid grid.json --scoring recall_high
+
+--grid takes a JSON object of parameter lists, e.g.
+
+    {"n_estimators": [50, 150], "max_depth": [null, 12], "min_samples_leaf": [1, 5]}
+
+The report (JSON) lists every configuration with its per-fold and
+mean/std metrics, ranked by --scoring.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score, recall_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.encoding import compile_encoders
+from utils.model_registry import MODELS_DIR
+from utils.training import DATA_PATH, DEFAULT_PARAMS, TARGET, encode_dataset, read_dataset
+
+TUNING_DIR = os.path.join(MODELS_DIR, "tuning")
+CACHE_DIR = os.path.join(TUNING_DIR, "cache")
+REPORT_PATH = os.path.join(TUNING_DIR, "report.json")
+
+PARAM_GRID = {
+    "n_estimators": [50, 100, 150],
+    "max_depth": [None, 10, 20],
+    "min_samples_leaf": [1, 5],
+    "max_features": ["sqrt", None],
+}
+SCORES = ("accuracy", "f1_macro", "recall_high")
+
+
+# -----------------------------
+# Data
+# -----------------------------
+def load_encoded(path):
+    X, y, encoders = encode_dataset(read_dataset(path))
+    high = int(compile_encoders(encoders)[TARGET].encode_one("High"))
+    return X.to_numpy(), y, high
+
+
+def data_hash(X, y):
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def fold_key(data_digest, params, fold, n_folds, cv_seed):
+    payload = json.dumps({
+        "data": data_digest,
+        "params": params,
+        "fold": fold,
+        "n_folds": n_folds,
+        "cv_seed": cv_seed,
+        "sklearn": sklearn.__version__,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+# -----------------------------
+# Cache
+# -----------------------------
+def read_cached(cache_dir, key):
+    try:
+        with open(os.path.join(cache_dir, f"{key}.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_cached(cache_dir, key, result):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.json")
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp, path)
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+_worker_state = {}
+
+
+def _init_worker(data_path, n_folds, cv_seed):
+    X, y, high = load_encoded(data_path)
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=cv_seed)
+    _worker_state.update(X=X, y=y, high=high, folds=list(splitter.split(X, y)))
+
+
+def run_fold(params, fold):
+    """Fits one configuration on one fold and scores the held-out part."""
+    X, y, high = _worker_state["X"], _worker_state["y"], _worker_state["high"]
+    train, test = _worker_state["folds"][fold]
+
+    model = RandomForestClassifier(**{**DEFAULT_PARAMS, **params, "n_jobs": 1})
+    start = time.perf_counter()
+    model.fit(X[train], y[train])
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(X[test])
+    predict_seconds = time.perf_counter() - start
+
+    return {
+        "accuracy": float(accuracy_score(y[test], y_pred)),
+        "f1_macro": float(f1_score(y[test], y_pred, average="macro")),
+        "recall_high": float(recall_score(y[test], y_pred, labels=[high], average="macro", zero_division=0)),
+        "fit_seconds": round(fit_seconds, 4),
+        "predict_seconds": round(predict_seconds, 4),
+        "n_nodes": int(sum(e.tree_.node_count for e in model.estimators_)),
+    }
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def candidate_configs(grid, search="grid", n_iter=10, seed=42):
+    if search == "random":
+        configs = list(ParameterSampler(grid, n_iter=n_iter, random_state=seed))
+    else:
+        configs = list(ParameterGrid(grid))
+    # JSON round trip: numpy scalars from the sampler become plain values
+    return [json.loads(json.dumps(c, default=lambda v: v.item())) for c in configs]
+
+
+def summarise(params, folds, scoring):
+    summary = {"params": params, "folds": folds}
+    for metric in (*SCORES, "fit_seconds", "predict_seconds", "n_nodes"):
+        values = np.asarray([f[metric] for f in folds], dtype=np.float64)
+        summary[f"mean_{metric}"] = float(values.mean())
+        summary[f"std_{metric}"] = float(values.std())
+    summary["score"] = summary[f"mean_{scoring}"]
+    return summary
+
+
+def run_search(data_path, configs, n_folds=5, cv_seed=42, workers=None,
+               cache_dir=CACHE_DIR, scoring="accuracy"):
+    """
+    Cross-validates every configuration, reusing cached folds.
+
+    Returns:
+        report dict (see module docstring)
+    """
+    start = time.perf_counter()
+    X, y, _ = load_encoded(data_path)
+    digest = data_hash(X, y)
+    n_rows = len(y)
+    del X, y
+
+    tasks = [(c, params, fold) for c, params in enumerate(configs) for fold in range(n_folds)]
+    results = {}
+    pending = []
+    for c, params, fold in tasks:
+        key = fold_key(digest, params, fold, n_folds, cv_seed)
+        cached = read_cached(cache_dir, key)
+        if cached is not None:
+            results[(c, fold)] = cached
+        else:
+            pending.append((c, params, fold, key))
+
+    if pending:
+        if workers == 0:
+            _init_worker(data_path, n_folds, cv_seed)
+            for c, params, fold, key in pending:
+                results[(c, fold)] = run_fold(params, fold)
+                write_cached(cache_dir, key, results[(c, fold)])
+        else:
+            workers = min(workers or os.cpu_count() or 1, len(pending))
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(data_path, n_folds, cv_seed)
+            ) as pool:
+                futures = {pool.submit(run_fold, params, fold): (c, fold, key) for c, params, fold, key in pending}
+                for future, (c, fold, key) in futures.items():
+                    results[(c, fold)] = future.result()
+                    write_cached(cache_dir, key, results[(c, fold)])
+
+    ranked = sorted(
+        (summarise(params, [results[(c, f)] for f in range(n_folds)], scoring) for c, params in enumerate(configs)),
+        key=lambda s: s["score"],
+        reverse=True,
+    )
+    for rank, summary in enumerate(ranked, start=1):
+        summary["rank"] = rank
+
+    return {
+        "data": os.path.abspath(data_path),
+        "data_hash": digest,
+        "rows": n_rows,
+        "n_folds": n_folds,
+        "cv_seed": cv_seed,
+        "scoring": scoring,
+        "folds_fitted": len(pending),
+        "folds_cached": len(tasks) - len(pending),
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "best_params": ranked[0]["params"] if ranked else None,
+        "results": ranked,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search for the risk model.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--grid", default=None, help="JSON file of parameter lists (default PARAM_GRID)")
+    parser.add_argument("--search", choices=["grid", "random"], default="grid")
+    parser.add_argument("--n-iter", type=int, default=10, help="configurations sampled by random search")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scoring", choices=SCORES, default="accuracy")
+    parser.add_argument("--workers", type=int, default=None, help="0 runs inline")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--out", default=REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    grid = PARAM_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+
+    configs = candidate_configs(grid, args.search, args.n_iter, args.seed)
+    report = run_search(
+        args.data, configs, n_folds=args.folds, cv_seed=args.seed,
+        workers=args.workers, cache_dir=args.cache_dir, scoring=args.scoring,
+    )
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{len(configs)} configurations x {args.folds} folds: "
+          f"{report['folds_fitted']} fitted, {report['folds_cached']} cached, {report['wall_seconds']}s")
+    for summary in report["results"][:5]:
+        print(f"  #{summary['rank']} {args.scoring}={summary['score']:.4f} "
+              f"(High recall {summary['mean_recall_high']:.4f}) {summary['params']}")
+    print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
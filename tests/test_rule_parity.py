@@ -0,0 +1,70 @@
+"""
+Parity of utils.risk_rules.evaluate_safety_rules with the scalar
+apply_safety_rules.
+
+Every threshold in the rules is probed just below, on and just above
+its boundary, and every grid point is crossed with every symptom and
+pre-existing condition (including unknown and missing values), so each
+branch of the if-chain is exercised in every combination.
+
+    python -m pytest tests/test_rule_parity.py
+"""
+
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.risk_rules import (
+    SAFETY_RULES,
+    apply_safety_rules,
+    evaluate_safety_rules,
+    safety_overrides,
+    safety_rule_names,
+)
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "synthetic_triage_data.csv")
+
+AGES = [0, 4, 5, 6, 40, 59, 60, 61, 69, 70, 71, 100, np.nan]
+BPS = [60, 79, 80, 81, 120, 159, 160, 161, 179, 180, 181, np.nan]
+HRS = [30, 39, 40, 41, 80, 109, 110, 111, 129, 130, 131, np.nan]
+TEMPS = [94.9, 95.0, 95.1, 98.6, 100.9, 101.0, 101.1, 102.9, 103.0, 103.1, np.nan]
+SYMPTOMS = [
+    "Chest Pain", "Seizure", "Shortness of Breath", "Unconsciousness",
+    "Severe Headache", "Fever", "Cough", "Head Injury", "", None,
+]
+CONDITIONS = ["Heart Disease", "Hypertension", "Diabetes", "Asthma", "None", None, np.nan]
+
+
+@pytest.fixture(scope="module")
+def grid():
+    rows = list(itertools.product(AGES, BPS, HRS, TEMPS, SYMPTOMS, CONDITIONS))
+    age, bp, hr, temp, symptom, pre_existing = zip(*rows)
+    columns = [np.array(col, dtype=float) for col in (age, bp, hr, temp)]
+    columns += [np.array(col, dtype=object) for col in (symptom, pre_existing)]
+    return rows, evaluate_safety_rules(*columns)
+
+
+def test_grid_matches_scalar_rules(grid):
+    rows, rule_ids = grid
+    expected = [apply_safety_rules(*row) for row in rows]
+    got = safety_overrides(rule_ids)
+    mismatches = [(row, want, have) for row, want, have in zip(rows, expected, got) if want != have]
+    assert not mismatches, f"{len(mismatches)} mismatches, first: {mismatches[0]}"
+
+
+def test_grid_exercises_every_rule(grid):
+    _, rule_ids = grid
+    fired = set(safety_rule_names(rule_ids)) - {None}
+    assert [name for name in SAFETY_RULES if name not in fired] == []
+
+
+def test_dataset_matches_scalar_rules():
+    df = pd.read_csv(DATA_PATH)
+    columns = [df[c].to_numpy() for c in ("age", "bp", "hr", "temp", "symptom", "pre_existing")]
+    expected = [apply_safety_rules(*row) for row in zip(*columns)]
+    assert list(safety_overrides(evaluate_safety_rules(*columns))) == expected
@@ -0,0 +1,197 @@
+"""
+Batch triage engine.
+
+Scores many patients per call with the same pipeline the Streamlit
+results page uses for a single patient:
+
+    safety override -> label encoding -> RandomForest -> department routing
+
+Can also be used from the command line to stream JSONL / CSV records
+from stdin to stdout in chunks (run from the repository root):
+
+    python -m utils.batch_triage --format csv < visits.csv > triaged.csv
+    python -m utils.batch_triage --format jsonl < visits.jsonl > triaged.jsonl
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.department_engine import route_patient
+from utils.encoding import UNSEEN_NAN, compile_encoders
+from utils.model_registry import ENCODER_PATH, MODEL_PATH, get_encoders, get_model
+from utils.risk_rules import NO_RULE, evaluate_safety_rules, safety_overrides, safety_rule_names
+
+# Column order the model was trained on (CSV order, see models/train_model.py)
+FEATURE_COLUMNS = ["age", "gender", "symptom", "bp", "hr", "temp", "pre_existing"]
+
+DEFAULT_CHUNKSIZE = 10000
+
+
+def load_artifacts(model_path=MODEL_PATH, encoder_path=ENCODER_PATH):
+    """
+    Loads the trained risk model and its label encoders
+    (cached per process by utils/model_registry.py).
+
+    Returns:
+        (model, encoders)
+    """
+    return get_model(model_path), get_encoders(encoder_path)
+
+
+def model_feature_order(model):
+    """Feature order the model expects (falls back to the training CSV order)."""
+    names = getattr(model, "feature_names_in_", None)
+    return list(names) if names is not None else list(FEATURE_COLUMNS)
+
+
+def triage_batch(df, model, encoders):
+    """
+    Triage a batch of patients.
+
+    Parameters:
+        df: DataFrame (or anything pandas can wrap) with columns
+            age, gender, bp, hr, temp, symptom, pre_existing
+        model: trained RandomForest risk model
+        encoders: dict of label encoders from label_encoders.pkl
+            (LabelEncoders or compiled CategoryCodecs)
+
+    Returns:
+        DataFrame aligned with the input rows:
+            risk, confidence (percent), safety_override, safety_rule,
+            unseen_category, department, priority, estimated_wait
+        plus patient_id when the input has one.
+
+        Categories the encoders have never seen (e.g. "Head Injury")
+        are passed to the forest as missing values and flagged in
+        unseen_category.
+    """
+    df = pd.DataFrame(df).reset_index(drop=True)
+    codecs = compile_encoders(encoders)
+    missing = [c for c in FEATURE_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing input columns: {missing}")
+
+    n = len(df)
+
+    # -----------------------------
+    # 1️⃣ Safety overrides
+    # -----------------------------
+    rule_ids = evaluate_safety_rules(
+        df["age"], df["bp"], df["hr"], df["temp"], df["symptom"], df["pre_existing"]
+    )
+    overridden = rule_ids != NO_RULE
+
+    risk = safety_overrides(rule_ids)
+    confidence = np.ones(n, dtype=float)
+    unseen = np.zeros(n, dtype=bool)
+
+    # -----------------------------
+    # 2️⃣ Model prediction (only rows without an override)
+    # -----------------------------
+    todo = np.flatnonzero(~overridden)
+    if len(todo):
+        rows = df.iloc[todo]
+        encoded = {
+            col: codecs[col].encode(rows[col], unseen=UNSEEN_NAN)
+            for col in ("gender", "symptom", "pre_existing")
+        }
+        X = pd.DataFrame({
+            "age": rows["age"].to_numpy(),
+            "bp": rows["bp"].to_numpy(),
+            "hr": rows["hr"].to_numpy(),
+            "temp": rows["temp"].to_numpy(),
+            **encoded,
+        }, columns=model_feature_order(model))
+        unseen[todo] = np.isnan(np.column_stack(list(encoded.values())).astype(float)).any(axis=1)
+
+        probabilities = model.predict_proba(X)
+        best = probabilities.argmax(axis=1)
+        pred = model.classes_.take(best)
+        risk[todo] = codecs["risk"].decode(pred)
+        confidence[todo] = probabilities[np.arange(len(todo)), best]
+
+    # -----------------------------
+    # 3️⃣ Department routing (memoised per distinct input)
+    # -----------------------------
+    routes = {}
+    department = np.empty(n, dtype=object)
+    priority = np.empty(n, dtype=object)
+    estimated_wait = np.empty(n, dtype=np.int64)
+    for i, key in enumerate(zip(risk, df["symptom"], df["pre_existing"])):
+        if key not in routes:
+            routes[key] = route_patient(*key)
+        route = routes[key]
+        department[i] = route["department"]
+        priority[i] = route["priority"]
+        estimated_wait[i] = route["estimated_wait"]
+
+    out = pd.DataFrame({
+        "risk": risk,
+        "confidence": np.round(confidence * 100, 2),
+        "safety_override": overridden,
+        "safety_rule": safety_rule_names(rule_ids),
+        "unseen_category": unseen,
+        "department": department,
+        "priority": priority,
+        "estimated_wait": estimated_wait,
+    })
+    if "patient_id" in df.columns:
+        out.insert(0, "patient_id", df["patient_id"].to_numpy())
+    return out
+
+
+def triage_one(input_data, model, encoders):
+    """
+    Convenience wrapper for a single patient dict (as built by the intake page).
+
+    Returns:
+        dict with the same keys as the batch output columns.
+    """
+    return triage_batch([input_data], model, encoders).iloc[0].to_dict()
+
+
+# -----------------------------
+# Streaming CLI
+# -----------------------------
+def iter_chunks(stream, fmt, chunksize=DEFAULT_CHUNKSIZE):
+    """Yields DataFrames of at most `chunksize` records from a text stream."""
+    if fmt == "csv":
+        reader = pd.read_csv(stream, chunksize=chunksize)
+    else:
+        reader = pd.read_json(stream, lines=True, chunksize=chunksize, dtype=False)
+    for chunk in reader:
+        yield chunk
+
+
+def write_chunk(out_df, stream, fmt, header):
+    if fmt == "csv":
+        out_df.to_csv(stream, index=False, header=header)
+    else:
+        text = out_df.to_json(orient="records", lines=True)
+        stream.write(text if text.endswith("\n") else text + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Triage patients streamed as JSONL or CSV on stdin."
+    )
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--encoders", default=ENCODER_PATH)
+    args = parser.parse_args(argv)
+
+    model, encoders = load_artifacts(args.model, args.encoders)
+
+    header = True
+    for chunk in iter_chunks(sys.stdin, args.format, args.chunksize):
+        write_chunk(triage_batch(chunk, model, encoders), sys.stdout, args.format, header)
+        header = False
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
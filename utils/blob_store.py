@@ -0,0 +1,159 @@
+"""
+Content-addressed store for uploaded reports.
+
+Every distinct file is kept once, named by the SHA-256 of its bytes,
+under two levels of shard directories so no directory grows large:
+
+    <root>/ab/cd/abcd...   full hex digest
+    <root>/tmp/            uploads still being written
+
+An upload is streamed into tmp/ in CHUNK_SIZE pieces while it is hashed
+(stage), then renamed into place (commit), or dropped if that content
+is already stored. Reads stream the same way. Blobs are immutable, so a
+stored path is never rewritten.
+
+Reference counts live in SQLite (blobs table, see utils/db.py). The
+files follow committed rows: a staged blob is committed here after the
+row referencing it, and an unreferenced blob is removed after its row
+is deleted, checked again under the database's write lock so an upload
+never references a blob that garbage collection is removing.
+
+Uploaded reports are stored unencrypted, readable only by the app's
+user (0600). TRIAGE_BLOB_DIR overrides the location (default
+app/history_files/blobs).
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from collections import namedtuple
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BLOB_DIR = os.environ.get("TRIAGE_BLOB_DIR", os.path.join(ROOT_DIR, "app", "history_files", "blobs"))
+CHUNK_SIZE = 1 << 20
+TEMP_DIR = "tmp"
+
+StagedBlob = namedtuple("StagedBlob", ["sha256", "size", "temp_path"])
+
+
+def blob_path(sha256, root=BLOB_DIR):
+    return os.path.join(root, sha256[:2], sha256[2:4], sha256)
+
+
+def _chunks(fileobj, chunk_size):
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+# -----------------------------
+# Writes
+# -----------------------------
+def stage(fileobj, root=BLOB_DIR, chunk_size=CHUNK_SIZE):
+    """
+    Streams a binary file object (read from its start) into the store's
+    temp directory while hashing it.
+
+    Returns:
+        StagedBlob(sha256, size, temp_path), to commit() or discard()
+    """
+    temp_dir = os.path.join(root, TEMP_DIR)
+    os.makedirs(temp_dir, exist_ok=True)
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in _chunks(fileobj, chunk_size):
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return StagedBlob(digest.hexdigest(), size, temp_path)
+
+
+def commit(staged, root=BLOB_DIR):
+    """
+    Moves a staged upload to its content address. Idempotent: if the
+    content is already stored the staged copy is dropped.
+
+    Returns:
+        True if the blob is new
+    """
+    path = blob_path(staged.sha256, root)
+    if os.path.exists(path):
+        discard(staged)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(staged.temp_path, path)
+    return True
+
+
+def discard(staged):
+    try:
+        os.remove(staged.temp_path)
+    except FileNotFoundError:
+        pass
+
+
+def remove(sha256, root=BLOB_DIR):
+    try:
+        os.remove(blob_path(sha256, root))
+    except FileNotFoundError:
+        pass
+
+
+def sweep_temp(root=BLOB_DIR, max_age_seconds=3600):
+    """Deletes staged uploads abandoned by crashed sessions. Returns how many."""
+    temp_dir = os.path.join(root, TEMP_DIR)
+    if not os.path.isdir(temp_dir):
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for entry in os.scandir(temp_dir):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+    return removed
+
+
+def iter_digests(root=BLOB_DIR):
+    """Digests of every stored blob, from a walk of the shard directories (for garbage collection)."""
+    for directory, subdirs, files in os.walk(root):
+        if directory == root:
+            subdirs[:] = [d for d in subdirs if d != TEMP_DIR]
+        for name in files:
+            if len(name) == 64 and os.path.join(directory, name) == blob_path(name, root):
+                yield name
+
+
+# -----------------------------
+# Reads
+# -----------------------------
+def exists(sha256, root=BLOB_DIR):
+    return os.path.isfile(blob_path(sha256, root))
+
+
+def open_blob(sha256, root=BLOB_DIR):
+    return open(blob_path(sha256, root), "rb")
+
+
+def iter_blob(sha256, root=BLOB_DIR, chunk_size=CHUNK_SIZE):
+    """Yields the blob's bytes in chunk_size pieces."""
+    with open_blob(sha256, root) as f:
+        yield from _chunks(f, chunk_size)
+
+
+def read_blob(sha256, root=BLOB_DIR):
+    with open_blob(sha256, root) as f:
+        return f.read()
@@ -0,0 +1,379 @@
+"""
+Compiled flat-array form of the RandomForest risk model.
+
+compile_forest() flattens every tree of a fitted RandomForestClassifier
+into one set of contiguous node tables, and CompiledForest walks them
+with plain NumPy. There is no DataFrame construction, sklearn input
+validation or joblib dispatch on the prediction path, and the
+probabilities are bit-for-bit identical to model.predict_proba.
+
+Stepping every path with NumPy costs a handful of array passes per
+level, which beats sklearn for a single patient and small batches but
+falls to 0.3-0.7x its speed from about a thousand rows. Batches of
+SKLEARN_BATCH_ROWS rows or more are therefore walked by sklearn's
+compiled Tree.apply, one tree at a time, on sklearn trees rebuilt from
+the same node tables (on first use, about 64 bytes per node, private
+to the process). No fitted sklearn model is needed, so this also holds
+for forests loaded from an export or a shared mapping.
+
+Node tables (one row per node, all trees concatenated):
+
+    feature       smallest int dtype holding n_features
+    threshold     float64 (sklearn compares float32 inputs against
+                  float64 thresholds; narrowing would change splits)
+    children      int32 global child index, interleaved so that
+                  children[2 * node + went_right] is the next node
+    missing_left  bool, where NaN inputs go
+    leaf          int32 row in leaf_value, -1 for split nodes
+
+For per-patient explanations (utils/explainability.py) the export also
+holds, class-major:
+
+    entry_delta   float64 (n_classes, n_nodes), the change in each class
+                  probability on entering a node from its parent (0 at
+                  the roots); meta["bias"] is the mean root distribution
+
+Forests exported before entry_delta existed load without it
+(entry_delta is None) and predict as before.
+
+Leaves point back at themselves with an +inf threshold, so every tree
+can be walked a fixed number of steps without tracking which paths
+have already finished.
+
+The compact tables are what gets saved and memory-mapped. At runtime
+the index tables are widened once to np.intp, because NumPy fancy
+indexing with int32/uint8 indices pays a cast on every step; pass
+widen_indices=False to keep only the (possibly shared) compact tables.
+"""
+
+import json
+import os
+
+import numpy as np
+
+ARRAYS = ("feature", "threshold", "children", "missing_left", "leaf", "leaf_value", "roots", "classes")
+OPTIONAL_ARRAYS = ("entry_delta",)
+META_FILE = "meta.json"
+
+# Batches at least this large go through sklearn's Tree.apply (measured crossover ~30-50 rows)
+SKLEARN_BATCH_ROWS = 64
+
+
+def _leaf_probabilities(tree, n_classes):
+    """
+    Per-node class probabilities exactly as DecisionTreeClassifier.predict_proba
+    returns them. Newer sklearn stores fractions in tree_.value; older
+    versions stored weighted counts and normalised at predict time.
+    """
+    value = tree.value[:, 0, :n_classes]
+    totals = value.sum(axis=1)
+    if np.allclose(totals, 1.0):
+        return value
+    totals[totals == 0.0] = 1.0
+    return value / totals[:, None]
+
+
+def _plain_array(values):
+    """Object arrays cannot be saved without pickle; store labels as fixed-width strings."""
+    values = np.asarray(values)
+    return values.astype(str) if values.dtype == object else values
+
+
+def compile_forest(model):
+    """
+    Flattens a fitted RandomForestClassifier into a CompiledForest.
+
+    Parameters:
+        model: fitted sklearn RandomForestClassifier (single output)
+
+    Returns:
+        CompiledForest
+    """
+    n_classes = int(model.n_classes_)
+    n_features = int(model.n_features_in_)
+
+    feature, threshold, children, missing_left, leaf, leaf_value, roots = ([] for _ in range(7))
+    entry_delta, root_value = [], []
+    node_offset = 0
+    leaf_offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        local = np.arange(n)
+
+        value = _leaf_probabilities(tree, n_classes)
+        parent = local.copy()
+        parent[tree.children_left[~is_leaf]] = local[~is_leaf]
+        parent[tree.children_right[~is_leaf]] = local[~is_leaf]
+
+        leaf_ids = np.full(n, -1, dtype=np.int64)
+        leaf_ids[is_leaf] = leaf_offset + np.arange(is_leaf.sum())
+
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        children.append(node_offset + np.column_stack([
+            np.where(is_leaf, local, tree.children_left),
+            np.where(is_leaf, local, tree.children_right),
+        ]).ravel())
+        if hasattr(tree, "missing_go_to_left"):
+            missing_left.append(np.where(is_leaf, True, tree.missing_go_to_left.astype(bool)))
+        else:
+            missing_left.append(is_leaf.copy())
+        leaf.append(leaf_ids)
+        leaf_value.append(value[is_leaf])
+        roots.append(node_offset)
+        entry_delta.append(value - value[parent])
+        root_value.append(value[0])
+
+        node_offset += n
+        leaf_offset += int(is_leaf.sum())
+        max_depth = max(max_depth, int(tree.max_depth))
+
+    feature_dtype = np.min_scalar_type(max(n_features - 1, 0))
+    arrays = {
+        "feature": np.concatenate(feature).astype(feature_dtype),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "children": np.concatenate(children).astype(np.int32),
+        "missing_left": np.concatenate(missing_left).astype(bool),
+        "leaf": np.concatenate(leaf).astype(np.int32),
+        "leaf_value": np.ascontiguousarray(np.concatenate(leaf_value), dtype=np.float64),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "classes": _plain_array(model.classes_),
+        "entry_delta": np.ascontiguousarray(np.concatenate(entry_delta).T, dtype=np.float64),
+    }
+    names = getattr(model, "feature_names_in_", None)
+    meta = {
+        "n_features": n_features,
+        "n_classes": n_classes,
+        "n_trees": len(model.estimators_),
+        "max_depth": max_depth,
+        "feature_names": list(names) if names is not None else None,
+        "feature_importances": [float(v) for v in model.feature_importances_],
+        "bias": [float(v) for v in np.mean(root_value, axis=0)],
+    }
+    return CompiledForest(arrays, meta)
+
+
+class CompiledForest:
+    """
+    Array-backed RandomForest predictor.
+
+    Mirrors the parts of the sklearn API the app uses (classes_,
+    feature_names_in_, feature_importances_, predict, predict_proba),
+    so it can be passed
+    wherever the risk model is.
+    """
+
+    def __init__(self, arrays, meta, widen_indices=True):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        for name in OPTIONAL_ARRAYS:
+            setattr(self, name, arrays.get(name))
+        self.meta = dict(meta)
+        self.n_trees = int(meta["n_trees"])
+        self.max_depth = int(meta["max_depth"])
+        self.classes_ = self.classes
+        self.n_classes_ = int(meta["n_classes"])
+        self.n_features_in_ = int(meta["n_features"])
+        if meta.get("feature_names"):
+            self.feature_names_in_ = np.asarray(meta["feature_names"], dtype=object)
+        if meta.get("feature_importances"):
+            self.feature_importances_ = np.asarray(meta["feature_importances"])
+
+        widen = (lambda a: a.astype(np.intp)) if widen_indices else (lambda a: a)
+        self._feature = widen(self.feature)
+        self._children = widen(self.children)
+        self._leaf = widen(self.leaf)
+        self._roots = widen(self.roots)
+        self._sklearn_trees = None
+
+    # -----------------------------
+    # Input handling
+    # -----------------------------
+    def _as_matrix(self, X):
+        names = getattr(self, "feature_names_in_", None)
+        if names is not None and hasattr(X, "columns"):
+            X = X[list(names)]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        return X
+
+    def _step(self, node, x):
+        """Advances every path in `node` one level, given the feature values x it tests."""
+        went_right = x > self.threshold[node]
+        nan = np.isnan(x)
+        if nan.any():
+            went_right = np.where(nan, ~self.missing_left[node], went_right)
+        return self._children[2 * node + went_right]
+
+    def _tree_objects(self):
+        """
+        One sklearn Tree per compiled tree, as (tree, first node), built
+        once. Empty when this sklearn cannot route NaN like the tables do.
+        """
+        if self._sklearn_trees is None:
+            try:
+                from sklearn.tree._tree import NODE_DTYPE, Tree
+            except ImportError:
+                NODE_DTYPE = None
+            if NODE_DTYPE is None or "missing_go_to_left" not in NODE_DTYPE.names:
+                self._sklearn_trees = ()
+                return self._sklearn_trees
+
+            trees = []
+            bounds = np.append(self._roots, len(self.feature))
+            for first, end in zip(bounds[:-1], bounds[1:]):
+                n = end - first
+                is_leaf = self.leaf[first:end] >= 0
+                children = self._children[2 * first:2 * end].reshape(n, 2) - first
+                nodes = np.zeros(n, dtype=NODE_DTYPE)
+                nodes["left_child"] = np.where(is_leaf, -1, children[:, 0])
+                nodes["right_child"] = np.where(is_leaf, -1, children[:, 1])
+                nodes["feature"] = np.where(is_leaf, -2, self.feature[first:end])
+                nodes["threshold"] = np.where(is_leaf, -2.0, self.threshold[first:end])
+                nodes["missing_go_to_left"] = self.missing_left[first:end]
+                # apply() only reads the nodes; values are placeholders
+                tree = Tree(self.n_features_in_, np.array([self.n_classes_], dtype=np.intp), 1)
+                tree.__setstate__({
+                    "max_depth": self.max_depth,
+                    "node_count": int(n),
+                    "nodes": nodes,
+                    "values": np.zeros((n, 1, self.n_classes_)),
+                })
+                trees.append((tree, int(first)))
+            self._sklearn_trees = tuple(trees)
+        return self._sklearn_trees
+
+    # -----------------------------
+    # Traversal
+    # -----------------------------
+    def apply(self, X):
+        """
+        Leaf row (into leaf_value) reached by every sample in every tree,
+        shape (n_samples, n_trees). The result is a transposed view, so
+        each tree's column is contiguous.
+        """
+        X = np.ascontiguousarray(self._as_matrix(X))
+        n, n_features = X.shape
+        trees = self._tree_objects() if n >= SKLEARN_BATCH_ROWS else ()
+        if trees:
+            leaves = np.empty((self.n_trees, n), dtype=np.intp)
+            for t, (tree, first) in enumerate(trees):
+                leaves[t] = self._leaf[first + tree.apply(X)]
+            return leaves.T
+
+        flat = X.ravel()
+        row_base = np.tile(np.arange(n, dtype=np.intp) * n_features, self.n_trees)
+        node = np.repeat(self._roots, n)
+        for _ in range(self.max_depth):
+            node = self._step(node, flat[row_base + self._feature[node]])
+        return self._leaf[node].reshape(self.n_trees, n).T
+
+    def predict_proba(self, X):
+        """
+        Class probabilities, identical to RandomForestClassifier.predict_proba.
+
+        Trees are accumulated in order, as sklearn does, so floating
+        point summation produces the same bits.
+        """
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.n_classes_), dtype=np.float64)
+        for t in range(self.n_trees):
+            proba += self.leaf_value[leaves[:, t]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+
+    def predict_proba_one(self, row):
+        """
+        Fast path for a single patient (1-D feature vector in model order).
+
+        Returns:
+            1-D array of class probabilities.
+        """
+        x = np.asarray(row, dtype=np.float32)
+        node = self._roots
+        if np.isnan(x).any():
+            for _ in range(self.max_depth):
+                node = self._step(node, x[self._feature[node]])
+        else:
+            feature, threshold, children = self._feature, self.threshold, self._children
+            for _ in range(self.max_depth):
+                node = children[2 * node + (x[feature[node]] > threshold[node])]
+        # Reducing over the tree axis of a C-contiguous (n_trees, n_classes)
+        # block adds tree by tree, matching sklearn's accumulation order
+        return np.add.reduce(self.leaf_value[self._leaf[node]], axis=0) / self.n_trees
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.tables().values())
+
+    def tables(self):
+        """Every table this forest holds, by name (optional ones only when present)."""
+        names = ARRAYS + tuple(name for name in OPTIONAL_ARRAYS if getattr(self, name) is not None)
+        return {name: getattr(self, name) for name in names}
+
+
+# -----------------------------
+# Export / load
+# -----------------------------
+def export_compiled_forest(model, out_dir):
+    """
+    Compiles `model` and writes it as one .npy file per table plus
+    meta.json, so the tables can later be memory-mapped.
+
+    Returns:
+        CompiledForest
+    """
+    forest = model if isinstance(model, CompiledForest) else compile_forest(model)
+    os.makedirs(out_dir, exist_ok=True)
+    for name, array in forest.tables().items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), array, allow_pickle=False)
+    with open(os.path.join(out_dir, META_FILE), "w") as f:
+        json.dump(forest.meta, f, indent=2)
+    return forest
+
+
+def load_compiled_forest(path, mmap_mode=None):
+    """
+    Loads a forest written by export_compiled_forest.
+
+    Parameters:
+        path: export directory
+        mmap_mode: passed to np.load, e.g. "r" to memory-map the tables
+
+    Returns:
+        CompiledForest
+    """
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    arrays = {}
+    for name in ARRAYS + OPTIONAL_ARRAYS:
+        file = os.path.join(path, f"{name}.npy")
+        if name in OPTIONAL_ARRAYS and not os.path.exists(file):
+            continue
+        arrays[name] = np.load(file, mmap_mode=mmap_mode, allow_pickle=False)
+    return CompiledForest(arrays, meta)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import joblib
+
+    models_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "models"))
+    parser = argparse.ArgumentParser(description="Export the risk model as flat node tables.")
+    parser.add_argument("--model", default=os.path.join(models_dir, "risk_model.pkl"))
+    parser.add_argument("--out", default=os.path.join(models_dir, "risk_model.compiled"))
+    args = parser.parse_args()
+
+    forest = export_compiled_forest(joblib.load(args.model), args.out)
+    print(f"Exported {forest.n_trees} trees ({forest.nbytes / 1e6:.2f} MB) to {args.out}")
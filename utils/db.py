@@ -0,0 +1,1109 @@
+"""
+SQLite data access for the triage app (patients + visits).
+
+Connections are opened once and reused. Streamlit runs every script
+execution on a fresh thread, so a plain thread-local connection would
+be reopened on each rerun. Instead, a small pool hands each thread its
+own connection for the duration of a call and takes it back afterwards.
+Every connection is configured with:
+
+    journal_mode=WAL      readers never block the writer and vice versa
+    synchronous=NORMAL    fsync at checkpoints rather than every commit (safe with WAL)
+    busy_timeout          wait for a competing writer instead of failing at once
+
+SQL text is kept in module constants. sqlite3 caches prepared
+statements per connection by SQL text, so repeated calls on a pooled
+connection skip re-parsing. Writes run in BEGIN IMMEDIATE transactions
+and are retried with exponential backoff if the database stays locked
+past the busy timeout.
+
+Schema changes are numbered migrations tracked in PRAGMA user_version
+(see MIGRATIONS). Each step is idempotent, so an interrupted run simply
+resumes. Backfills run in short batches that app writes interleave
+with. An index build is a single statement and holds the write lock
+while it runs (about 3s per million visits); concurrent writers wait
+it out through the busy timeout and retries, so for very large
+databases run `migrate` ahead of deploying.
+
+TRIAGE_DB_PATH overrides the database location (default app/triage.db).
+
+    python -m utils.db migrate [--db PATH]
+    python -m utils.db status [--db PATH]
+    python -m utils.db import-history [--db PATH] [--csv PATH]
+    python -m utils.db gc [--db PATH]
+"""
+
+import csv
+import json
+import os
+import queue
+import random
+import re
+import sqlite3
+import threading
+import time
+from calendar import timegm
+from contextlib import contextmanager
+from datetime import datetime
+
+from utils import blob_store
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DB_PATH = os.environ.get("TRIAGE_DB_PATH", os.path.join(ROOT_DIR, "app", "triage.db"))
+
+BUSY_TIMEOUT_MS = 5000
+POOL_SIZE = 8
+WRITE_RETRIES = 5
+RETRY_BASE_SECONDS = 0.05
+STATEMENT_CACHE_SIZE = 256
+BACKFILL_BATCH = 20000
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+SEARCH_SEEK_VISITS = 10000  # visit search: seek per matching patient below this many estimated visits
+NOCASE_MAX_CHAR = "\U0010ffff"  # sorts after any text, closing a prefix range
+FTS_TOKENIZER = "porter unicode61 remove_diacritics 2"
+SNIPPET_MARKS = ("\x02", "\x03")  # around matched terms in search_notes snippets
+SNIPPET_TOKENS = 16
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# -----------------------------
+# Connections
+# -----------------------------
+def connect(db_path=DB_PATH):
+    """Opens a new connection with the app's pragmas (autocommit; see write())."""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _pool(db_path):
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = queue.LifoQueue(maxsize=POOL_SIZE)
+        return pool
+
+
+@contextmanager
+def connection(db_path=DB_PATH):
+    """Checks a pooled connection out for the current thread."""
+    db_path = os.path.abspath(db_path)
+    pool = _pool(db_path)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = connect(db_path)
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+def close_all():
+    """Closes every pooled connection (tests, shutdown, before deleting the file)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _is_locked(exc):
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+def write(fn, db_path=DB_PATH, retries=WRITE_RETRIES):
+    """
+    Runs fn(conn) inside one BEGIN IMMEDIATE transaction and commits.
+
+    The whole transaction is retried with exponential backoff (plus
+    jitter) when SQLite reports the database locked or busy.
+
+    Returns:
+        whatever fn returns
+    """
+    for attempt in range(retries + 1):
+        with connection(db_path) as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                result = fn(conn)
+                conn.execute("COMMIT")
+                return result
+            except sqlite3.OperationalError as exc:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not _is_locked(exc) or attempt == retries:
+                    raise
+        time.sleep(RETRY_BASE_SECONDS * (2 ** attempt) * (1 + random.random()))
+
+
+def query(sql, params=(), db_path=DB_PATH):
+    """Runs a read query and returns all rows."""
+    with connection(db_path) as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+# -----------------------------
+# Schema
+# -----------------------------
+CREATE_PATIENTS = """
+    CREATE TABLE IF NOT EXISTS patients (
+        patient_id TEXT PRIMARY KEY,
+        created_at TEXT
+    )
+"""
+
+CREATE_VISITS = """
+    CREATE TABLE IF NOT EXISTS visits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT,
+        timestamp TEXT,
+        age INTEGER,
+        gender TEXT,
+        bp INTEGER,
+        hr INTEGER,
+        temp REAL,
+        symptom TEXT,
+        pre_existing TEXT,
+        risk TEXT,
+        confidence REAL,
+        department TEXT,
+        priority TEXT,
+        hospital_load INTEGER,
+        est_wait INTEGER,
+        pdf_note TEXT,
+        safety_override INTEGER DEFAULT 0,
+        clinician_risk TEXT,
+        FOREIGN KEY(patient_id) REFERENCES patients(patient_id)
+    )
+"""
+
+CREATE_HISTORY_FILES = """
+    CREATE TABLE IF NOT EXISTS history_files (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patient_id TEXT NOT NULL,
+        timestamp TEXT,
+        original_name TEXT,
+        stored_name TEXT UNIQUE,
+        notes TEXT
+    )
+"""
+
+
+# -----------------------------
+# Migrations
+# -----------------------------
+def _add_visit_columns(db_path):
+    """1: columns added after the first release (older databases lack them)."""
+    def alter(conn):
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(visits)")}
+        for column, decl in (("safety_override", "INTEGER DEFAULT 0"), ("clinician_risk", "TEXT")):
+            if column not in existing:
+                conn.execute(f"ALTER TABLE visits ADD COLUMN {column} {decl}")
+
+    write(alter, db_path)
+
+
+def _index_patient_visits(db_path):
+    """
+    2: per-patient lookups. Covers the latest-visit summary (risk,
+    confidence, department, priority) and orders a patient's visits
+    newest first without a sort.
+    """
+    write(lambda conn: conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_visits_patient_latest
+        ON visits (patient_id, id DESC, risk, confidence, department, priority)
+    """), db_path)
+
+
+def _add_timestamp_epoch(db_path, batch_size=BACKFILL_BATCH):
+    """
+    3: integer ts_epoch (seconds, see timestamp_epoch) for time-range
+    queries. save_visit writes it with the row. App instances still
+    running older code insert visits without it, so an insert trigger
+    fills it in for those rows only; it reads the app's fixed
+    TIMESTAMP_FORMAT, where SQLite's strftime and timestamp_epoch
+    agree, and never fires for current writers. The trigger exists
+    before the backfill reads its last id, so no row is missed. Existing
+    rows are backfilled in id-range batches, then the column is indexed.
+    """
+    def add_column(conn):
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(visits)")}
+        if "ts_epoch" not in existing:
+            conn.execute("ALTER TABLE visits ADD COLUMN ts_epoch INTEGER")
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS visits_ts_epoch AFTER INSERT ON visits
+            WHEN NEW.ts_epoch IS NULL AND NEW.timestamp IS NOT NULL
+            BEGIN
+                UPDATE visits SET ts_epoch = CAST(strftime('%s', NEW.timestamp) AS INTEGER)
+                WHERE id = NEW.id;
+            END
+        """)
+
+    write(add_column, db_path)
+    _backfill_timestamp_epoch(db_path, batch_size)
+    write(lambda conn: conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_visits_ts_epoch ON visits (ts_epoch)"
+    ), db_path)
+
+
+def _backfill_timestamp_epoch(db_path, batch_size):
+    """Sets ts_epoch from timestamp with timestamp_epoch, the rule queries use for their bounds."""
+    (max_id,) = query("SELECT COALESCE(MAX(id), 0) FROM visits", db_path=db_path)[0]
+    for low in range(0, max_id, batch_size):
+        def fill(conn, low=low):
+            rows = conn.execute(
+                "SELECT id, timestamp, ts_epoch FROM visits WHERE id > ? AND id <= ? AND ts_epoch IS NULL",
+                (low, low + batch_size),
+            ).fetchall()
+            conn.executemany(UPDATE_TS_EPOCH, [
+                (epoch, visit_id) for visit_id, timestamp, stored in rows
+                if (epoch := timestamp_epoch(timestamp)) != stored
+            ])
+
+        # One short transaction per batch, so app writes interleave with the backfill
+        write(fill, db_path)
+
+
+def _index_patients_created(db_path):
+    """4: newest-first patient pages (get_patient_summaries) read the index instead of sorting."""
+    write(lambda conn: conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_patients_created ON patients (created_at, patient_id)"
+    ), db_path)
+
+
+def _index_patient_ids_nocase(db_path):
+    """5: case-insensitive patient ID search (prefix ranges and ID-ordered result pages)."""
+    write(lambda conn: conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_patients_id_nocase ON patients (patient_id COLLATE NOCASE)"
+    ), db_path)
+
+
+def _add_note_search(db_path, batch_size=BACKFILL_BATCH):
+    """
+    6: uploaded report index and full-text search. history_files holds
+    the upload index (previously app/history_files/history_index.csv,
+    see import_history_csv), looked up by patient. visit_notes_fts and
+    history_notes_fts are external-content FTS5 indexes over
+    visits.pdf_note and history_files.notes (the text lives only in
+    those tables), kept in step by triggers; only non-empty text is
+    indexed, and the triggers must agree on that. Existing report text
+    is indexed in id-range batches after the triggers exist, reading the
+    last id in the same transaction so no row is indexed twice.
+    """
+    def create(conn):
+        conn.execute(CREATE_HISTORY_FILES)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_history_files_patient
+            ON history_files (patient_id, timestamp DESC)
+        """)
+        # Start clean if an earlier run stopped part-way through the backfill
+        for trigger in (
+            "visits_notes_ai", "visits_notes_ad", "visits_notes_au",
+            "history_notes_ai", "history_notes_ad", "history_notes_au",
+        ):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute("DROP TABLE IF EXISTS visit_notes_fts")
+        conn.execute("DROP TABLE IF EXISTS history_notes_fts")
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE visit_notes_fts USING fts5(
+                pdf_note, content='visits', content_rowid='id', tokenize='{FTS_TOKENIZER}'
+            )
+        """)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE history_notes_fts USING fts5(
+                notes, content='history_files', content_rowid='id', tokenize='{FTS_TOKENIZER}'
+            )
+        """)
+        conn.execute("""
+            CREATE TRIGGER visits_notes_ai AFTER INSERT ON visits
+            WHEN COALESCE(NEW.pdf_note, '') != ''
+            BEGIN
+                INSERT INTO visit_notes_fts (rowid, pdf_note) VALUES (NEW.id, NEW.pdf_note);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER visits_notes_ad AFTER DELETE ON visits
+            WHEN COALESCE(OLD.pdf_note, '') != ''
+            BEGIN
+                INSERT INTO visit_notes_fts (visit_notes_fts, rowid, pdf_note) VALUES ('delete', OLD.id, OLD.pdf_note);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER visits_notes_au AFTER UPDATE OF pdf_note ON visits
+            BEGIN
+                INSERT INTO visit_notes_fts (visit_notes_fts, rowid, pdf_note)
+                SELECT 'delete', OLD.id, OLD.pdf_note WHERE COALESCE(OLD.pdf_note, '') != '';
+                INSERT INTO visit_notes_fts (rowid, pdf_note)
+                SELECT NEW.id, NEW.pdf_note WHERE COALESCE(NEW.pdf_note, '') != '';
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER history_notes_ai AFTER INSERT ON history_files
+            WHEN COALESCE(NEW.notes, '') != ''
+            BEGIN
+                INSERT INTO history_notes_fts (rowid, notes) VALUES (NEW.id, NEW.notes);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER history_notes_ad AFTER DELETE ON history_files
+            WHEN COALESCE(OLD.notes, '') != ''
+            BEGIN
+                INSERT INTO history_notes_fts (history_notes_fts, rowid, notes) VALUES ('delete', OLD.id, OLD.notes);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER history_notes_au AFTER UPDATE OF notes ON history_files
+            BEGIN
+                INSERT INTO history_notes_fts (history_notes_fts, rowid, notes)
+                SELECT 'delete', OLD.id, OLD.notes WHERE COALESCE(OLD.notes, '') != '';
+                INSERT INTO history_notes_fts (rowid, notes)
+                SELECT NEW.id, NEW.notes WHERE COALESCE(NEW.notes, '') != '';
+            END
+        """)
+        conn.execute("""
+            INSERT INTO history_notes_fts (rowid, notes)
+            SELECT id, notes FROM history_files WHERE COALESCE(notes, '') != ''
+        """)
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM visits").fetchone()[0]
+
+    max_id = write(create, db_path)
+    for low in range(0, max_id, batch_size):
+        write(lambda conn: conn.execute("""
+            INSERT INTO visit_notes_fts (rowid, pdf_note)
+            SELECT id, pdf_note FROM visits
+            WHERE id > ? AND id <= ? AND COALESCE(pdf_note, '') != ''
+        """, (low, min(low + batch_size, max_id))), db_path)
+
+
+def _add_blob_refcounts(db_path):
+    """
+    7: uploads in the content-addressed store (utils/blob_store.py).
+    history_files.blob_sha256 names the blob; blobs.refcount counts the
+    rows naming it, maintained by triggers so every insert, delete and
+    re-pointing keeps it exact. A partial index finds unreferenced blobs
+    for garbage collection.
+    """
+    def create(conn):
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(history_files)")}
+        if "blob_sha256" not in existing:
+            conn.execute("ALTER TABLE history_files ADD COLUMN blob_sha256 TEXT")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                size INTEGER,
+                refcount INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced ON blobs (sha256) WHERE refcount <= 0")
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS history_blobs_ai AFTER INSERT ON history_files
+            WHEN NEW.blob_sha256 IS NOT NULL
+            BEGIN
+                UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = NEW.blob_sha256;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS history_blobs_ad AFTER DELETE ON history_files
+            WHEN OLD.blob_sha256 IS NOT NULL
+            BEGIN
+                UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = OLD.blob_sha256;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS history_blobs_au AFTER UPDATE OF blob_sha256 ON history_files
+            BEGIN
+                UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = OLD.blob_sha256;
+                UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = NEW.blob_sha256;
+            END
+        """)
+
+    write(create, db_path)
+
+
+MIGRATIONS = (
+    _add_visit_columns,
+    _index_patient_visits,
+    _add_timestamp_epoch,
+    _index_patients_created,
+    _index_patient_ids_nocase,
+    _add_note_search,
+    _add_blob_refcounts,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(db_path=DB_PATH):
+    return query("PRAGMA user_version", db_path=db_path)[0][0]
+
+
+def migrate(db_path=DB_PATH, log=None):
+    """
+    Applies pending migrations in order, recording each in user_version.
+
+    Returns:
+        the schema version after migrating
+    """
+    version = schema_version(db_path)
+    for number, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        start = time.perf_counter()
+        step(db_path)
+        write(lambda conn: conn.execute(f"PRAGMA user_version = {number}"), db_path)
+        if log:
+            log(f"migration {number} ({step.__name__}) applied in {time.perf_counter() - start:.2f}s")
+    return max(version, SCHEMA_VERSION)
+
+
+def init_db(db_path=DB_PATH):
+    def create(conn):
+        conn.execute(CREATE_PATIENTS)
+        conn.execute(CREATE_VISITS)
+
+    write(create, db_path)
+    migrate(db_path)
+
+
+# -----------------------------
+# Patients / visits
+# -----------------------------
+INSERT_PATIENT = "INSERT OR IGNORE INTO patients (patient_id, created_at) VALUES (?, ?)"
+
+INSERT_VISIT = """
+    INSERT INTO visits (
+        patient_id, timestamp, age, gender, bp, hr, temp, symptom, pre_existing,
+        risk, confidence, department, priority, hospital_load, est_wait, pdf_note, safety_override, ts_epoch
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+UPDATE_TS_EPOCH = "UPDATE visits SET ts_epoch = ? WHERE id = ?"
+
+SELECT_PATIENTS = "SELECT patient_id, created_at FROM patients ORDER BY created_at DESC"
+
+# The page of patients is cut first, so only its rows look up a latest
+# visit (one seek on idx_visits_patient_latest each)
+SELECT_PATIENT_SUMMARIES = """
+    SELECT p.patient_id, p.created_at, v.risk, v.confidence, v.department, v.priority
+    FROM (
+        SELECT patient_id, created_at FROM patients
+        WHERE {where}
+        ORDER BY {order}
+        LIMIT ?
+    ) AS p
+    LEFT JOIN visits v ON v.id = (
+        SELECT id FROM visits WHERE patient_id = p.patient_id ORDER BY id DESC LIMIT 1
+    )
+    ORDER BY {outer_order}
+"""
+
+SELECT_RECENT_VISITS = """
+    SELECT patient_id, timestamp, age, gender, bp, hr, temp, symptom, pre_existing,
+           risk, confidence, department, priority, hospital_load, est_wait, id
+    FROM visits
+    WHERE {where}
+    ORDER BY id {direction}
+    LIMIT ?
+"""
+
+SELECT_VISITS_BETWEEN = """
+    SELECT patient_id, timestamp, age, gender, bp, hr, temp, symptom, pre_existing,
+           risk, confidence, department, priority, hospital_load, est_wait
+    FROM visits
+    WHERE ts_epoch >= ? AND ts_epoch < ?
+    ORDER BY ts_epoch DESC
+    LIMIT ?
+"""
+
+SELECT_PATIENT_VISITS = """
+    SELECT timestamp, risk, confidence, department, priority, symptom, pre_existing, bp, hr, temp, hospital_load, est_wait
+    FROM visits
+    WHERE patient_id = ?
+    ORDER BY id DESC
+"""
+
+
+def _order_by(columns, descending, alias=""):
+    return ", ".join(f"{alias}{column}{' DESC' if descending else ''}" for column in columns)
+
+
+def _like_escape(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _patient_terms(search, mode, after=None, before=None):
+    """
+    WHERE terms for patients whose ID matches `search` case-insensitively,
+    in (ID NOCASE, ID) order strictly after / before the given ID.
+
+    A prefix is a range on idx_patients_id_nocase. A cursor replaces the
+    bound on its side (it always lies inside the range), so each side has
+    a single bound and SQLite seeks straight to the page. A substring
+    walks the same index from the cursor and filters with LIKE.
+    """
+    terms, params = [], []
+    low = high = None
+    if mode == "prefix":
+        low, high = search, search + NOCASE_MAX_CHAR
+    else:
+        terms.append("patient_id LIKE ? ESCAPE '\\'")
+        params.append(f"%{_like_escape(search)}%")
+
+    if after is not None:
+        terms.append("patient_id COLLATE NOCASE >= ? AND (patient_id COLLATE NOCASE > ? OR patient_id > ?)")
+        params += [after] * 3
+        low = None
+    if before is not None:
+        terms.append("patient_id COLLATE NOCASE <= ? AND (patient_id COLLATE NOCASE < ? OR patient_id < ?)")
+        params += [before] * 3
+        high = None
+    if low is not None:
+        terms.append("patient_id COLLATE NOCASE >= ?")
+        params.append(low)
+    if high is not None:
+        terms.append("patient_id COLLATE NOCASE < ?")
+        params.append(high)
+    return terms, params
+
+
+def _visit_patient_term(search, mode, db_path):
+    """
+    WHERE term restricting visits to patients whose ID matches.
+
+    Matching IDs are looked up in the (much smaller) patients table
+    first. If they account for few visits (estimated from the average
+    visits per patient), the term lists them and each is a seek on
+    idx_visits_patient_latest. Otherwise matches are common, so walking
+    visits newest first and filtering fills a page after a short scan.
+
+    Returns:
+        (term, params), or None when no patient matches
+    """
+    visits, patients = query(
+        "SELECT (SELECT COALESCE(MAX(id), 0) FROM visits), (SELECT COALESCE(MAX(rowid), 0) FROM patients)",
+        db_path=db_path,
+    )[0]
+    max_ids = max(1, SEARCH_SEEK_VISITS * patients // max(visits, 1))
+
+    terms, params = _patient_terms(search, mode)
+    ids = [row[0] for row in query(
+        f"SELECT patient_id FROM patients WHERE {' AND '.join(terms)} LIMIT ?", (*params, max_ids + 1), db_path=db_path
+    )]
+    if not ids:
+        return None
+    if len(ids) <= max_ids:
+        return "patient_id IN (SELECT value FROM json_each(?))", [json.dumps(ids)]
+    pattern = _like_escape(search) + "%" if mode == "prefix" else f"%{_like_escape(search)}%"
+    return "patient_id LIKE ? ESCAPE '\\'", [pattern]
+
+
+def keyset_page(fetch, limit, cursor=None):
+    """
+    Fetches one page through a keyset-paginated function and reports
+    whether neighbouring pages exist.
+
+    Parameters:
+        fetch: callable(limit, after=None, before=None) returning rows in display order
+        limit: page size
+        cursor: None for the first page, ("after", row) or ("before", row)
+
+    Returns:
+        (rows, has_previous, has_next)
+    """
+    direction, row = cursor or (None, None)
+    if direction == "before":
+        rows = fetch(limit + 1, before=row)
+        if len(rows) > limit:
+            return rows[1:], True, True
+        direction = None  # reached the start: show a full first page
+    if direction == "after":
+        rows = fetch(limit + 1, after=row)
+        return rows[:limit], True, len(rows) > limit
+    rows = fetch(limit + 1)
+    return rows[:limit], False, len(rows) > limit
+
+
+def timestamp_epoch(value):
+    """
+    Seconds since the epoch for a visit timestamp: the value stored in
+    ts_epoch and the rule for range bounds. Naive times (the app writes
+    local wall-clock time) are read as UTC, so stored values and bounds
+    given as naive datetimes or strings line up whatever the server's
+    zone; aware datetimes are converted to UTC. Accepts datetimes and
+    ISO strings; None when unparseable.
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return timegm(value.utctimetuple())
+
+
+def save_visit(patient_id, input_data, result_data, pdf_note="", db_path=DB_PATH):
+    """Stores one triage visit (registering the patient if new) and returns the visit id."""
+    params = (
+        patient_id,
+        input_data.get("timestamp", ""),
+        input_data.get("age", None),
+        input_data.get("gender", ""),
+        input_data.get("bp", None),
+        input_data.get("hr", None),
+        input_data.get("temp", None),
+        input_data.get("symptom", ""),
+        input_data.get("pre_existing", ""),
+        result_data.get("risk", ""),
+        float(result_data.get("confidence", 0.0)),
+        result_data.get("department", ""),
+        result_data.get("priority", ""),
+        int(result_data.get("hospital_load", 0)),
+        int(result_data.get("est_wait", 0)),
+        (pdf_note or "")[:2000],
+        int(bool(result_data.get("safety_override", False))),
+        timestamp_epoch(input_data.get("timestamp", "")),
+    )
+
+    def insert(conn):
+        conn.execute(INSERT_PATIENT, (patient_id, datetime.now().strftime(TIMESTAMP_FORMAT)))
+        return conn.execute(INSERT_VISIT, params).lastrowid
+
+    return write(insert, db_path)
+
+
+def set_clinician_risk(visit_id, risk, db_path=DB_PATH):
+    """Records the clinician's own risk assessment (training label for models/incremental_train.py)."""
+    write(lambda conn: conn.execute("UPDATE visits SET clinician_risk = ? WHERE id = ?", (risk, visit_id)), db_path)
+
+
+def get_all_patients(db_path=DB_PATH):
+    return query(SELECT_PATIENTS, db_path=db_path)
+
+
+def get_patient_summaries(limit=50, search="", mode="prefix", after=None, before=None, db_path=DB_PATH):
+    """
+    One page of patients with their latest visit: newest first, or by
+    ID when searching.
+
+    Parameters:
+        search: patient ID text, matched case-insensitively ("" for all)
+        mode: "prefix" or "contains"
+        after / before: a row from the current page; returns the page
+            that follows / precedes it (keyset pagination)
+
+    Returns:
+        rows of (patient_id, created_at, risk, confidence, department, priority);
+        the visit fields are None for a patient without visits
+    """
+    search = (search or "").strip()
+    backwards = before is not None
+    cursor = before if backwards else after
+
+    if search:
+        cursor_id = cursor[0] if cursor is not None else None
+        terms, params = _patient_terms(
+            search, mode, after=None if backwards else cursor_id, before=cursor_id if backwards else None
+        )
+        columns, descending = ("patient_id COLLATE NOCASE", "patient_id"), False
+    else:
+        terms, params = [], []
+        if cursor is not None:
+            terms.append(f"(created_at, patient_id) {'>' if backwards else '<'} (?, ?)")
+            params += [cursor[1], cursor[0]]
+        columns, descending = ("created_at", "patient_id"), True
+
+    descending = descending != backwards
+    sql = SELECT_PATIENT_SUMMARIES.format(
+        where=" AND ".join(terms) or "1",
+        order=_order_by(columns, descending),
+        outer_order=_order_by(columns, descending, alias="p."),
+    )
+    rows = query(sql, (*params, limit), db_path=db_path)
+    return rows[::-1] if backwards else rows
+
+
+def get_recent_visits(limit=50, search="", mode="prefix", after=None, before=None, db_path=DB_PATH):
+    """
+    One page of visits, newest first, optionally only those of patients
+    whose ID matches `search` (see get_patient_summaries for the
+    parameters).
+
+    Returns:
+        rows of (patient_id, timestamp, age, gender, bp, hr, temp, symptom, pre_existing,
+        risk, confidence, department, priority, hospital_load, est_wait, id)
+    """
+    search = (search or "").strip()
+    backwards = before is not None
+    terms, params = [], []
+
+    if search:
+        match = _visit_patient_term(search, mode, db_path)
+        if match is None:
+            return []
+        terms.append(match[0])
+        params += match[1]
+    if after is not None:
+        terms.append("id < ?")
+        params.append(after[-1])
+    if backwards:
+        terms.append("id > ?")
+        params.append(before[-1])
+
+    sql = SELECT_RECENT_VISITS.format(where=" AND ".join(terms) or "1", direction="ASC" if backwards else "DESC")
+    rows = query(sql, (*params, limit), db_path=db_path)
+    return rows[::-1] if backwards else rows
+
+
+def get_visits_between(start, end, limit=1000, db_path=DB_PATH):
+    """Visits with start <= timestamp < end (datetimes, ISO strings or epoch seconds), newest first."""
+    return query(SELECT_VISITS_BETWEEN, (timestamp_epoch(start), timestamp_epoch(end), limit), db_path=db_path)
+
+
+def get_patient_visits(patient_id, db_path=DB_PATH):
+    return query(SELECT_PATIENT_VISITS, (patient_id,), db_path=db_path)
+
+
+def delete_patient(patient_id, blob_root=blob_store.BLOB_DIR, db_path=DB_PATH):
+    """
+    Deletes the patient, their visits and their uploaded reports. Stored
+    files only another patient still references are kept.
+
+    Returns:
+        number of blobs deleted from the store
+    """
+    def delete(conn):
+        conn.execute("DELETE FROM history_files WHERE patient_id = ?", (patient_id,))
+        # Delete visits first (foreign key safety)
+        conn.execute("DELETE FROM visits WHERE patient_id = ?", (patient_id,))
+        conn.execute("DELETE FROM patients WHERE patient_id = ?", (patient_id,))
+        return _collect_blobs(conn)
+
+    return _remove_blob_files(write(delete, db_path), blob_root, db_path)
+
+
+def delete_visit(patient_id, timestamp, db_path=DB_PATH):
+    write(lambda conn: conn.execute(
+        "DELETE FROM visits WHERE patient_id = ? AND timestamp = ?", (patient_id, timestamp)
+    ), db_path)
+
+
+# -----------------------------
+# Uploaded report index
+# -----------------------------
+INSERT_HISTORY_FILE = """
+    INSERT INTO history_files (patient_id, timestamp, original_name, stored_name, notes, blob_sha256)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# Registered before the row that references it; the row's trigger counts the reference
+INSERT_BLOB = "INSERT INTO blobs (sha256, size) VALUES (?, ?) ON CONFLICT (sha256) DO NOTHING"
+SELECT_BLOB = "SELECT 1 FROM blobs WHERE sha256 = ?"
+
+# Legacy import: a stored name already present means the row was imported before
+IMPORT_HISTORY_FILE = """
+    INSERT OR IGNORE INTO history_files (patient_id, timestamp, original_name, stored_name, notes)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+SELECT_HISTORY_FILES = """
+    SELECT timestamp, original_name, stored_name, notes, blob_sha256
+    FROM history_files
+    WHERE patient_id = ?
+    ORDER BY timestamp DESC
+"""
+
+# Files follow committed rows: a staged blob is moved into the store
+# only after the row referencing it has committed, and a collected
+# blob's file is deleted only after the row's deletion has committed.
+# A rolled-back transaction therefore leaves no file behind and takes
+# none away.
+def _collect_blobs(conn):
+    """Deletes unreferenced blob rows inside the caller's transaction. Returns their digests."""
+    unreferenced = [row[0] for row in conn.execute("SELECT sha256 FROM blobs WHERE refcount <= 0")]
+    for sha256 in unreferenced:
+        conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+    return unreferenced
+
+
+def _remove_blob_files(digests, root, db_path):
+    """
+    Deletes the stored files of blobs without a row, once the deletion
+    has committed. Checked under the write lock: an upload of the same
+    content either committed its row first (the file is kept) or
+    commits after and moves its own copy into place.
+
+    Returns:
+        number of files deleted
+    """
+    def remove(conn):
+        removed = 0
+        for sha256 in digests:
+            if conn.execute(SELECT_BLOB, (sha256,)).fetchone() is None:
+                blob_store.remove(sha256, root)
+                removed += 1
+        return removed
+
+    return write(remove, db_path) if digests else 0
+
+
+def add_history_file(patient_id, timestamp, original_name, stored_name=None, notes="", blob=None,
+                     blob_root=blob_store.BLOB_DIR, db_path=DB_PATH):
+    """
+    Records one uploaded report and returns its id.
+
+    Parameters:
+        blob: blob_store.StagedBlob with the file's bytes, moved into the
+            store once the row has committed (the same content is stored
+            once); left staged if the row cannot be written
+        stored_name: legacy flat file name, for uploads outside the store
+    """
+    params = (
+        (patient_id or "").strip(), timestamp, original_name, stored_name, notes or "",
+        blob.sha256 if blob is not None else None,
+    )
+
+    def insert(conn):
+        if blob is not None:
+            conn.execute(INSERT_BLOB, (blob.sha256, blob.size))
+        return conn.execute(INSERT_HISTORY_FILE, params).lastrowid
+
+    row_id = write(insert, db_path)
+    if blob is not None:
+        try:
+            blob_store.commit(blob, blob_root)
+        except BaseException:
+            # No file to point at: drop the row (the blob row is collected later)
+            write(lambda conn: conn.execute("DELETE FROM history_files WHERE id = ?", (row_id,)), db_path)
+            raise
+    return row_id
+
+
+def get_history_files(patient_id, db_path=DB_PATH):
+    """
+    Uploaded reports of one patient, latest first.
+
+    Returns:
+        rows of (timestamp, original_name, stored_name, notes, blob_sha256);
+        blob_sha256 is None for a legacy flat file (stored_name)
+    """
+    return query(SELECT_HISTORY_FILES, ((patient_id or "").strip(),), db_path=db_path)
+
+
+def adopt_legacy_uploads(history_dir, blob_root=blob_store.BLOB_DIR, db_path=DB_PATH):
+    """
+    Moves flat upload files (<history_dir>/<stored_name>) into the blob
+    store, one transaction per file, deleting each flat file once its row
+    points at the stored blob. Rows whose file is missing are left as
+    they are.
+
+    Returns:
+        number of files adopted
+    """
+    rows = query(
+        "SELECT id, stored_name FROM history_files WHERE blob_sha256 IS NULL AND stored_name IS NOT NULL",
+        db_path=db_path,
+    )
+    adopted = 0
+    for row_id, stored_name in rows:
+        path = os.path.join(history_dir, stored_name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            blob = blob_store.stage(f, blob_root)
+
+        def point(conn):
+            conn.execute(INSERT_BLOB, (blob.sha256, blob.size))
+            conn.execute("UPDATE history_files SET blob_sha256 = ? WHERE id = ?", (blob.sha256, row_id))
+
+        try:
+            write(point, db_path)
+        except BaseException:
+            blob_store.discard(blob)
+            raise
+        try:
+            blob_store.commit(blob, blob_root)
+        except BaseException:
+            # Keep serving the flat file
+            write(lambda conn: conn.execute(
+                "UPDATE history_files SET blob_sha256 = NULL WHERE id = ?", (row_id,)
+            ), db_path)
+            raise
+        os.remove(path)
+        adopted += 1
+    return adopted
+
+
+def collect_garbage(blob_root=blob_store.BLOB_DIR, db_path=DB_PATH):
+    """
+    Deletes blobs no upload references any more, stored files without a
+    blobs row (left by a crash between a deletion's commit and its file
+    removal), and staged uploads abandoned by crashed sessions.
+
+    Returns:
+        (blobs deleted, staged files deleted)
+    """
+    collected = write(_collect_blobs, db_path)
+    known = {row[0] for row in query("SELECT sha256 FROM blobs", db_path=db_path)}
+    orphans = [sha256 for sha256 in blob_store.iter_digests(blob_root) if sha256 not in known]
+    removed = _remove_blob_files(collected + orphans, blob_root, db_path)
+    return removed, blob_store.sweep_temp(blob_root)
+
+
+def import_history_csv(csv_path, db_path=DB_PATH):
+    """
+    One-shot import of a legacy history_index.csv into history_files.
+
+    Rows are inserted in one transaction, skipping stored names already
+    present, so a rerun is harmless. The CSV is then renamed to
+    <csv_path>.imported so later starts skip it.
+
+    Returns:
+        number of rows imported (0 when there is no CSV)
+    """
+    if not os.path.exists(csv_path):
+        return 0
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = [
+            (
+                (r.get("patient_id") or "").strip(),
+                r.get("timestamp") or "",
+                r.get("original_name") or "",
+                r.get("stored_name") or None,
+                r.get("notes") or "",
+            )
+            for r in csv.DictReader(f)
+        ]
+
+    # rowcount counts the rows this statement inserted, not the index triggers' writes
+    imported = write(lambda conn: conn.executemany(IMPORT_HISTORY_FILE, rows).rowcount, db_path)
+    os.replace(csv_path, f"{csv_path}.imported")
+    return imported
+
+
+# -----------------------------
+# Note search
+# -----------------------------
+# Each side keeps its best matches. ORDER BY rank LIMIT is consumed by
+# FTS5 itself: it scores every match but keeps only the best :limit in
+# its sorter, so the visits join and snippet() run :limit times however
+# common the terms are. rank is bm25() unless the table's rank option is
+# changed. bm25 depends on each index's own document count and lengths,
+# so a report's score says nothing about a note's: the two lists are
+# interleaved by position (best report, best note, second report, ...)
+# rather than merged on score.
+SEARCH_NOTES = """
+    SELECT source, patient_id, timestamp, ref, snippet, score FROM (
+        SELECT *, ROW_NUMBER() OVER (ORDER BY score) AS position FROM (
+            SELECT 'report' AS source, v.patient_id, v.timestamp, v.id AS ref,
+                   snippet(visit_notes_fts, 0, :open, :close, '…', :tokens) AS snippet,
+                   visit_notes_fts.rank AS score
+            FROM visit_notes_fts JOIN visits v ON v.id = visit_notes_fts.rowid
+            WHERE visit_notes_fts MATCH :match
+            ORDER BY visit_notes_fts.rank
+            LIMIT :limit
+        )
+        UNION ALL
+        SELECT *, ROW_NUMBER() OVER (ORDER BY score) FROM (
+            SELECT 'note', h.patient_id, h.timestamp, h.original_name,
+                   snippet(history_notes_fts, 0, :open, :close, '…', :tokens),
+                   history_notes_fts.rank AS score
+            FROM history_notes_fts JOIN history_files h ON h.id = history_notes_fts.rowid
+            WHERE history_notes_fts MATCH :match
+            ORDER BY history_notes_fts.rank
+            LIMIT :limit
+        )
+    )
+    ORDER BY position, source DESC
+    LIMIT :limit
+"""
+
+
+def fts_query(text):
+    """
+    FTS5 MATCH expression for free text: every word must appear (after
+    stemming, so "allergies" finds "allergy"). A trailing * makes the
+    last word a prefix ("warf*"); prefixes are opt-in because FTS5
+    merges the postings of every matching term first. Words are quoted,
+    so FTS5 operators in the input are taken literally. None when the
+    text has no words.
+    """
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    prefix = "*" if text.rstrip().endswith("*") else ""
+    return " ".join(f'"{word}"' for word in words) + prefix
+
+
+def search_notes(text, limit=20, db_path=DB_PATH):
+    """
+    Ranked full-text search over report text and intake notes.
+
+    Returns:
+        rows of (source, patient_id, timestamp, ref, snippet, score), reports
+        and notes alternating, each best first (see SEARCH_NOTES); source is
+        "report" (ref = visit id) or "note" (ref = uploaded file name), and
+        score is bm25 within that source only. Matched terms in the snippet
+        are wrapped in SNIPPET_MARKS.
+    """
+    match = fts_query(text)
+    if match is None:
+        return []
+    params = {
+        "match": match,
+        "limit": limit,
+        "open": SNIPPET_MARKS[0],
+        "close": SNIPPET_MARKS[1],
+        "tokens": SNIPPET_TOKENS,
+    }
+    return query(SEARCH_NOTES, params, db_path=db_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Triage database maintenance.")
+    parser.add_argument("command", choices=["migrate", "status", "import-history", "gc"])
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--csv", default=os.path.join(ROOT_DIR, "app", "history_files", "history_index.csv"),
+                        help="legacy upload index for import-history")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        version = migrate(args.db, log=print)
+        print(f"{args.db} is at schema version {version}")
+    elif args.command == "import-history":
+        init_db(args.db)
+        print(f"imported {import_history_csv(args.csv, args.db)} rows from {args.csv}")
+    elif args.command == "gc":
+        blobs, staged = collect_garbage(db_path=args.db)
+        print(f"deleted {blobs} unreferenced blobs and {staged} abandoned uploads")
+    else:
+        print(f"{args.db}: schema version {schema_version(args.db)} (latest {SCHEMA_VERSION})")
@@ -0,0 +1,128 @@
+"""
+Lookup-table categorical encoding.
+
+The LabelEncoders in label_encoders.pkl go through sklearn validation
+and np.searchsorted on every transform call, even for one value.
+compile_encoders() turns each one into a CategoryCodec backed by a
+plain dict, with vectorized batch encode/decode and an explicit policy
+for categories the model never saw in training.
+
+Missing values: the training CSV is read with pandas defaults, so a
+"None" pre-existing condition was learnt as NaN. Every missing spelling
+("None", "", None, NaN) encodes to that NaN class when the encoder has
+one.
+"""
+
+import numpy as np
+import pandas as pd
+
+MISSING_TOKENS = ("None", "")
+
+# Unseen-category policies for CategoryCodec.encode
+UNSEEN_ERROR = "error"   # raise ValueError, like LabelEncoder.transform
+UNSEEN_NAN = "nan"       # encode as NaN; the forest routes it like a missing value
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value)) or value in MISSING_TOKENS
+
+
+class CategoryCodec:
+    """
+    Dict-backed replacement for a fitted LabelEncoder.
+
+    transform / inverse_transform / classes_ behave like the sklearn
+    encoder, so a codec can be used anywhere the encoder was.
+    """
+
+    def __init__(self, name, classes):
+        self.name = name
+        self.classes_ = np.array(list(classes), dtype=object)
+        self.missing_code = None
+        self.codes = {}
+        for code, value in enumerate(self.classes_):
+            if _is_missing(value):
+                self.missing_code = code
+            else:
+                self.codes[value] = code
+        self._index = pd.Index(list(self.codes), dtype=object)
+        self._index_codes = np.fromiter(self.codes.values(), dtype=np.int64, count=len(self.codes))
+
+    def __repr__(self):
+        return f"CategoryCodec({self.name!r}, {list(self.classes_)!r})"
+
+    def _unseen(self, values):
+        raise ValueError(f"Unseen {self.name} categories: {sorted(set(map(str, values)))}")
+
+    # -----------------------------
+    # Single values
+    # -----------------------------
+    def encode_one(self, value, unseen=UNSEEN_ERROR):
+        """Code for one value (float NaN for unseen values under UNSEEN_NAN)."""
+        code = self.codes.get(value)
+        if code is not None:
+            return code
+        if self.missing_code is not None and _is_missing(value):
+            return self.missing_code
+        if unseen == UNSEEN_NAN:
+            return np.nan
+        self._unseen([value])
+
+    def decode_one(self, code):
+        return self.classes_[int(code)]
+
+    # -----------------------------
+    # Batches
+    # -----------------------------
+    def encode(self, values, unseen=UNSEEN_ERROR):
+        """
+        Encodes a whole column.
+
+        Returns:
+            int64 array of codes, or float64 with NaN where values were
+            unseen and unseen=UNSEEN_NAN.
+        """
+        values = pd.Series(np.asarray(values, dtype=object), dtype=object)
+        positions = self._index.get_indexer(values)
+        codes = np.where(positions >= 0, self._index_codes[positions], -1)
+
+        if self.missing_code is not None:
+            codes[(values.isna() | values.isin(MISSING_TOKENS)).to_numpy()] = self.missing_code
+
+        unknown = codes < 0
+        if not unknown.any():
+            return codes
+        if unseen == UNSEEN_NAN:
+            return np.where(unknown, np.nan, codes)
+        self._unseen(values[unknown])
+
+    def decode(self, codes):
+        return self.classes_[np.asarray(codes, dtype=np.int64)]
+
+    def known(self, values):
+        """Boolean mask of values this codec can encode."""
+        return ~np.isnan(np.asarray(self.encode(values, unseen=UNSEEN_NAN), dtype=float))
+
+    # LabelEncoder-compatible aliases
+    def transform(self, values):
+        return self.encode(values)
+
+    def inverse_transform(self, codes):
+        return self.decode(codes)
+
+
+def compile_encoders(encoders):
+    """
+    Compiles a dict of fitted LabelEncoders (or class lists) into codecs.
+
+    Parameters:
+        encoders: {"gender": LabelEncoder, ...}
+
+    Returns:
+        {"gender": CategoryCodec, ...}
+    """
+    return {
+        name: enc if isinstance(enc, CategoryCodec)
+        else CategoryCodec(name, getattr(enc, "classes_", enc))
+        for name, enc in encoders.items()
+    }
@@ -1,3 +1,13 @@
+import threading
+import weakref
+
+import numpy as np
+
+from utils.compiled_forest import CompiledForest, compile_forest
+
+CONTRIBUTION_CHUNK_ROWS = 2048
+
+
 def get_feature_importance(model, feature_names, top_n=3):
     """
     Returns top N important features from trained model.
@@ -38,4 +48,154 @@ def get_feature_importance(model, feature_names, top_n=3):
         for feature, score in top_features
     ]
 
-    return result
\ No newline at end of file
+    return result
+
+
+# -----------------------------
+# Per-patient path contributions
+# -----------------------------
+class PathExplainer:
+    """
+    Decision-path decomposition of a RandomForest prediction.
+
+    Every split a patient passes through moves the class distribution
+    from the parent node's value to the child's; that change is credited
+    to the feature the parent split on. Summed along the path and
+    averaged over trees:
+
+        predict_proba(x) == bias + contributions(x).sum(over features)
+
+    where bias is the mean root distribution (the training class mix).
+
+    The forest is walked over the flat node tables of
+    utils/compiled_forest.py, whose entry_delta table holds each node's
+    change in class distribution, so one patient or a whole batch is a
+    fixed number of NumPy steps. A CompiledForest is used as it is (in
+    shared serving mode its tables stay views onto the shared mapping).
+    """
+
+    def __init__(self, model):
+        self.forest = model if isinstance(model, CompiledForest) else compile_forest(model)
+        if self.forest.entry_delta is None:
+            raise ValueError("Compiled forest has no entry_delta table; export it again to explain predictions")
+        self.bias = np.asarray(self.forest.meta["bias"], dtype=np.float64)
+        # One contiguous row per class: 1-D gathers are far cheaper than
+        # gathering (n, n_classes) blocks
+        self.entry_delta = self.forest.entry_delta
+        self.classes_ = self.forest.classes_
+        self.n_features_in_ = self.forest.n_features_in_
+
+    def contributions(self, X):
+        """
+        Per-feature contributions for every sample.
+
+        Parameters:
+            X: DataFrame or 2-D array of encoded features (model order)
+
+        Returns:
+            float64 array (n_samples, n_features, n_classes)
+        """
+        X = self.forest._as_matrix(X)
+        out = np.empty((X.shape[0], self.n_features_in_, self.forest.n_classes_), dtype=np.float64)
+        for start in range(0, X.shape[0], CONTRIBUTION_CHUNK_ROWS):
+            block = X[start:start + CONTRIBUTION_CHUNK_ROWS]
+            out[start:start + len(block)] = self._contributions_block(block)
+        return out
+
+    def _contributions_block(self, X):
+        forest = self.forest
+        n, n_features = X.shape
+        n_trees, n_classes = forest.n_trees, forest.n_classes_
+
+        flat = np.ascontiguousarray(X).ravel()
+        row = np.repeat(np.arange(n, dtype=np.intp), n_trees)
+        node = np.tile(forest._roots, n)
+
+        totals = np.zeros((n_classes, n * n_features), dtype=np.float64)
+        for _ in range(forest.max_depth):
+            split_feature = forest._feature[node]
+            child = forest._step(node, flat[row * n_features + split_feature])
+            moved = child != node
+            if not moved.any():
+                break
+            entered = child[moved]
+            bucket = row[moved] * n_features + split_feature[moved]
+            for c in range(n_classes):
+                totals[c] += np.bincount(
+                    bucket, weights=self.entry_delta[c].take(entered), minlength=n * n_features
+                )
+            node = child
+
+        return totals.T.reshape(n, n_features, n_classes) / n_trees
+
+    def explain_one(self, row):
+        """Contributions for one patient (1-D feature vector), shape (n_features, n_classes)."""
+        return self.contributions(np.asarray(row, dtype=np.float32)[None, :])[0]
+
+
+_explainers = weakref.WeakKeyDictionary()
+_explainers_lock = threading.Lock()
+
+
+def get_explainer(model):
+    """
+    PathExplainer for `model`, built once per loaded model object.
+
+    The model registry hands out a new object whenever the model file
+    changes (or a new shared version is attached), so a retrained model
+    gets a fresh explainer. Returns None for models that cannot be
+    decomposed: neither a forest nor a CompiledForest with an
+    entry_delta table (exported or published before it was added).
+    """
+    if isinstance(model, CompiledForest):
+        if model.entry_delta is None:
+            return None
+    elif not hasattr(model, "estimators_"):
+        return None
+    with _explainers_lock:
+        explainer = _explainers.get(model)
+        if explainer is None:
+            explainer = PathExplainer(model)
+            _explainers[model] = explainer
+        return explainer
+
+
+def get_patient_drivers(model, encoded_row, feature_names, class_index, top_n=3):
+    """
+    Returns the features that pushed one patient's prediction towards
+    `class_index` hardest, in either direction.
+
+    Parameters:
+        model: trained RandomForest
+        encoded_row: encoded feature values in `feature_names` order
+        feature_names: model feature order
+        class_index: encoded class being explained (usually the prediction)
+        top_n: number of drivers to return
+
+    Returns:
+        List of dictionaries, largest absolute contribution first:
+        [
+            {"feature": str, "importance": float, "contribution": float},
+            ...
+        ]
+        importance is the feature's share of the total absolute
+        contribution; contribution is the signed change in the class
+        probability. Falls back to global importances when the model
+        cannot be decomposed.
+    """
+    explainer = get_explainer(model)
+    if explainer is None:
+        return get_feature_importance(model, feature_names, top_n=top_n)
+
+    values = explainer.explain_one(encoded_row)[:, int(class_index)]
+    total = np.abs(values).sum()
+    order = np.argsort(-np.abs(values), kind="stable")[:top_n]
+
+    return [
+        {
+            "feature": feature_names[i],
+            "importance": round(float(abs(values[i]) / total), 4) if total else 0.0,
+            "contribution": round(float(values[i]), 4)
+        }
+        for i in order
+    ]
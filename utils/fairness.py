@@ -1,7 +1,49 @@
+import numpy as np
 import pandas as pd
 
+from utils.model_registry import get_codecs
 
-def evaluate_gender_fairness(model, X, y_true, gender_column="gender"):
+# Representative ages used to probe each age band. "<40" covers every
+# age below 40, including patients under 18 (see age_band).
+AGE_BANDS = {
+    "<40": 30,
+    "40-59": 50,
+    "60+": 75,
+}
+# Lower age bounds of the bands above (after the first)
+AGE_BAND_EDGES = [40, 60]
+
+# Threshold of concern for a difference in High-risk rates (10%)
+FAIRNESS_THRESHOLD = 0.10
+
+
+def exceeds_threshold(difference, threshold=FAIRNESS_THRESHOLD):
+    """True when a difference in High-risk rates is a concern."""
+    return abs(difference) >= threshold
+
+
+def age_band(ages):
+    """Maps an array of ages to AGE_BANDS labels."""
+    labels = np.array(list(AGE_BANDS), dtype=object)
+    return labels[np.searchsorted(AGE_BAND_EDGES, np.asarray(ages, dtype=float), side="right")]
+
+
+def count_by_group(frame, by, columns):
+    """
+    Sums `columns` of frame per group of the `by` columns.
+
+    Returns:
+        {group values (tuple): [sum per column]}
+    """
+    sums = frame.groupby(list(by), sort=False)[list(columns)].sum()
+    return {
+        key if isinstance(key, tuple) else (key,): [int(v) for v in values]
+        for key, values in zip(sums.index, sums.to_numpy())
+    }
+
+
+def evaluate_gender_fairness(model, X, y_true, gender_column="gender", *,
+                             high_label=None, male_code=1, female_code=0):
     """
     Evaluates whether model predictions are disproportionately
     labeling one gender as High risk.
@@ -11,6 +53,8 @@ def evaluate_gender_fairness(model, X, y_true, gender_column="gender"):
         X: feature dataframe
         y_true: actual labels (optional, for extension)
         gender_column: column name for gender
+        high_label: encoded "High" class (default: from the saved risk encoder)
+        male_code, female_code: encoded gender values to compare
 
     Returns:
         {
@@ -21,37 +65,79 @@ def evaluate_gender_fairness(model, X, y_true, gender_column="gender"):
         }
     """
 
-    # Make predictions
-    predictions = model.predict(X)
+    if high_label is None:
+        high_label = get_codecs()["risk"].encode_one("High")
 
-    # Attach predictions to dataframe
-    df = X.copy()
-    df["prediction"] = predictions
-
-    # High risk assumed label = 2
-    HIGH_LABEL = 2
-
-    male_data = df[df[gender_column] == 1]
-    female_data = df[df[gender_column] == 0]
-
-    male_high_rate = (
-        (male_data["prediction"] == HIGH_LABEL).mean()
-        if len(male_data) > 0 else 0
+    # Make predictions
+    is_high = np.asarray(model.predict(X)) == high_label
+    counts = count_by_group(
+        pd.DataFrame({"gender": np.asarray(X[gender_column]), "n": 1, "high": is_high.astype(np.int64)}),
+        ["gender"], ["n", "high"],
     )
 
-    female_high_rate = (
-        (female_data["prediction"] == HIGH_LABEL).mean()
-        if len(female_data) > 0 else 0
-    )
+    def high_rate(code):
+        n, high = counts.get((code,), (0, 0))
+        return high / n if n else 0
 
-    difference = abs(male_high_rate - female_high_rate)
+    male_high_rate = high_rate(male_code)
+    female_high_rate = high_rate(female_code)
 
-    # Threshold of concern (10%)
-    fairness_threshold = 0.10
+    difference = abs(male_high_rate - female_high_rate)
 
     return {
         "male_high_rate": round(male_high_rate, 3),
         "female_high_rate": round(female_high_rate, 3),
         "difference": round(difference, 3),
-        "fair": difference < fairness_threshold
-    }
\ No newline at end of file
+        "fair": not exceeds_threshold(difference)
+    }
+
+
+def counterfactual_predictions(model, base_row, feature_names, variants):
+    """
+    Scores a patient and every protected-attribute counterfactual
+    of that patient with one predict_proba call.
+
+    Parameters:
+        model: trained ML model (RandomForest or CompiledForest)
+        base_row: encoded feature values in `feature_names` order
+        feature_names: model feature order
+        variants: {column: {label: encoded value}}, e.g.
+            {"gender": {"Male": 1, "Female": 0}, "age": AGE_BANDS}
+
+    Returns:
+        {
+            "probabilities": array (base patient),
+            "prediction": encoded class (base patient),
+            "counterfactuals": {column: {label: encoded class}},
+            "flags": {column: bool}   # True if the variants disagree
+        }
+    """
+    feature_names = list(feature_names)
+    base_row = np.asarray(base_row, dtype=float)
+
+    rows = [base_row]
+    labels = []
+    for column, values in variants.items():
+        position = feature_names.index(column)
+        for label, value in values.items():
+            row = base_row.copy()
+            row[position] = value
+            rows.append(row)
+            labels.append((column, label))
+
+    probabilities = model.predict_proba(pd.DataFrame(rows, columns=feature_names))
+    predictions = model.classes_.take(probabilities.argmax(axis=1))
+
+    counterfactuals = {column: {} for column in variants}
+    for (column, label), pred in zip(labels, predictions[1:]):
+        counterfactuals[column][label] = pred
+
+    return {
+        "probabilities": probabilities[0],
+        "prediction": predictions[0],
+        "counterfactuals": counterfactuals,
+        "flags": {
+            column: len(set(preds.values())) > 1
+            for column, preds in counterfactuals.items()
+        },
+    }
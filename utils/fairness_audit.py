@@ -0,0 +1,224 @@
+"""
+Dataset-level fairness audit.
+
+Computes the High-risk rates evaluate_gender_fairness (utils/fairness.py)
+compares for two genders, for many more groups and over whole visit
+histories; both use count_by_group and exceeds_threshold. The source
+is read in chunks from the app's `visits` table or from a CSV, and each
+chunk is predicted in a worker process that loaded the model once.
+Workers return only small per-group count tables, which are merged
+incrementally, and at most a few chunks are in flight at any time. So
+memory stays flat no matter how many rows are audited.
+
+Groups: gender, age band, symptom, pre-existing condition and every
+pairwise intersection of those.
+
+    python -m utils.fairness_audit --db app/triage.db --out audit.csv
+    python -m utils.fairness_audit --csv data/synthetic_triage_data.csv
+"""
+
+import argparse
+import itertools
+import os
+import sqlite3
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.batch_triage import model_feature_order
+from utils.db import DB_PATH
+from utils.encoding import UNSEEN_NAN
+from utils.fairness import FAIRNESS_THRESHOLD, age_band, count_by_group, exceeds_threshold
+from utils.model_registry import get_codecs, get_model
+
+DIMENSIONS = ("gender", "age_band", "symptom", "pre_existing")
+GROUPINGS = [(d,) for d in DIMENSIONS] + list(itertools.combinations(DIMENSIONS, 2))
+
+# Per-group counters: rows, predicted High, labelled High, correctly predicted High
+COUNTERS = ("n", "pred_high", "true_high", "true_pos")
+
+DEFAULT_CHUNKSIZE = 50000
+MIN_GROUP_SIZE = 30
+
+
+# -----------------------------
+# Sources
+# -----------------------------
+def iter_csv(path, chunksize=DEFAULT_CHUNKSIZE):
+    columns = ["age", "gender", "bp", "hr", "temp", "symptom", "pre_existing", "risk"]
+    return pd.read_csv(path, chunksize=chunksize, usecols=lambda c: c in columns)
+
+
+def iter_visits(db_path=DB_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """Streams the visits table in id order. Model output is in `risk`, so no labels are used."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        query = "SELECT age, gender, bp, hr, temp, symptom, pre_existing FROM visits ORDER BY id"
+        for chunk in pd.read_sql_query(query, conn, chunksize=chunksize):
+            yield chunk
+    finally:
+        conn.close()
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+_worker_state = {}
+
+
+def _init_worker(model_path, encoder_path):
+    _worker_state["model"] = get_model(model_path) if model_path else get_model()
+    _worker_state["codecs"] = get_codecs(encoder_path) if encoder_path else get_codecs()
+
+
+def count_chunk(chunk, model=None, codecs=None):
+    """
+    Predicts one chunk and returns its per-group counts.
+
+    Returns:
+        {(grouping, group values): [n, pred_high, true_high, true_pos]}
+    """
+    if model is None:
+        model, codecs = _worker_state["model"], _worker_state["codecs"]
+
+    X = pd.DataFrame({
+        "age": chunk["age"].to_numpy(),
+        "bp": chunk["bp"].to_numpy(),
+        "hr": chunk["hr"].to_numpy(),
+        "temp": chunk["temp"].to_numpy(),
+        **{
+            col: codecs[col].encode(chunk[col], unseen=UNSEEN_NAN)
+            for col in ("gender", "symptom", "pre_existing")
+        },
+    })[model_feature_order(model)]
+
+    high = codecs["risk"].encode_one("High")
+    pred_high = model.predict(X) == high
+    if "risk" in chunk.columns:
+        true_high = chunk["risk"].to_numpy() == "High"
+    else:
+        true_high = np.zeros(len(chunk), dtype=bool)
+
+    frame = pd.DataFrame({
+        "gender": chunk["gender"].fillna("None").to_numpy(),
+        "age_band": age_band(chunk["age"]),
+        "symptom": chunk["symptom"].fillna("None").to_numpy(),
+        "pre_existing": chunk["pre_existing"].fillna("None").to_numpy(),
+        "n": 1,
+        "pred_high": pred_high.astype(np.int64),
+        "true_high": true_high.astype(np.int64),
+        "true_pos": (pred_high & true_high).astype(np.int64),
+    })
+
+    counts = {(("all",), ("all",)): [int(frame[c].sum()) for c in COUNTERS]}
+    for grouping in GROUPINGS:
+        for key, values in count_by_group(frame, grouping, COUNTERS).items():
+            counts[(grouping, key)] = values
+    return counts
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+def _merge(total, counts):
+    for key, values in counts.items():
+        acc = total[key]
+        for i, v in enumerate(values):
+            acc[i] += v
+
+
+def run_audit(chunks, workers=None, model_path=None, encoder_path=None):
+    """
+    Runs the audit over an iterable of DataFrame chunks.
+
+    Parameters:
+        chunks: iterable of DataFrames (see iter_csv / iter_visits)
+        workers: worker processes (default: CPU count); 0 runs inline
+        model_path, encoder_path: override the registry defaults
+
+    Returns:
+        merged counts {(grouping, group values): [n, pred_high, true_high, true_pos]}
+    """
+    total = defaultdict(lambda: [0] * len(COUNTERS))
+
+    if workers == 0:
+        _init_worker(model_path, encoder_path)
+        for chunk in chunks:
+            _merge(total, count_chunk(chunk))
+        return dict(total)
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(model_path, encoder_path)
+    ) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(count_chunk, chunk))
+            if len(pending) >= max_in_flight:
+                _merge(total, pending.pop(0).result())
+        for future in pending:
+            _merge(total, future.result())
+    return dict(total)
+
+
+def audit_report(counts, threshold=FAIRNESS_THRESHOLD, min_group_size=MIN_GROUP_SIZE):
+    """
+    Turns merged counts into a report, one row per group.
+
+    high_rate is the share of the group predicted High. difference
+    compares it with the rate over all audited rows. A group is flagged
+    when it has at least `min_group_size` rows and the difference
+    reaches `threshold` (exceeds_threshold, as in evaluate_gender_fairness).
+    When labels are present, high_recall is the share of truly High
+    patients the model also predicted High.
+    """
+    n, pred_high, _, _ = counts[(("all",), ("all",))]
+    overall = pred_high / n if n else 0.0
+
+    rows = []
+    for (grouping, values), (g_n, g_pred, g_true, g_tp) in counts.items():
+        if grouping == ("all",):
+            continue
+        rate = g_pred / g_n if g_n else 0.0
+        rows.append({
+            "dimension": " x ".join(grouping),
+            "group": " | ".join(map(str, values)),
+            "n": g_n,
+            "high_rate": round(rate, 4),
+            "overall_high_rate": round(overall, 4),
+            "difference": round(rate - overall, 4),
+            "high_recall": round(g_tp / g_true, 4) if g_true else None,
+            "flagged": g_n >= min_group_size and exceeds_threshold(rate - overall, threshold),
+        })
+    report = pd.DataFrame(rows)
+    if report.empty:
+        return report
+    return report.sort_values(["dimension", "group"]).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chunked, parallel fairness audit.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--db", default=None, help=f"SQLite database with a visits table (default {DB_PATH})")
+    source.add_argument("--csv", default=None)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--min-group-size", type=int, default=MIN_GROUP_SIZE)
+    parser.add_argument("--out", default=None, help="CSV report path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.csv:
+        chunks = iter_csv(args.csv, args.chunksize)
+    else:
+        chunks = iter_visits(args.db or DB_PATH, args.chunksize)
+
+    report = audit_report(run_audit(chunks, workers=args.workers), min_group_size=args.min_group_size)
+    report.to_csv(args.out or sys.stdout, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Process-wide registry for model artifacts.
+
+Streamlit re-executes app.py on every widget interaction, but imported
+modules stay in sys.modules, so artifacts cached here are unpickled
+once per process instead of once per rerun. An artifact is reloaded
+only when its file changes on disk.
+
+Paths are resolved relative to the repository, not the working
+directory.
+
+When TRIAGE_SHARED_MODEL_DIR is set, get_serving_artifacts() serves the
+model published there (see utils/shared_model.py) instead of a private
+copy.
+"""
+
+import os
+import sys
+import threading
+import time
+
+import joblib
+
+from utils.compiled_forest import compile_forest, load_compiled_forest
+from utils.encoding import compile_encoders
+from utils.shared_model import get_shared_client
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MODELS_DIR = os.path.join(ROOT_DIR, "models")
+MODEL_PATH = os.path.join(MODELS_DIR, "risk_model.pkl")
+ENCODER_PATH = os.path.join(MODELS_DIR, "label_encoders.pkl")
+COMPILED_PATH = os.path.join(MODELS_DIR, "risk_model.compiled")
+
+_lock = threading.RLock()
+_artifacts = {}
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes (getrusage reports KB on Linux, bytes on macOS)."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes():
+    """
+    Resident set size of this process in bytes.
+
+    Reads /proc on Linux; elsewhere falls back to peak_rss_bytes().
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def _file_stamp(path):
+    """Modification stamp of a file, or of the newest file in a directory."""
+    if os.path.isdir(path):
+        return max((os.stat(os.path.join(path, f)).st_mtime_ns for f in os.listdir(path)), default=0)
+    return os.stat(path).st_mtime_ns
+
+
+def load_artifact(path, loader=joblib.load, mmap_mode=None, **loader_kwargs):
+    """
+    Loads `path` once per process and returns the cached object after that.
+
+    Parameters:
+        path: artifact file or directory
+        loader: callable(path, **kwargs) that deserialises it
+        mmap_mode: forwarded to the loader (e.g. "r") to memory-map arrays
+
+    Returns:
+        the loaded object
+    """
+    path = os.path.abspath(path)
+    key = (path, mmap_mode, loader)
+    stamp = _file_stamp(path)
+
+    with _lock:
+        entry = _artifacts.get(key)
+        if entry is not None and entry["stamp"] == stamp:
+            entry["hits"] += 1
+            return entry["value"]
+
+        kwargs = dict(loader_kwargs)
+        if mmap_mode is not None:
+            kwargs["mmap_mode"] = mmap_mode
+
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        value = loader(path, **kwargs)
+        load_seconds = time.perf_counter() - start
+
+        _artifacts[key] = {
+            "value": value,
+            "stamp": stamp,
+            "path": path,
+            "loader": getattr(loader, "__name__", repr(loader)),
+            "mmap_mode": mmap_mode,
+            "load_seconds": load_seconds,
+            "rss_delta_bytes": current_rss_bytes() - rss_before,
+            "loaded_at": time.time(),
+            "loads": (entry["loads"] + 1) if entry else 1,
+            "hits": 0,
+        }
+        return value
+
+
+def _load_and_compile(path):
+    return compile_forest(joblib.load(path))
+
+
+def get_model(path=MODEL_PATH, mmap_mode=None):
+    """
+    The sklearn RandomForest risk model.
+
+    mmap_mode="r" memory-maps the numpy arrays joblib stored uncompressed
+    in the pickle instead of reading them into private memory.
+    """
+    return load_artifact(path, mmap_mode=mmap_mode)
+
+
+def get_encoders(path=ENCODER_PATH):
+    """Dict of label encoders saved by models/train_model.py."""
+    return load_artifact(path)
+
+
+def _load_codecs(path):
+    return compile_encoders(joblib.load(path))
+
+
+def get_codecs(path=ENCODER_PATH):
+    """
+    The label encoders compiled into dict-backed codecs (utils/encoding.py).
+    Drop-in for get_encoders() without sklearn's per-call overhead.
+    """
+    return load_artifact(path, loader=_load_codecs)
+
+
+def get_compiled_model(path=COMPILED_PATH, model_path=MODEL_PATH, mmap=True):
+    """
+    The risk model as a CompiledForest (see utils/compiled_forest.py).
+
+    Uses the exported tables at `path` when they exist, memory-mapped
+    by default so their pages come from the OS page cache; otherwise
+    compiles the pickled model once and caches the result.
+    """
+    if os.path.isdir(path):
+        return load_artifact(path, loader=load_compiled_forest, mmap_mode="r" if mmap else None)
+    return load_artifact(model_path, loader=_load_and_compile)
+
+
+def get_serving_artifacts():
+    """
+    (model, encoders) the app should predict with. The encoders are
+    always lookup-table codecs.
+
+    In shared mode (TRIAGE_SHARED_MODEL_DIR set) this is the live
+    published CompiledForest, mapped zero-copy and swapped automatically
+    when a new version is published; otherwise this process's own
+    CompiledForest (get_compiled_model).
+    """
+    shared_dir = os.environ.get("TRIAGE_SHARED_MODEL_DIR")
+    if shared_dir:
+        live = get_shared_client(shared_dir).get()
+        return live["model"], live["encoders"]
+    return get_compiled_model(), get_codecs()
+
+
+def registry_stats():
+    """
+    Load metrics for every cached artifact.
+
+    Returns:
+        {
+            "rss_bytes": int,
+            "artifacts": [
+                {"path", "loader", "mmap_mode", "load_seconds", "rss_delta_bytes",
+                 "loaded_at", "loads", "hits"},
+                ...
+            ]
+        }
+    """
+    with _lock:
+        artifacts = [
+            {k: v for k, v in entry.items() if k not in ("value", "stamp")}
+            for entry in _artifacts.values()
+        ]
+    return {"rss_bytes": current_rss_bytes(), "artifacts": artifacts}
+
+
+def clear_registry():
+    """Drops every cached artifact (next access reloads from disk)."""
+    with _lock:
+        _artifacts.clear()
@@ -0,0 +1,406 @@
+"""
+Text extraction for uploaded PDF reports, cached by content.
+
+Streamlit reruns the intake page on every widget change, so the same
+report would be parsed again on each keystroke. Results are keyed by
+the SHA-256 of the PDF bytes and kept at two levels:
+
+    memory   bounded LRU per process (MEMORY_ENTRIES, MEMORY_MAX_CHARS)
+    disk     <cache_dir>/ab/<sha256>.txt, shared by every app process
+
+Disk entries are written under a temporary name and renamed into
+place, so a concurrent reader sees either nothing or the whole text.
+Hits refresh the file's mtime; once DISK_MAX_BYTES is exceeded the
+least recently used files are pruned.
+
+A cache miss is parsed in the background (start_extraction), off the
+Streamlit script thread, by WORKERS fresh Python processes running
+utils/pdf_text_worker.py. They are started with subprocess: forking
+the multithreaded server can deadlock the child, and multiprocessing's
+spawn and forkserver would re-run the app script, which Streamlit
+installs as __main__. Each worker receives the PDF once and extracts
+page ranges; ranges come back in page order, a short first range ahead
+of PAGE_BATCH-sized ones, so the opening pages can be shown while the
+rest are read. Each worker may grow by at most WORKER_MEMORY_BYTES
+(RLIMIT_AS) and the whole document has a deadline
+(DOCUMENT_TIMEOUT_SECONDS), after which the workers are killed and the
+pages read so far are the result, as they are when a worker dies. Such a cut-off result is kept in
+the memory level only, with the number of pages it covers: reruns
+neither parse the file again nor lose the timed-out state, and once it
+is evicted (or in another process) the file is read again, which may
+finish on a less loaded machine.
+
+Cached report text is stored unencrypted, readable only by the app's
+user (0600). TRIAGE_PDF_CACHE_DIR overrides the location (default
+app/cache/pdf_text).
+"""
+
+import hashlib
+import importlib.util
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from io import BytesIO
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CACHE_DIR = os.environ.get("TRIAGE_PDF_CACHE_DIR", os.path.join(ROOT_DIR, "app", "cache", "pdf_text"))
+MEMORY_ENTRIES = 64
+MEMORY_MAX_CHARS = 32 * 1024 * 1024
+DISK_MAX_BYTES = 512 * 1024 * 1024
+PRUNE_EVERY = 50
+
+WORKERS = max(1, min(4, os.cpu_count() or 1))
+FIRST_BATCH = 2
+PAGE_BATCH = 8
+DOCUMENT_TIMEOUT_SECONDS = 30
+WORKER_MEMORY_BYTES = 1 << 30
+
+_memory = OrderedDict()
+_memory_chars = 0
+_lock = threading.Lock()
+_disk_writes = 0
+_running = {}
+
+# Text cut off by the deadline: pages_read of page_count pages
+Truncation = namedtuple("Truncation", ["pages_read", "page_count"])
+
+
+def pdf_sha256(data):
+    """Hex SHA-256 of a bytes-like object (bytes, memoryview, BytesIO buffer)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _pypdf_installed():
+    return importlib.util.find_spec("PyPDF2") is not None
+
+
+def parse_pdf(data):
+    """
+    Reads the text of every page with PyPDF2, in this process and with
+    no time limit (see start_extraction for the request path).
+
+    Returns:
+        the pages' text joined by newlines, "" when the file cannot be
+        read, None when PyPDF2 is not installed
+    """
+    try:
+        from PyPDF2 import PdfReader
+    except Exception:
+        return None
+    try:
+        reader = PdfReader(BytesIO(data))
+        return "\n".join(page.extract_text() or "" for page in reader.pages).strip()
+    except Exception:
+        return ""
+
+
+# -----------------------------
+# Memory level
+# -----------------------------
+def _memory_get(sha256):
+    """(text, Truncation or None), or None."""
+    with _lock:
+        entry = _memory.get(sha256)
+        if entry is not None:
+            _memory.move_to_end(sha256)
+        return entry
+
+
+def _memory_put(sha256, text, truncation=None):
+    global _memory_chars
+    if len(text) > MEMORY_MAX_CHARS:
+        return
+    with _lock:
+        if sha256 in _memory:
+            _memory.move_to_end(sha256)
+            return
+        _memory[sha256] = (text, truncation)
+        _memory_chars += len(text)
+        while len(_memory) > MEMORY_ENTRIES or _memory_chars > MEMORY_MAX_CHARS:
+            _, (evicted, _) = _memory.popitem(last=False)
+            _memory_chars -= len(evicted)
+
+
+def clear_memory():
+    global _memory_chars
+    with _lock:
+        _memory.clear()
+        _memory_chars = 0
+
+
+# -----------------------------
+# Disk level
+# -----------------------------
+def _disk_path(sha256, cache_dir):
+    return os.path.join(cache_dir, sha256[:2], f"{sha256}.txt")
+
+
+def _disk_get(sha256, cache_dir):
+    path = _disk_path(sha256, cache_dir)
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return text
+
+
+def _disk_put(sha256, text, cache_dir):
+    global _disk_writes
+    path = _disk_path(sha256, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+    with _lock:
+        _disk_writes += 1
+        due = _disk_writes % PRUNE_EVERY == 0
+    if due:
+        prune_disk(cache_dir)
+
+
+def prune_disk(cache_dir=CACHE_DIR, max_bytes=DISK_MAX_BYTES):
+    """Deletes the least recently used entries until the cache fits in max_bytes. Returns how many."""
+    entries = []
+    for root, _, files in os.walk(cache_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+# -----------------------------
+# Worker processes
+# -----------------------------
+def _page_ranges(page_count):
+    ranges = [(0, min(FIRST_BATCH, page_count))] if page_count else []
+    for start in range(FIRST_BATCH, page_count, PAGE_BATCH):
+        ranges.append((start, min(start + PAGE_BATCH, page_count)))
+    return ranges
+
+
+class _WorkerExited(Exception):
+    pass
+
+
+class _Worker:
+    """One utils/pdf_text_worker.py process; a thread queues its answers as they arrive."""
+
+    def __init__(self, data):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "utils.pdf_text_worker"],
+            cwd=ROOT_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+        self.answers = queue.Queue()
+        threading.Thread(target=self._read, name="pdf-text-worker", daemon=True).start()
+        self.send((data, WORKER_MEMORY_BYTES))
+
+    def _read(self):
+        try:
+            while True:
+                self.answers.put(pickle.load(self.process.stdout))
+        except Exception:
+            self.answers.put(_WorkerExited)
+
+    def send(self, message):
+        try:
+            pickle.dump(message, self.process.stdin)
+            self.process.stdin.flush()
+        except OSError:
+            pass  # the worker is gone; receive() reports it
+
+    def receive(self, timeout):
+        """The next answer; raises queue.Empty after timeout seconds, _WorkerExited if the worker died."""
+        answer = self.answers.get(timeout=timeout)
+        if answer is _WorkerExited:
+            raise _WorkerExited()
+        return answer
+
+    def close(self):
+        self.process.kill()
+        self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+
+# -----------------------------
+# Background extraction
+# -----------------------------
+class Extraction:
+    """
+    Text of one PDF, read in the background. text() returns the pages
+    finished so far, in order, and the whole text once done is set.
+    """
+
+    def __init__(self, sha256):
+        self.sha256 = sha256
+        self.page_count = None
+        self.pages = []
+        self.timed_out = False
+        self._text = None
+        self._pages_read = None
+        self._finished = threading.Event()
+
+    @classmethod
+    def finished(cls, sha256, text, truncation=None):
+        """A job for text already extracted (cut off by the deadline when truncation is given)."""
+        job = cls(sha256)
+        if truncation is not None:
+            job.timed_out = True
+            job._pages_read, job.page_count = truncation
+        job._text = text
+        job._finished.set()
+        return job
+
+    @property
+    def done(self):
+        return self._finished.is_set()
+
+    @property
+    def pages_done(self):
+        return len(self.pages) if self._pages_read is None else self._pages_read
+
+    def wait(self, timeout=None):
+        """Blocks until the extraction finishes or timeout seconds pass. Returns done."""
+        return self._finished.wait(timeout)
+
+    def text(self):
+        if self._text is not None:
+            return self._text
+        return "\n".join(list(self.pages)).strip()
+
+
+def _extract(job, data, cache_dir, timeout):
+    deadline = time.monotonic() + timeout
+    remaining = lambda: max(deadline - time.monotonic(), 0)
+    cache = True
+    workers = []
+    try:
+        for _ in range(WORKERS):
+            workers.append(_Worker(data))
+        workers[0].send(None)
+        job.page_count = workers[0].receive(remaining())
+        # Range i goes to worker i % WORKERS; each answers in request order
+        ranges = _page_ranges(job.page_count)
+        for i, bounds in enumerate(ranges):
+            workers[i % len(workers)].send(bounds)
+        for i in range(len(ranges)):
+            job.pages.extend(workers[i % len(workers)].receive(remaining()))
+    except (queue.Empty, _WorkerExited):
+        job.timed_out = True
+    except Exception:
+        cache = False  # e.g. no worker could start; the next upload of this file tries again
+    finally:
+        for worker in workers:
+            worker.close()
+        text = job.text()
+        truncation = Truncation(job.pages_done, job.page_count or 0) if job.timed_out else None
+        try:
+            if cache:
+                _memory_put(job.sha256, text, truncation)
+                if truncation is None:
+                    _disk_put(job.sha256, text, cache_dir)
+        finally:
+            job._text = text
+            with _lock:
+                _running.pop(job.sha256, None)
+            job._finished.set()
+
+
+# -----------------------------
+# Lookup
+# -----------------------------
+def cached_text(sha256, cache_dir=CACHE_DIR):
+    """
+    Text for a PDF already extracted by this or another process.
+
+    Returns:
+        (text, Truncation or None), or None when not cached
+    """
+    entry = _memory_get(sha256)
+    if entry is None:
+        text = _disk_get(sha256, cache_dir)
+        if text is not None:
+            entry = (text, None)
+            _memory_put(sha256, text)
+    return entry
+
+
+def start_extraction(data, sha256=None, cache_dir=CACHE_DIR, timeout=DOCUMENT_TIMEOUT_SECONDS):
+    """
+    Starts reading a PDF's text in the background, unless it is cached
+    or already being read (by another session of this process).
+
+    Parameters:
+        data: the PDF's bytes
+        sha256: its digest, when the caller already has it
+        timeout: seconds the whole document may take
+
+    Returns:
+        Extraction, already done on a cache hit
+    """
+    sha256 = sha256 or pdf_sha256(data)
+    entry = cached_text(sha256, cache_dir)
+    if entry is not None:
+        return Extraction.finished(sha256, *entry)
+    if not _pypdf_installed():
+        # Not cached: the same file reads fine once PyPDF2 is installed
+        return Extraction.finished(sha256, "")
+
+    with _lock:
+        job = _running.get(sha256)
+        if job is None:
+            job = _running[sha256] = Extraction(sha256)
+            threading.Thread(
+                target=_extract, args=(job, bytes(data), cache_dir, timeout),
+                name=f"pdf-text-{sha256[:12]}", daemon=True,
+            ).start()
+    return job
+
+
+def extract_text(data, sha256=None, cache_dir=CACHE_DIR, timeout=DOCUMENT_TIMEOUT_SECONDS):
+    """
+    Text of a PDF, parsed at most once per distinct file; blocks until
+    start_extraction's job finishes.
+
+    Returns:
+        (sha256, text)
+    """
+    job = start_extraction(data, sha256, cache_dir, timeout)
+    job.wait()
+    return job.sha256, job.text()
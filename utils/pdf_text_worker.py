@@ -0,0 +1,87 @@
+"""
+Worker process for utils/pdf_text.py, started as
+
+    python -m utils.pdf_text_worker
+
+It reads pickled messages on stdin: first (pdf bytes, memory bytes),
+then requests, each None (count the pages) or a (start, stop) page
+range. Answers are pickled to stdout in request order. It imports
+nothing from the app, so a worker starts with just this module and
+PyPDF2.
+"""
+
+import os
+import pickle
+import sys
+from io import BytesIO
+
+_data = None
+_reader_instance = None
+
+
+def _address_space_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def init_worker(data, memory_bytes):
+    """Keeps the PDF and caps how far the worker's address space may grow."""
+    global _data
+    _data = data
+    in_use = _address_space_bytes()
+    try:
+        import resource
+        if in_use is not None:
+            limit = in_use + memory_bytes
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass  # no address-space limit on this platform; the deadline still applies
+
+
+def _reader():
+    global _reader_instance
+    if _reader_instance is None:
+        from PyPDF2 import PdfReader
+        _reader_instance = PdfReader(BytesIO(_data))
+    return _reader_instance
+
+
+def count_pages():
+    try:
+        return len(_reader().pages)
+    except Exception:
+        return 0
+
+
+def extract_range(bounds):
+    """Text of pages [start, stop), "" for a page that cannot be read."""
+    start, stop = bounds
+    pages = []
+    for number in range(start, stop):
+        try:
+            pages.append(_reader().pages[number].extract_text() or "")
+        except (Exception, MemoryError):
+            pages.append("")
+    return pages
+
+
+def main():
+    requests = sys.stdin.buffer
+    results = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())  # stray prints must not corrupt the answers
+
+    init_worker(*pickle.load(requests))
+    while True:
+        try:
+            request = pickle.load(requests)
+        except EOFError:
+            return
+        pickle.dump(count_pages() if request is None else extract_range(request), results)
+        results.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def apply_safety_rules(age, bp, hr, temp, symptom, pre_existing):
     """
     Safety override rules for critical medical conditions.
@@ -69,4 +72,83 @@ def apply_safety_rules(age, bp, hr, temp, symptom, pre_existing):
     # -----------------------------
     # No override
     # -----------------------------
-    return None
\ No newline at end of file
+    return None
+
+
+# -----------------------------
+# Vectorized evaluation
+# -----------------------------
+
+# Rule names in the order apply_safety_rules checks them.
+# The first rule that matches a row is the one reported for it.
+SAFETY_RULES = (
+    "bp_high",
+    "bp_low",
+    "hr_high",
+    "hr_low",
+    "temp_high",
+    "temp_low",
+    "critical_symptom_elderly",
+    "critical_symptom_cardiac_history",
+    "young_child_fever",
+    "elderly_abnormal_vitals",
+)
+
+CRITICAL_SYMPTOMS = ["Chest Pain", "Seizure", "Shortness of Breath", "Unconsciousness"]
+CARDIAC_CONDITIONS = ["Heart Disease", "Hypertension"]
+
+NO_RULE = -1
+
+
+def evaluate_safety_rules(age, bp, hr, temp, symptom, pre_existing):
+    """
+    Vectorized version of apply_safety_rules for whole columns.
+
+    Parameters:
+        age, bp, hr, temp: numeric arrays / Series of equal length
+        symptom, pre_existing: string arrays / Series
+
+    Returns:
+        int8 array with the index into SAFETY_RULES of the rule that
+        fired for each row, or NO_RULE (-1) when no override applies.
+    """
+    age = np.asarray(age, dtype=float)
+    bp = np.asarray(bp, dtype=float)
+    hr = np.asarray(hr, dtype=float)
+    temp = np.asarray(temp, dtype=float)
+    symptom = np.asarray(symptom, dtype=object)
+    pre_existing = np.asarray(pre_existing, dtype=object)
+
+    critical = np.isin(symptom, CRITICAL_SYMPTOMS)
+
+    conditions = [
+        bp >= 180,
+        bp <= 80,
+        hr >= 130,
+        hr <= 40,
+        temp >= 103,
+        temp <= 95,
+        critical & (age >= 60),
+        critical & np.isin(pre_existing, CARDIAC_CONDITIONS),
+        (age <= 5) & (temp >= 101),
+        (age >= 70) & ((bp > 160) | (hr > 110)),
+    ]
+
+    # np.select picks the first matching condition, like the if-chain above
+    return np.select(conditions, np.arange(len(conditions)), default=NO_RULE).astype(np.int8)
+
+
+def safety_overrides(rule_ids):
+    """
+    Converts rule ids from evaluate_safety_rules into the values
+    apply_safety_rules returns: "High" where a rule fired, else None.
+    """
+    rule_ids = np.asarray(rule_ids)
+    return np.where(rule_ids != NO_RULE, "High", None).astype(object)
+
+
+def safety_rule_names(rule_ids):
+    """Maps rule ids to SAFETY_RULES names (None where no rule fired)."""
+    # NO_RULE (-1) indexes the trailing None
+    names = np.array(SAFETY_RULES + (None,), dtype=object)
+    return names[np.asarray(rule_ids)]
@@ -0,0 +1,267 @@
+"""
+Shared-memory model serving for multiple app processes on one host.
+
+One publisher compiles the risk model (utils/compiled_forest.py) and
+writes its node tables plus the label-encoder classes into a single
+versioned file. Every Streamlit worker memory-maps that file read-only
+and builds NumPy views straight onto the mapping. The pages live once
+in the OS page cache and are shared by all workers, so per-worker
+memory no longer grows with the size of the forest.
+
+Layout of <shared_dir>:
+
+    forest-<version>.bin   header + 64-byte aligned arrays, never modified
+    CURRENT                name of the live forest file
+
+Publishing writes the new file under a temporary name, renames it into
+place, then swaps CURRENT with another atomic rename. Workers notice
+the new CURRENT on their next check and re-attach. Requests that are
+still running keep using the old mapping, which stays valid even after
+the file is pruned.
+
+    python -m utils.shared_model publish
+    python -m utils.shared_model status
+"""
+
+import json
+import mmap
+import os
+import secrets
+import struct
+import threading
+import time
+
+import numpy as np
+
+from utils.compiled_forest import CompiledForest, compile_forest
+from utils.encoding import compile_encoders
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SHARED_DIR = os.environ.get("TRIAGE_SHARED_MODEL_DIR", os.path.join(ROOT_DIR, "models", "shared"))
+POINTER_FILE = "CURRENT"
+
+MAGIC = b"TRIAGEF1"
+ALIGN = 64
+
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _encoder_classes(encoders):
+    """Label-encoder classes as JSON-safe lists (NaN becomes null)."""
+    out = {}
+    for name, encoder in encoders.items():
+        out[name] = [
+            None if isinstance(c, float) and np.isnan(c) else (c.item() if hasattr(c, "item") else c)
+            for c in encoder.classes_
+        ]
+    return out
+
+
+def _rebuild_encoders(classes):
+    """Lookup-table codecs (utils/encoding.py) for the published encoder classes."""
+    return compile_encoders({
+        name: [np.nan if v is None else v for v in values]
+        for name, values in classes.items()
+    })
+
+
+# -----------------------------
+# Publisher
+# -----------------------------
+def new_version():
+    """UTC timestamp plus a random suffix, so two publishes in one second differ."""
+    return f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{secrets.token_hex(3)}"
+
+
+def publish_model(model, encoders, shared_dir=SHARED_DIR, version=None, keep=2):
+    """
+    Publishes a model for shared serving and makes it the live version.
+
+    Parameters:
+        model: fitted RandomForestClassifier or CompiledForest
+        encoders: dict of label encoders
+        shared_dir: directory shared by all workers on the host
+        version: version label (defaults to a UTC timestamp plus a random
+            suffix); FileExistsError if that version is already published
+        keep: number of published versions to keep on disk
+
+    Returns:
+        the published version string
+    """
+    forest = model if isinstance(model, CompiledForest) else compile_forest(model)
+    version = version or new_version()
+    os.makedirs(shared_dir, exist_ok=True)
+
+    tables = {name: np.ascontiguousarray(array) for name, array in forest.tables().items()}
+    layout = {}
+    offset = 0
+    for name, array in tables.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({
+        "version": version,
+        "meta": forest.meta,
+        "arrays": layout,
+        "encoders": _encoder_classes(encoders),
+    }).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    file_name = f"forest-{version}.bin"
+    final_path = os.path.join(shared_dir, file_name)
+    tmp_path = final_path + f".tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in tables.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        # link() fails if the version exists, where rename() would replace it
+        os.link(tmp_path, final_path)
+    except FileExistsError:
+        raise FileExistsError(f"Version {version} is already published in {shared_dir}") from None
+    finally:
+        os.remove(tmp_path)
+
+    pointer_tmp = os.path.join(shared_dir, f"{POINTER_FILE}.tmp{os.getpid()}")
+    with open(pointer_tmp, "w") as f:
+        f.write(file_name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer_tmp, os.path.join(shared_dir, POINTER_FILE))
+
+    prune_versions(shared_dir, keep=keep)
+    return version
+
+
+def prune_versions(shared_dir=SHARED_DIR, keep=2):
+    """Deletes all but the newest `keep` forest files (never the live one)."""
+    live = _read_pointer(shared_dir)
+    files = sorted(
+        (f for f in os.listdir(shared_dir) if f.startswith("forest-") and f.endswith(".bin")),
+        key=lambda f: os.stat(os.path.join(shared_dir, f)).st_mtime_ns,
+        reverse=True,
+    )
+    for stale in files[keep:]:
+        if stale != live:
+            os.remove(os.path.join(shared_dir, stale))
+
+
+# -----------------------------
+# Workers
+# -----------------------------
+def _read_pointer(shared_dir):
+    try:
+        with open(os.path.join(shared_dir, POINTER_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def attach(shared_dir=SHARED_DIR):
+    """
+    Maps the live published model into this process without copying.
+
+    Returns:
+        {"version": str, "model": CompiledForest, "encoders": dict, "path": str}
+    """
+    file_name = _read_pointer(shared_dir)
+    if file_name is None:
+        raise FileNotFoundError(f"No model published in {shared_dir}")
+    path = os.path.join(shared_dir, file_name)
+
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buf[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a published triage model")
+    (header_len,) = struct.unpack_from("<Q", buf, len(MAGIC))
+    header_start = len(MAGIC) + 8
+    header = json.loads(bytes(buf[header_start:header_start + header_len]))
+    data_start = _align(header_start + header_len)
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arrays[name] = np.frombuffer(
+            buf, dtype=dtype, count=count, offset=data_start + spec["offset"]
+        ).reshape(spec["shape"])
+
+    # widen_indices=False keeps every table a view onto the shared pages
+    forest = CompiledForest(arrays, header["meta"], widen_indices=False)
+    return {
+        "version": header["version"],
+        "model": forest,
+        "encoders": _rebuild_encoders(header["encoders"]),
+        "path": path,
+    }
+
+
+class SharedModelClient:
+    """
+    Keeps a worker attached to the live published model.
+
+    get() returns the current attachment and re-reads the CURRENT
+    pointer at most every `check_interval` seconds, switching to a
+    newly published version when it changes.
+    """
+
+    def __init__(self, shared_dir=SHARED_DIR, check_interval=5.0):
+        self.shared_dir = shared_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._pointer = None
+        self._checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._current is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                pointer = _read_pointer(self.shared_dir)
+                if pointer != self._pointer or self._current is None:
+                    self._current = attach(self.shared_dir)
+                    self._pointer = os.path.basename(self._current["path"])
+            return self._current
+
+
+_client = None
+
+
+def get_shared_client(shared_dir=SHARED_DIR):
+    """Process-wide SharedModelClient for `shared_dir`."""
+    global _client
+    if _client is None or _client.shared_dir != shared_dir:
+        _client = SharedModelClient(shared_dir)
+    return _client
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from utils.model_registry import ENCODER_PATH, MODEL_PATH, get_encoders, get_model
+
+    parser = argparse.ArgumentParser(description="Publish the risk model for shared serving.")
+    parser.add_argument("command", choices=["publish", "status"])
+    parser.add_argument("--dir", default=SHARED_DIR)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--encoders", default=ENCODER_PATH)
+    parser.add_argument("--version", default=None)
+    parser.add_argument("--keep", type=int, default=2)
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        version = publish_model(
+            get_model(args.model), get_encoders(args.encoders),
+            shared_dir=args.dir, version=args.version, keep=args.keep,
+        )
+        print(f"Published version {version} to {args.dir}")
+    else:
+        live = attach(args.dir)
+        print(f"Live version {live['version']} ({live['path']}, {live['model'].nbytes / 1e6:.2f} MB)")
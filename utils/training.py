@@ -0,0 +1,249 @@
+"""
+Training pipeline shared by the model scripts in models/.
+
+Data is loaded with compact dtypes. Vitals become small ints or float32
+and categorical columns become pandas categoricals, so a multi-million
+row dataset costs a few bytes per cell instead of a Python string each.
+CSV is parsed in chunks; parquet is read column-wise. Encoding maps
+category codes to label codes with one lookup per column instead of
+LabelEncoder.fit_transform over the raw strings.
+
+The encoders produced are ordinary LabelEncoders with the same classes
+as the original training script, including the NaN class that a "None"
+pre-existing condition was learnt as, so label_encoders.pkl stays
+compatible with everything that loads it.
+
+Artifacts are written to models/versions/<version>/ together with a
+metadata.json, then promoted to models/risk_model.pkl and
+models/label_encoders.pkl, where the model registry picks them up.
+"""
+
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, recall_score
+from sklearn.preprocessing import LabelEncoder
+
+from utils.batch_triage import FEATURE_COLUMNS
+from utils.encoding import MISSING_TOKENS, UNSEEN_NAN, compile_encoders
+from utils.model_registry import ENCODER_PATH, MODEL_PATH, MODELS_DIR, ROOT_DIR
+
+DATA_PATH = os.path.join(ROOT_DIR, "data", "synthetic_triage_data.csv")
+VERSIONS_DIR = os.path.join(MODELS_DIR, "versions")
+METADATA_FILE = "metadata.json"
+
+CATEGORICAL_COLUMNS = ("gender", "symptom", "pre_existing")
+TARGET = "risk"
+
+DTYPES = {
+    "age": "int16",
+    "bp": "int16",
+    "hr": "int16",
+    "temp": "float32",
+    "gender": "category",
+    "symptom": "category",
+    "pre_existing": "category",
+    "risk": "category",
+}
+
+DEFAULT_PARAMS = {"n_estimators": 150, "random_state": 42, "n_jobs": -1}
+DEFAULT_CHUNKSIZE = 1_000_000
+
+
+# -----------------------------
+# Loading
+# -----------------------------
+def _concat_compact(frames):
+    """Concatenates chunks, merging per-chunk categories instead of falling back to object."""
+    if len(frames) == 1:
+        return frames[0]
+    out = {}
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            out[col] = pd.api.types.union_categoricals([f[col] for f in frames])
+        else:
+            out[col] = np.concatenate([f[col].to_numpy() for f in frames])
+    return pd.DataFrame(out)
+
+
+def read_dataset(path=DATA_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Loads a training dataset with compact dtypes.
+
+    Parameters:
+        path: .csv (parsed in chunks) or .parquet (needs pyarrow)
+        chunksize: CSV rows parsed per chunk
+
+    Returns:
+        DataFrame with the feature columns and risk
+    """
+    columns = list(DTYPES)
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path, columns=columns)
+        return df.astype(DTYPES)
+
+    # keep_default_na=False: "None" stays a category instead of being parsed to NaN
+    reader = pd.read_csv(
+        path, usecols=columns, dtype=DTYPES, keep_default_na=False, chunksize=chunksize
+    )
+    return _concat_compact(list(reader))[columns]
+
+
+# -----------------------------
+# Encoding
+# -----------------------------
+def fit_label_encoder(categories):
+    """
+    LabelEncoder with the classes LabelEncoder.fit would find on the
+    raw column: sorted labels, with missing spellings folded into one
+    trailing NaN class.
+    """
+    labels = [c for c in categories if c not in MISSING_TOKENS and not pd.isna(c)]
+    classes = sorted(labels)
+    if len(labels) != len(categories):
+        classes.append(np.nan)
+    encoder = LabelEncoder()
+    encoder.classes_ = np.asarray(classes, dtype=object)
+    return encoder
+
+
+def _encode_categorical(column, codec, unseen):
+    """Label codes for a categorical column via its category codes (one lookup per category)."""
+    column = column.astype("category")
+    missing = codec.missing_code if codec.missing_code is not None else np.nan
+    lookup = np.append(
+        np.asarray(codec.encode(column.cat.categories.astype(object), unseen=unseen), dtype=np.float64),
+        missing,
+    )
+    # Null values have category code -1, which picks the trailing missing entry
+    return lookup[column.cat.codes.to_numpy()]
+
+
+def encode_dataset(df, encoders=None):
+    """
+    Encodes a loaded dataset for the forest.
+
+    Parameters:
+        df: DataFrame from read_dataset (or any frame with the same columns)
+        encoders: existing label encoders to reuse; fitted from df when None
+
+    Returns:
+        (X, y, encoders): X float32 features in FEATURE_COLUMNS order,
+        y int8 risk codes (None when df has no risk column)
+    """
+    if encoders is None:
+        encoders = {
+            col: fit_label_encoder(list(df[col].astype("category").cat.categories))
+            for col in (*CATEGORICAL_COLUMNS, TARGET)
+            if col in df.columns
+        }
+    codecs = compile_encoders(encoders)
+
+    X = pd.DataFrame({
+        col: (
+            _encode_categorical(df[col], codecs[col], UNSEEN_NAN) if col in CATEGORICAL_COLUMNS
+            else df[col].to_numpy()
+        ).astype(np.float32)
+        for col in FEATURE_COLUMNS
+    })
+
+    y = None
+    if TARGET in df.columns:
+        y = _encode_categorical(df[TARGET], codecs[TARGET], "error").astype(np.int8)
+    return X, y, encoders
+
+
+# -----------------------------
+# Training / evaluation
+# -----------------------------
+def train_forest(X, y, **params):
+    """Fits the risk RandomForest (DEFAULT_PARAMS overridden by `params`)."""
+    model = RandomForestClassifier(**{**DEFAULT_PARAMS, **params})
+    model.fit(X, y)
+    return model
+
+
+def evaluate_model(model, X, y, encoders):
+    """
+    Holdout metrics.
+
+    Returns:
+        {"accuracy", "recall": {class: float}, "confusion_matrix", "labels", "report"}
+    """
+    y_pred = model.predict(X)
+    labels = [str(c) for c in encoders[TARGET].classes_]
+    codes = list(range(len(labels)))
+    recall = recall_score(y, y_pred, labels=codes, average=None, zero_division=0)
+    return {
+        "accuracy": float(accuracy_score(y, y_pred)),
+        "recall": {label: float(r) for label, r in zip(labels, recall)},
+        "confusion_matrix": confusion_matrix(y, y_pred, labels=codes).tolist(),
+        "labels": labels,
+        "report": classification_report(y, y_pred, labels=codes, target_names=labels, zero_division=0),
+    }
+
+
+# -----------------------------
+# Artifacts
+# -----------------------------
+def new_version():
+    return time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+
+
+def _atomic_copy(src, dst):
+    tmp = f"{dst}.tmp{os.getpid()}"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def save_artifacts(model, encoders, metadata, version=None, versions_dir=VERSIONS_DIR, promote=True):
+    """
+    Writes a versioned model directory and optionally promotes it.
+
+    Parameters:
+        model, encoders: fitted forest and label encoders
+        metadata: JSON-serialisable dict stored as metadata.json
+        version: version label (defaults to a UTC timestamp)
+        promote: also replace models/risk_model.pkl and label_encoders.pkl
+            (atomically, so running apps reload a complete file)
+
+    Returns:
+        (version, version directory, metadata written)
+    """
+    version = version or new_version()
+    out_dir = os.path.join(versions_dir, version)
+    os.makedirs(out_dir, exist_ok=True)
+
+    model_path = os.path.join(out_dir, os.path.basename(MODEL_PATH))
+    encoder_path = os.path.join(out_dir, os.path.basename(ENCODER_PATH))
+    joblib.dump(model, model_path)
+    joblib.dump(encoders, encoder_path)
+
+    metadata = {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "sklearn_version": sklearn.__version__,
+        "feature_names": list(FEATURE_COLUMNS),
+        "classes": {name: [None if pd.isna(c) else str(c) for c in enc.classes_] for name, enc in encoders.items()},
+        "model_bytes": os.path.getsize(model_path),
+        **metadata,
+    }
+    with open(os.path.join(out_dir, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    if promote:
+        _atomic_copy(encoder_path, ENCODER_PATH)
+        _atomic_copy(model_path, MODEL_PATH)
+    return version, out_dir, metadata
+
+
+def load_metadata(version, versions_dir=VERSIONS_DIR):
+    with open(os.path.join(versions_dir, version, METADATA_FILE)) as f:
+        return json.load(f)
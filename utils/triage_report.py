@@ -0,0 +1,128 @@
+"""
+The downloadable triage report (PDF) for one visit.
+
+Streamlit re-executes the results page on every interaction, so the
+report is not built there: ReportLab styles and the table style are
+created once per process, and finished documents are kept in a bounded
+LRU keyed by the visit (patient ID, intake timestamp). A report is
+built the first time it is downloaded and served from memory after.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+MAX_REPORTS = 128
+COLUMN_WIDTHS = [170, 330]
+DISCLAIMER = (
+    "Disclaimer: This report is decision-support output generated from synthetic-data-trained ML + safety rules. "
+    "Not a substitute for clinical judgement."
+)
+
+STYLES = getSampleStyleSheet()
+TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ("FONTSIZE", (0, 0), (-1, -1), 10),
+])
+
+_reports = OrderedDict()
+_lock = threading.Lock()
+
+
+def _table(rows):
+    table = Table(rows, colWidths=COLUMN_WIDTHS)
+    table.setStyle(TABLE_STYLE)
+    return table
+
+
+def build_report(input_data, result):
+    """
+    Renders the triage report.
+
+    Parameters:
+        input_data: intake fields (patient_id, age, gender, symptom,
+            pre_existing, bp, hr, temp, timestamp)
+        result: risk, confidence, department, priority, hospital_load,
+            est_wait, safety_override, gender_flag, age_flag
+
+    Returns:
+        the PDF's bytes
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = [
+        Paragraph("TRIAGE AI - PATIENT TRIAGE REPORT", STYLES["Title"]),
+        Paragraph(f"Generated: {input_data.get('timestamp', '')}", STYLES["Normal"]),
+        Spacer(1, 12),
+
+        Paragraph("Patient Details", STYLES["Heading2"]),
+        _table([
+            ["Patient ID", input_data.get("patient_id", "") or "N/A"],
+            ["Age", str(input_data["age"])],
+            ["Gender", input_data["gender"]],
+            ["Symptom", input_data["symptom"]],
+            ["Pre-existing Condition", input_data["pre_existing"]],
+        ]),
+        Spacer(1, 12),
+
+        Paragraph("Vitals", STYLES["Heading2"]),
+        _table([
+            ["Blood Pressure", str(input_data["bp"])],
+            ["Heart Rate", str(input_data["hr"])],
+            ["Temperature", str(input_data["temp"])],
+        ]),
+        Spacer(1, 12),
+
+        Paragraph("Triage Output", STYLES["Heading2"]),
+        _table([
+            ["Risk Level", f"{result['risk']} ({result['confidence']}%)"],
+            ["Department", result["department"]],
+            ["Priority", result["priority"]],
+            ["Hospital Load", f"{result['hospital_load']}%"],
+            ["Estimated Wait Time", f"{result['est_wait']} minutes"],
+            ["Safety Override", "YES" if result["safety_override"] else "NO"],
+            ["Fairness (Gender Toggle)", "POTENTIAL BIAS" if result["gender_flag"] else "NO BIAS FLAG"],
+            ["Fairness (Age Bands)", "AGE SENSITIVE" if result["age_flag"] else "NO AGE FLAG"],
+        ]),
+        Spacer(1, 12),
+
+        Paragraph(DISCLAIMER, STYLES["Italic"]),
+    ]
+    doc.build(story)
+    return buffer.getvalue()
+
+
+# -----------------------------
+# Per-visit cache
+# -----------------------------
+def cached_report(visit_key):
+    """The report already built for this visit, else None."""
+    with _lock:
+        pdf = _reports.get(visit_key)
+        if pdf is not None:
+            _reports.move_to_end(visit_key)
+        return pdf
+
+
+def get_report(visit_key, input_data, result):
+    """
+    The visit's report, built on first request and cached after.
+
+    Parameters:
+        visit_key: (patient_id, intake timestamp)
+    """
+    pdf = cached_report(visit_key)
+    if pdf is None:
+        pdf = build_report(input_data, result)
+        with _lock:
+            _reports[visit_key] = pdf
+            _reports.move_to_end(visit_key)
+            while len(_reports) > MAX_REPORTS:
+                _reports.popitem(last=False)
+    return pdf
@@ -0,0 +1,221 @@
+"""
+Vital signs read from report text in one pass.
+
+All patterns are alternatives of one pattern set, so a report is
+scanned once however many kinds of reading it holds:
+
+    bp        "BP 142/91 mmHg", "blood pressure: 120/80"
+    hr        "heart rate 88 bpm", "pulse 72", "HR:110bpm"
+    temp      "temperature 37.9 C", "temp 101.2°F", "temp 38,5 C"
+    spo2      "SpO2 96%", "O2 sat 94 %", "oxygen saturation 98"
+    rr        "respiratory rate 18 /min", "RR 22", "RR:22/min"
+    glucose   "fasting glucose 7.4 mmol/L", "blood sugar 142 mg/dL"
+
+Dates are alternatives of the same set. A date is consumed as a date
+(so "12/05/2024" is never read as a blood pressure) and dates the
+readings that follow it, until the next date. Matches are checked
+against physiological ranges; a value outside them is not a reading
+(e.g. "dose 5/325"). A number is read whole or not at all: the
+values end where the digits do (so "HR:110bpm" reads 110, "glucose
+1234" nothing), and a decimal comma is a decimal point ("38,5 C").
+
+Python's re tries every alternative at every character, and IGNORECASE
+slows every try. So the alternatives (BRANCHES, in priority order) are
+compiled into one case-sensitive PATTERN, run with finditer over the
+lowercased text, and tried only after a non-alphanumeric character
+where the text goes on with one of the branches' STARTS. Same matches
+as the plain combined regex, several times faster
+(benchmarks/bench_vitals_extraction.py).
+
+    python -m utils.vitals_extraction [--db PATH] [--out vitals.csv]
+"""
+
+import re
+from collections import namedtuple
+
+VitalReading = namedtuple("VitalReading", ["kind", "value", "unit", "start", "end", "date"])
+
+MONTHS = (
+    "january|february|march|april|may|june|july|august|september|october|november|december"
+    "|jan|feb|mar|apr|jun|jul|aug|sept|sep|oct|nov|dec"
+)
+# Decimal point or comma ("38,5"); a comma with more digits is a list ("120,130")
+NUMBER = r"\d{1,3}(?:\.\d+|,\d{1,2}(?!\d))?(?!\d)"
+SEPARATOR = r"\s*(?:[:=\-]|\bis\b|\bof\b|\bwas\b)?\s*"
+
+# (STARTS: how an alternative can begin, lowercase; alternative), in priority order
+BRANCHES = (
+    ((r"\d", "ja", "fe", "ma", "ap", "ju", "au", "se", "oc", "no", "de"),
+     r"(?P<date>\b(?:\d{4}-\d{1,2}-\d{1,2}|\d{1,2}[/.\-]\d{1,2}[/.\-]\d{2,4}"
+     rf"|\d{{1,2}}\s+(?:{MONTHS})\b\.?,?\s+\d{{4}}|(?:{MONTHS})\b\.?\s+\d{{1,2}},?\s+\d{{4}})\b)"),
+    (("bl", r"b\.", "bp", r"\d"),
+     rf"(?:\b(?:blood\s*pressure|b\.?p)\b{SEPARATOR})?"
+     r"(?<![\d/.])(?P<bp_sys>\d{2,3})\s*/\s*(?P<bp_dia>\d{2,3})(?![\d/])(?:\s*(?P<bp_unit>mm\s*hg))?"),
+    (("he", "pu", "hr"),
+     rf"\b(?:heart\s*rate|pulse(?:\s*rate)?|hr)\b{SEPARATOR}(?P<hr>\d{{2,3}})(?!\d)"
+     r"(?:\s*(?P<hr_unit>bpm|beats\s*(?:/|per)\s*min(?:ute)?|/\s*min))?"),
+    (("te",),
+     rf"\b(?:temperature|temp)\b\.?{SEPARATOR}(?P<temp>{NUMBER})(?:\s*(?:°|deg(?:rees)?)?\s*(?P<temp_unit>[cf])\b)?"),
+    (("sp", "o2", "ox", "sa"),
+     rf"\b(?:sp\s*o2|spo₂|o2\s*sat(?:uration)?s?|oxygen\s*saturation|sats)\b{SEPARATOR}(?P<spo2>\d{{2,3}})(?!\d)\s*%?"),
+    (("re", "rr"),
+     rf"\b(?:resp(?:iratory|iration)?\s*rate|rr)\b{SEPARATOR}(?P<rr>\d{{1,2}})(?!\d)"
+     r"(?:\s*(?P<rr_unit>breaths\s*(?:/|per)\s*min(?:ute)?|/\s*min))?"),
+    (("fa", "ra", "bl", "gl", "cb", "fb", "rb"),
+     r"\b(?:(?:fasting|random)\s+)?(?:blood\s*(?:glucose|sugar)|glucose|cbg|fbs|rbs)\b"
+     rf"{SEPARATOR}(?P<glucose>{NUMBER})(?:\s*(?P<glucose_unit>mmol\s*/\s*l|mg\s*/\s*dl))?"),
+)
+
+# A match starts with the non-alphanumeric character before the reading
+# (see _lowered for the text it runs on)
+STARTS = sorted({start for starts, _ in BRANCHES for start in starts})
+PATTERN = re.compile(
+    "[^0-9a-z](?=" + "|".join(STARTS) + ")(?:" + "|".join(alt for _, alt in BRANCHES) + ")"
+)
+
+# Plausible ranges per kind and unit; anything outside is not a reading
+RANGES = {
+    ("bp", "mmHg"): (50, 300),
+    ("hr", "bpm"): (20, 250),
+    ("temp", "°C"): (30, 45),
+    ("temp", "°F"): (86, 113),
+    ("spo2", "%"): (50, 100),
+    ("rr", "/min"): (4, 70),
+    ("glucose", "mmol/L"): (1, 40),
+    ("glucose", "mg/dL"): (20, 700),
+}
+
+
+def _in_range(kind, unit, value):
+    low, high = RANGES[(kind, unit)]
+    return low <= value <= high
+
+
+def _temp_unit(written, value):
+    if written:
+        return "°" + written.upper()
+    return "°C" if value <= 45 else "°F"
+
+
+def _glucose_unit(written, value):
+    if written:
+        return "mmol/L" if written.lower().startswith("mmol") else "mg/dL"
+    return "mmol/L" if value <= 40 else "mg/dL"
+
+
+def _decimal(text):
+    return float(text.replace(",", "."))
+
+
+def _reading(match, date):
+    """The VitalReading for one non-date match, or None when implausible."""
+    group = match.group
+    start, end = match.start(), match.end() - 1
+
+    if group("bp_sys"):
+        systolic, diastolic = int(group("bp_sys")), int(group("bp_dia"))
+        if systolic <= diastolic or not (_in_range("bp", "mmHg", systolic) and 20 <= diastolic <= 200):
+            return None
+        return VitalReading("bp", (systolic, diastolic), "mmHg", start, end, date)
+    if group("hr"):
+        value = int(group("hr"))
+        return VitalReading("hr", value, "bpm", start, end, date) if _in_range("hr", "bpm", value) else None
+    if group("temp"):
+        value = _decimal(group("temp"))
+        unit = _temp_unit(group("temp_unit"), value)
+        return VitalReading("temp", value, unit, start, end, date) if _in_range("temp", unit, value) else None
+    if group("spo2"):
+        value = int(group("spo2"))
+        return VitalReading("spo2", value, "%", start, end, date) if _in_range("spo2", "%", value) else None
+    if group("rr"):
+        value = int(group("rr"))
+        return VitalReading("rr", value, "/min", start, end, date) if _in_range("rr", "/min", value) else None
+    if group("glucose"):
+        value = _decimal(group("glucose"))
+        unit = _glucose_unit(group("glucose_unit"), value)
+        return VitalReading("glucose", value, unit, start, end, date) if _in_range("glucose", unit, value) else None
+    return None
+
+
+def _lowered(text):
+    """
+    " " + text lowercased, for PATTERN. The leading space lets a reading
+    start the text, so match offsets minus one are text offsets (and a
+    match's start is the reading's). Lowercasing keeps every character
+    in place; str.lower() would lengthen "İ".
+    """
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        lowered = "".join(char.lower()[0] for char in text)
+    return " " + lowered
+
+
+def extract_vitals(text):
+    """
+    Every plausible vital-sign reading in the text, in order.
+
+    Returns:
+        list of VitalReading(kind, value, unit, start, end, date):
+            kind: "bp", "hr", "temp", "spo2", "rr" or "glucose"
+            value: number, or (systolic, diastolic) for bp
+            start, end: character offsets of the match in text
+            date: the closest date written before the reading, or None
+    """
+    text = text or ""
+    readings = []
+    date = None
+    for match in PATTERN.finditer(_lowered(text)):
+        if match.group("date"):
+            date = text[match.start("date") - 1:match.end("date") - 1]
+            continue
+        reading = _reading(match, date)
+        if reading is not None:
+            readings.append(reading)
+    return readings
+
+
+def format_value(reading):
+    if reading.kind == "bp":
+        return f"{reading.value[0]}/{reading.value[1]}"
+    return f"{reading.value:g}"
+
+
+def first_readings(readings):
+    """The first reading of each kind, keyed by kind."""
+    first = {}
+    for reading in readings:
+        first.setdefault(reading.kind, reading)
+    return first
+
+
+# -----------------------------
+# CLI: batch extraction from stored reports
+# -----------------------------
+def main(argv=None):
+    import argparse
+    import csv
+    import sys
+
+    from utils.db import DB_PATH, connection
+
+    parser = argparse.ArgumentParser(description="Extract vital signs from stored report text.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--out", default="-", help="CSV file (default stdout)")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", newline="")
+    try:
+        writer = csv.writer(out)
+        writer.writerow(["visit_id", "patient_id", "kind", "value", "unit", "date", "start", "end"])
+        with connection(args.db) as conn:
+            rows = conn.execute("SELECT id, patient_id, pdf_note FROM visits WHERE pdf_note <> ''")
+            for visit_id, patient_id, note in rows:
+                for r in extract_vitals(note):
+                    writer.writerow([visit_id, patient_id, r.kind, format_value(r), r.unit, r.date or "", r.start, r.end])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()